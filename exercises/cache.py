@@ -0,0 +1,82 @@
+'''
+In-process cache of serialized exercise catalog responses.
+
+The catalog is read far more often than it changes, so list and detail
+payloads are kept in memory together with a strong ETag computed from their
+content. Entries are dropped whenever an Exercise is saved or deleted in this
+process (see exercises.signals); CATALOG_CACHE_TTL bounds how long another
+worker process can serve a catalog that was changed elsewhere.
+'''
+import hashlib
+import json
+import threading
+import time
+
+from django.dispatch import Signal
+
+CATALOG_CACHE_TTL = 300  # seconds
+MAX_ENTRIES = 1024
+
+_lock = threading.Lock()
+_entries = {}
+_version = 0
+
+#sent on every catalog change (saves, deletes and bulk imports alike); lets other apps drop results derived from the catalog.
+catalog_changed = Signal()
+
+
+def version():
+    '''Counter bumped on every catalog change; lets other in-process indexes know when to rebuild.'''
+    return _version
+
+
+def invalidate():
+    global _version
+    with _lock:
+        _version += 1
+        _entries.clear()
+    catalog_changed.send(sender=invalidate)
+
+
+def make_etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+    return '"%s"' % hashlib.sha256(payload).hexdigest()[:32]
+
+
+def lookup(key):
+    '''Return the cached (etag, data) for key, or None.'''
+    with _lock:
+        entry = _entries.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1], entry[2]
+
+
+def get_or_build(key, build):
+    '''Return (etag, data) for key, calling build() to produce the data on a miss.'''
+    cached = lookup(key)
+    if cached is not None:
+        return cached
+
+    with _lock:
+        version = _version
+    data = build()
+    etag = make_etag(data)
+    with _lock:
+        #don't store data that was built while the catalog was being changed.
+        if version == _version:
+            if len(_entries) >= MAX_ENTRIES:
+                _entries.pop(next(iter(_entries)))
+            _entries[key] = (time.monotonic() + CATALOG_CACHE_TTL, etag, data)
+    return etag, data
+
+
+def etag_matches(request, etag):
+    '''True if the request's If-None-Match header names etag (weak comparison, as RFC 9110 requires).'''
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates
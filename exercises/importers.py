@@ -0,0 +1,116 @@
+'''
+Bulk, idempotent loading of exercise catalogs.
+
+Exercises are upserted by name (the catalog's natural key) in batches with
+INSERT ... ON CONFLICT DO UPDATE, so re-running an import updates rows in
+place and never deletes exercises that workout plans refer to.
+'''
+import csv
+import json
+from pathlib import Path
+
+from . import cache as catalog_cache
+from .models import Exercise
+
+FIELDS = ['name', 'description', 'category', 'muscle_group']
+FORMATS = ['csv', 'jsonl', 'json']
+
+_CATEGORIES = {value for value, _ in Exercise.CATEGORY_CHOICES}
+_MUSCLE_GROUPS = {value for value, _ in Exercise.MUSCLE_GROUP_CHOICES}
+_MAX_LENGTHS = {field: Exercise._meta.get_field(field).max_length for field in FIELDS if Exercise._meta.get_field(field).max_length}
+
+
+class MalformedRow(ValueError):
+    '''
+    Yielded by read_rows() in place of a line that cannot be parsed, so that
+    clean_row() rejects it like any other invalid row and the import goes on.
+    '''
+
+
+def guess_format(path):
+    suffix = Path(path).suffix.lower().lstrip('.')
+    return 'jsonl' if suffix == 'ndjson' else suffix
+
+
+def read_rows(path, fmt=None):
+    '''
+    Yield one dict per exercise from a CSV (with a header row), JSON Lines or
+    JSON array file. CSV and JSON Lines are read line by line; a JSON array
+    has to be parsed as a whole.
+    '''
+    fmt = fmt or guess_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported catalog format '{fmt}', expected one of {', '.join(FORMATS)}.")
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            yield from csv.DictReader(handle)
+        elif fmt == 'jsonl':
+            for line in handle:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as error:
+                        yield MalformedRow(f"invalid JSON: {error.msg}")
+        else:
+            yield from json.load(handle)
+
+
+def clean_row(row):
+    '''Return an unsaved Exercise for row, or raise ValueError explaining why it is rejected.'''
+    if isinstance(row, MalformedRow):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("not an object")
+    values = {field: (row.get(field) or '').strip() for field in FIELDS}
+    if not values['name']:
+        raise ValueError("missing name")
+    if values['category'] and values['category'] not in _CATEGORIES:
+        raise ValueError(f"unknown category '{values['category']}'")
+    if values['muscle_group'] and values['muscle_group'] not in _MUSCLE_GROUPS:
+        raise ValueError(f"unknown muscle group '{values['muscle_group']}'")
+    #checked here: on PostgreSQL one overlong value would fail the whole batch.
+    for field, max_length in _MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            raise ValueError(f"{field} longer than {max_length} characters")
+    return Exercise(**values)
+
+
+def upsert_exercises(rows, batch_size=1000, on_error=None):
+    '''
+    Insert or update the exercises in rows, batch_size at a time.
+    Rejected rows are passed to on_error(row_number, row, message) and skipped.
+    Returns (number of rows upserted, number of rows skipped).
+    '''
+    upserted = skipped = 0
+    batch = {}
+
+    def flush():
+        nonlocal upserted
+        Exercise.objects.bulk_create(
+            list(batch.values()),
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['description', 'category', 'muscle_group'],
+        )
+        upserted += len(batch)
+        batch.clear()
+
+    try:
+        for number, row in enumerate(rows, start=1):
+            try:
+                exercise = clean_row(row)
+            except (ValueError, AttributeError) as error:
+                skipped += 1
+                if on_error is not None:
+                    on_error(number, row, str(error))
+                continue
+            #one statement cannot upsert the same name twice, so the last occurrence in a batch wins.
+            batch[exercise.name] = exercise
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        # bulk_create sends no post_save signals.
+        catalog_cache.invalidate()
+    return upserted, skipped
@@ -0,0 +1,34 @@
+# exercises/management/commands/import_exercises.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from exercises.importers import FORMATS, read_rows, upsert_exercises
+
+class Command(BaseCommand):
+    help = 'Import (insert or update by name) exercises from a CSV, JSON Lines or JSON catalog file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file with name, description, category and muscle_group fields.')
+        parser.add_argument('--format', choices=FORMATS, help='File format (default: guessed from the extension).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Exercises per INSERT statement.')
+
+    def handle(self, *args, **options):
+        def report_error(number, row, message):
+            self.stderr.write(f"Skipped row {number}: {message}")
+
+        started = time.perf_counter()
+        try:
+            upserted, skipped = upsert_exercises(
+                read_rows(options['path'], options['format']),
+                batch_size=options['batch_size'],
+                on_error=report_error,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Could not import {options['path']}: {error}")
+        elapsed = time.perf_counter() - started
+
+        rate = upserted / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {upserted} exercises ({skipped} skipped) in {elapsed:.2f}s, {rate:.0f} rows/s."
+        ))
@@ -1,7 +1,7 @@
 # exercises/management/commands/seed_exercises.py
 
 from django.core.management.base import BaseCommand
-from exercises.models import Exercise
+from exercises.importers import upsert_exercises
 
 class Command(BaseCommand):
     help = 'Seed the database with a variety of exercises.'
@@ -59,22 +59,8 @@ class Command(BaseCommand):
             },
         ]
 
-        # Clear existing exercises if needed (optional)
-        Exercise.objects.all().delete()
-        self.stdout.write("Existing exercises cleared.")
-
-        for exercise in exercises_data:
-            obj, created = Exercise.objects.get_or_create(
-                name=exercise["name"],
-                defaults={
-                    "description": exercise["description"],
-                    "category": exercise["category"],
-                    "muscle_group": exercise["muscle_group"],
-                }
-            )
-            if created:
-                self.stdout.write(f"Created exercise: {obj.name}")
-            else:
-                self.stdout.write(f"Exercise already exists: {obj.name}")
+        # Insert or update by name; existing exercises (and the workout plans using them) are kept.
+        upserted, _ = upsert_exercises(exercises_data)
+        self.stdout.write(f"Seeded {upserted} exercises.")
 
         self.stdout.write(self.style.SUCCESS("Exercise seeding completed."))
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def _merge_records(PersonalRecord, others, keep_id):
+    #the best record of each user and kind moves to the kept exercise; the rest go with the duplicates.
+    for record in PersonalRecord.objects.filter(exercise__in=others).order_by('-value', 'achieved_at'):
+        kept = PersonalRecord.objects.filter(user_id=record.user_id, exercise_id=keep_id, kind=record.kind).first()
+        if kept is None:
+            record.exercise_id = keep_id
+            record.save(update_fields=['exercise'])
+        elif (record.value, kept.achieved_at) > (kept.value, record.achieved_at):
+            #of two equal values the earlier entry keeps the record, as in workouts.records.
+            kept.value, kept.workout_exercise_id, kept.achieved_at = record.value, record.workout_exercise_id, record.achieved_at
+            kept.save(update_fields=['value', 'workout_exercise', 'achieved_at'])
+
+
+def merge_duplicate_names(apps, schema_editor):
+    '''
+    Keep the oldest exercise for every duplicated name and point workout
+    exercises (and personal records, on databases that already have them) at
+    it, so that name can become the catalog's natural key.
+    '''
+    Exercise = apps.get_model('exercises', 'Exercise')
+    WorkoutExercise = apps.get_model('workouts', 'WorkoutExercise')
+    try:
+        PersonalRecord = apps.get_model('workouts', 'PersonalRecord')
+    except LookupError:
+        #workouts 0009 has not run yet; it builds the records from the merged entries.
+        PersonalRecord = None
+
+    duplicates = Exercise.objects.values('name').annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates.iterator():
+        others = Exercise.objects.filter(name=duplicate['name']).exclude(id=duplicate['keep_id'])
+        WorkoutExercise.objects.filter(exercise__in=others).update(exercise_id=duplicate['keep_id'])
+        if PersonalRecord is not None:
+            _merge_records(PersonalRecord, others, duplicate['keep_id'])
+        #PersonalRecord.exercise cascades: the records still on the duplicates were merged above.
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0002_exercise_category'),
+        ('workouts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0003_dedupe_exercise_names'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exercise',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+    ]
@@ -17,7 +17,7 @@ class Exercise(models.Model):
         ('core', 'Core'),
     ]
     
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
     description = models.TextField()
     
     category = models.CharField(
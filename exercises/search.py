@@ -0,0 +1,145 @@
+'''
+In-process typeahead index over Exercise.name and Exercise.description.
+
+The catalog is loaded once into sorted term lists, so a prefix lookup is a
+binary search followed by a scan of the matching terms, instead of an
+icontains table scan per keystroke. The index is rebuilt lazily when the
+catalog changes (exercises.cache.version()) or after CATALOG_CACHE_TTL.
+'''
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+from . import cache as catalog_cache
+from .models import Exercise
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+FIELDS = ['id', 'name', 'description', 'category', 'muscle_group']
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class _TermIndex:
+    '''Sorted terms with their posting sets, for prefix lookups.'''
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.terms = []
+
+    def add(self, text, exercise_id):
+        for term in tokenize(text):
+            self.postings[term].add(exercise_id)
+
+    def freeze(self):
+        self.terms = sorted(self.postings)
+
+    def prefix(self, prefix):
+        '''Map each exercise id to whether it has a term equal to prefix (True) or only starting with it (False).'''
+        matches = {}
+        position = bisect.bisect_left(self.terms, prefix)
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            term = self.terms[position]
+            for exercise_id in self.postings[term]:
+                matches[exercise_id] = matches.get(exercise_id, False) or term == prefix
+            position += 1
+        return matches
+
+
+class ExerciseSearchIndex:
+    def __init__(self, rows):
+        self.records = {}
+        self.names = _TermIndex()
+        self.descriptions = _TermIndex()
+        for row in rows:
+            record = dict(zip(FIELDS, row))
+            record['normalized_name'] = ' '.join(tokenize(record['name']))
+            self.records[record['id']] = record
+            self.names.add(record['name'], record['id'])
+            self.descriptions.add(record['description'], record['id'])
+        self.names.freeze()
+        self.descriptions.freeze()
+
+    def search(self, query, limit=10, category=None, muscle_group=None):
+        '''
+        Return up to limit exercise records matching every word of query as a
+        prefix of a word in the name or the description, best matches first.
+
+        Exercises matching every word in the name come first; within a tier
+        the whole name equal to the query ranks highest, then a name starting
+        with the query, then exact word matches over prefix matches; ties go
+        to the shorter name.
+        '''
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        name_hits = [self.names.prefix(token) for token in tokens]
+        in_name = self._filter(set.intersection(*(set(hits) for hits in name_hits)), category, muscle_group)
+        if len(in_name) >= limit:
+            #nothing matched through the description can outrank these.
+            candidates = in_name
+        else:
+            candidates = None
+            for token, hits in zip(tokens, name_hits):
+                matched = set(hits).union(self.descriptions.prefix(token))
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+            candidates = self._filter(candidates, category, muscle_group)
+
+        normalized = ' '.join(tokens)
+
+        def rank(exercise_id):
+            record = self.records[exercise_id]
+            score = 0
+            for hits in name_hits:
+                if exercise_id in hits:
+                    score += 15 if hits[exercise_id] else 10
+                else:
+                    score += 1
+            name = record['normalized_name']
+            if name == normalized:
+                score += 100
+            elif name.startswith(normalized):
+                score += 50
+            return (exercise_id not in in_name, -score, len(record['name']), record['name'], exercise_id)
+
+        best = heapq.nsmallest(limit, candidates, key=rank)
+        return [self._public(exercise_id, -rank(exercise_id)[1]) for exercise_id in best]
+
+    def _filter(self, ids, category, muscle_group):
+        if category is None and muscle_group is None:
+            return ids
+        return {
+            exercise_id for exercise_id in ids
+            if (category is None or self.records[exercise_id]['category'] == category)
+            and (muscle_group is None or self.records[exercise_id]['muscle_group'] == muscle_group)
+        }
+
+    def _public(self, exercise_id, score):
+        record = self.records[exercise_id]
+        return dict({field: record[field] for field in FIELDS}, score=score)
+
+
+_lock = threading.Lock()
+_index = None
+_index_version = None
+_index_expires = 0.0
+
+
+def get_index():
+    '''Return the current index, rebuilding it if the catalog changed or it expired.'''
+    global _index, _index_version, _index_expires
+    version = catalog_cache.version()
+    with _lock:
+        if _index is not None and _index_version == version and time.monotonic() < _index_expires:
+            return _index
+        index = ExerciseSearchIndex(Exercise.objects.values_list(*FIELDS).iterator(chunk_size=2000))
+        _index, _index_version = index, version
+        _index_expires = time.monotonic() + catalog_cache.CATALOG_CACHE_TTL
+        return index
@@ -0,0 +1,9 @@
+from rest_framework import serializers
+from .models import Exercise
+
+
+
+class ExerciseSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Exercise
+        fields = ['id', 'name', 'description', 'category', 'muscle_group']
@@ -1,3 +1,205 @@
-from django.test import TestCase
+# exercises/tests.py
 
-# Create your tests here.
+import importlib
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.contrib.auth.models import User
+from exercises.models import Exercise
+
+class ExerciseCatalogTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.bench = Exercise.objects.create(name="Bench Press", description="Chest press", category="strength", muscle_group="chest")
+        self.squat = Exercise.objects.create(name="Squats", description="Leg exercise", category="strength", muscle_group="legs")
+        self.running = Exercise.objects.create(name="Running", description="Cardio", category="cardio", muscle_group="")
+        self.list_url = reverse("exercise_list")
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_exercises(self):
+        """
+        Test that the whole catalog is listed by name.
+        """
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([e["name"] for e in response.data], ["Bench Press", "Running", "Squats"])
+
+    def test_filter_exercises(self):
+        """
+        Test filtering the catalog by category and muscle group.
+        """
+        response = self.client.get(self.list_url, {"category": "strength", "muscle_group": "legs"})
+        self.assertEqual([e["id"] for e in response.data], [self.squat.id])
+        response = self.client.get(self.list_url, {"category": "cardio"})
+        self.assertEqual([e["id"] for e in response.data], [self.running.id])
+
+    def test_retrieve_exercise(self):
+        response = self.client.get(reverse("exercise_detail", kwargs={"pk": self.bench.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["name"], "Bench Press")
+        response = self.client.get(reverse("exercise_detail", kwargs={"pk": 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_if_none_match_returns_304_without_queries(self):
+        """
+        Test that revalidating an unchanged catalog is answered from memory.
+        """
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_catalog_change_invalidates_cache(self):
+        """
+        Test that saving or deleting an exercise changes the ETag and the content.
+        """
+        etag = self.client.get(self.list_url)["ETag"]
+        self.bench.name = "Flat Bench Press"
+        self.bench.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Flat Bench Press", [e["name"] for e in response.data])
+
+        self.running.delete()
+        response = self.client.get(self.list_url)
+        self.assertNotIn("Running", [e["name"] for e in response.data])
+
+
+
+class ExerciseSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.bench = Exercise.objects.create(name="Bench Press", description="A strength exercise for the chest.", category="strength", muscle_group="chest")
+        self.incline = Exercise.objects.create(name="Incline Bench Press", description="Upper chest variation.", category="strength", muscle_group="chest")
+        self.dips = Exercise.objects.create(name="Dips", description="Done between two parallel bars or a bench.", category="strength", muscle_group="arms")
+        self.shoulder = Exercise.objects.create(name="Shoulder Press", description="Overhead pressing.", category="strength", muscle_group="shoulders")
+        self.search_url = reverse("exercise_search")
+        self.client.force_authenticate(user=self.user)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [e["name"] for e in response.data]
+
+    def test_prefix_search_ranks_name_matches_first(self):
+        """
+        Test that name prefix matches rank above description matches.
+        """
+        response = self.client.get(self.search_url, {"q": "ben"})
+        self.assertEqual(self.names(response), ["Bench Press", "Incline Bench Press", "Dips"])
+
+    def test_multi_word_search(self):
+        response = self.client.get(self.search_url, {"q": "press sho"})
+        self.assertEqual(self.names(response), ["Shoulder Press"])
+        response = self.client.get(self.search_url, {"q": "bench", "muscle_group": "arms"})
+        self.assertEqual(self.names(response), ["Dips"])
+
+    def test_search_is_served_from_memory(self):
+        self.client.get(self.search_url, {"q": "press"})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.search_url, {"q": "pre", "limit": 2})
+        self.assertEqual(len(response.data), 2)
+
+    def test_index_follows_catalog_changes(self):
+        self.assertEqual(self.names(self.client.get(self.search_url, {"q": "deadl"})), [])
+        Exercise.objects.create(name="Deadlift", description="Hip hinge.", category="strength", muscle_group="back")
+        self.assertEqual(self.names(self.client.get(self.search_url, {"q": "deadl"})), ["Deadlift"])
+
+    def test_search_requires_query(self):
+        response = self.client.get(self.search_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class ExerciseImportTests(APITestCase):
+    def write_catalog(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w", encoding="utf-8") as catalog:
+            catalog.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_import_csv_upserts_by_name(self):
+        """
+        Test that importing inserts new exercises, updates existing ones in place and skips invalid rows.
+        """
+        existing = Exercise.objects.create(name="Squats", description="Old", category="strength", muscle_group="legs")
+        path = self.write_catalog(".csv", (
+            "name,description,category,muscle_group\n"
+            "Squats,Updated description,strength,legs\n"
+            "Rowing,Full body cardio,cardio,back\n"
+            "Mystery,Unknown,telekinesis,\n"
+        ))
+        out, err = StringIO(), StringIO()
+        call_command("import_exercises", path, "--batch-size", "1", stdout=out, stderr=err)
+
+        self.assertIn("Imported 2 exercises (1 skipped)", out.getvalue())
+        self.assertIn("unknown category", err.getvalue())
+        existing.refresh_from_db()
+        self.assertEqual(existing.description, "Updated description")
+        self.assertEqual(Exercise.objects.count(), 2)
+
+    def test_import_json_lines(self):
+        rows = [{"name": f"Exercise {i}", "description": "Desc", "category": "strength", "muscle_group": "arms"} for i in range(25)]
+        path = self.write_catalog(".jsonl", "\n".join(json.dumps(row) for row in rows))
+        call_command("import_exercises", path, "--batch-size", "10", stdout=StringIO())
+        self.assertEqual(Exercise.objects.filter(name__startswith="Exercise ").count(), 25)
+
+    def test_import_skips_malformed_and_overlong_rows(self):
+        path = self.write_catalog(".jsonl", "\n".join([
+            json.dumps({"name": "Curl", "description": "Old", "category": "strength", "muscle_group": "arms"}),
+            '{"name": "Broken",',
+            json.dumps({"name": "x" * 256, "description": "Too long"}),
+            json.dumps({"name": "Curl", "description": "New", "category": "strength", "muscle_group": "arms"}),
+            json.dumps({"name": "Plank", "description": "Hold", "category": "balance", "muscle_group": "core"}),
+        ]))
+        out, err = StringIO(), StringIO()
+        call_command("import_exercises", path, stdout=out, stderr=err)
+        #the repeated name is one exercise, upserted once.
+        self.assertIn("Imported 2 exercises (2 skipped)", out.getvalue())
+        self.assertIn("Skipped row 2: invalid JSON", err.getvalue())
+        self.assertIn("Skipped row 3: name longer than 255 characters", err.getvalue())
+        self.assertEqual(Exercise.objects.get(name="Curl").description, "New")
+
+    def test_seed_keeps_referenced_exercises(self):
+        """
+        Test that re-seeding no longer deletes exercises (and with them the exercises of workout plans).
+        """
+        from workouts.models import WorkoutExercise, WorkoutPlan
+        user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        call_command("seed_exercises", stdout=StringIO())
+        bench = Exercise.objects.get(name="Bench Press")
+        workout = WorkoutPlan.objects.create(user=user, title="Chest", description="Desc")
+        WorkoutExercise.objects.create(workout=workout, exercise=bench, sets=3, reps=10)
+
+        call_command("seed_exercises", stdout=StringIO())
+        self.assertTrue(Exercise.objects.filter(id=bench.id).exists())
+        self.assertEqual(WorkoutExercise.objects.filter(workout=workout).count(), 1)
+
+    def test_dedupe_migration_keeps_personal_records(self):
+        """
+        Test that merging a duplicate exercise moves its personal records instead of cascading them away.
+        """
+        from workouts.models import PersonalRecord, WorkoutExercise, WorkoutPlan
+        dedupe = importlib.import_module("exercises.migrations.0003_dedupe_exercise_names")
+        keep = Exercise.objects.create(name="Squats", description="", category="strength", muscle_group="legs")
+        duplicate = Exercise.objects.create(name="Squats (copy)", description="", category="strength", muscle_group="legs")
+        lifter = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        other = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        for user, exercise, weight in ((lifter, keep, 100.0), (lifter, duplicate, 120.0), (other, duplicate, 60.0)):
+            workout = WorkoutPlan.objects.create(user=user, title="Legs", description="")
+            WorkoutExercise.objects.create(workout=workout, exercise=exercise, sets=1, reps=1, weight=weight)
+
+        others = Exercise.objects.filter(pk=duplicate.pk)
+        WorkoutExercise.objects.filter(exercise__in=others).update(exercise_id=keep.id)
+        dedupe._merge_records(PersonalRecord, others, keep.id)
+        others.delete()
+        weights = PersonalRecord.objects.filter(kind="weight").values_list("user__username", "exercise_id", "value")
+        self.assertEqual(sorted(weights), [("user1", keep.id, 120.0), ("user2", keep.id, 60.0)])
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('exercises/', views.ExerciseListAPIView.as_view(), name='exercise_list'),
+    path('exercises/search/', views.ExerciseSearchAPIView.as_view(), name='exercise_search'),
+    path('exercises/<int:pk>/', views.ExerciseDetailAPIView.as_view(), name='exercise_detail'),
+]
@@ -1,2 +1,107 @@
-from django.shortcuts import render
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status, permissions
+from rest_framework.exceptions import NotFound
+from . import cache as catalog_cache
+from . import search
+from .models import Exercise
+from .serializers import ExerciseSerializer
 
+
+
+def catalog_response(request, key, build):
+    """
+    Serve a catalog payload from the in-process cache with a strong ETag.
+    A matching If-None-Match gets a 304 without touching the database.
+    """
+    etag, data = catalog_cache.get_or_build(key, build)
+    if catalog_cache.etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    #clients may keep the catalog but must revalidate it with If-None-Match.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+
+
+
+class ExerciseListAPIView(APIView):
+    """
+    API view to list the exercise catalog.
+
+    Optional Query Parameters:
+        - category: only exercises of this category (e.g. "strength").
+        - muscle_group: only exercises targeting this muscle group (e.g. "legs").
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        category = request.query_params.get('category')
+        muscle_group = request.query_params.get('muscle_group')
+
+        def build():
+            exercises = Exercise.objects.order_by('name', 'id')
+            if category is not None:
+                exercises = exercises.filter(category=category)
+            if muscle_group is not None:
+                exercises = exercises.filter(muscle_group=muscle_group)
+            return list(ExerciseSerializer(exercises, many=True).data)
+
+        return catalog_response(request, ('list', category, muscle_group), build)
+
+
+
+
+
+class ExerciseDetailAPIView(APIView):
+    """
+    API view to retrieve a single exercise of the catalog.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        def build():
+            exercise = Exercise.objects.filter(pk=pk).first()
+            if exercise is None:
+                raise NotFound()
+            return ExerciseSerializer(exercise).data
+
+        return catalog_response(request, ('detail', pk), build)
+
+
+
+
+
+class ExerciseSearchAPIView(APIView):
+    """
+    API view for typeahead search over exercise names and descriptions.
+    Served from an in-process index, so it does not query the database.
+
+    Query Parameters:
+        - q: the text typed so far; every word must prefix a word of the exercise.
+        - limit: maximum number of results (default 10, at most 50).
+        - category / muscle_group: optional filters, as in the catalog list.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        results = search.get_index().search(
+            query,
+            limit=max(limit, 1),
+            category=request.query_params.get('category'),
+            muscle_group=request.query_params.get('muscle_group'),
+        )
+        return Response(results, status=status.HTTP_200_OK)
@@ -0,0 +1,183 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from workout_tracker import metrics
+
+
+class InstrumentedJWTAuthentication(JWTAuthentication):
+    #JWTAuthentication that records the outcome and duration of every attempt in workout_tracker.metrics.
+
+    def authenticate(self, request):
+        with metrics.JWT_AUTHENTICATION_SECONDS.time():
+            try:
+                result = super().authenticate(request)
+            except AuthenticationFailed:
+                metrics.JWT_AUTHENTICATIONS.inc(outcome='failed')
+                raise
+        metrics.JWT_AUTHENTICATIONS.inc(outcome='anonymous' if result is None else 'success')
+        return result
+
+
+class UserCache:
+    '''
+    Bounded LRU of user id -> User with a time to live, shared by the threads of one process.
+    Entries are dropped by users.signals whenever a user is saved or deleted. Each entry also
+    holds the user's version from the shared cache (see invalidate_user()) when it was loaded,
+    and is only returned for that version.
+    '''
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, user_id, version=None):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires, loaded_version = entry
+            if expires <= time.monotonic() or loaded_version != version:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        #every request gets its own instance, so attributes set on request.user never leak between requests.
+        return copy.copy(user)
+
+    def set(self, user_id, user, generation, version=None):
+        with self._lock:
+            if generation != self._generation:
+                #a user was invalidated while this one was being loaded, it may be stale.
+                return
+            self._entries[user_id] = (copy.copy(user), time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+USER_CACHE = UserCache(
+    max_entries=getattr(settings, 'JWT_USER_CACHE_SIZE', 10000),
+    ttl=settings.JWT_USER_CACHE_SECONDS,
+)
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def user_version(user_id):
+    '''The user's version in Django's cache; None until the user first changes.'''
+    return cache.get(_version_key(user_id))
+
+
+async def auser_version(user_id):
+    return await cache.aget(_version_key(user_id))
+
+
+def _increment(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        #no counter (never changed, or evicted): a new one cannot match a version cached before.
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def invalidate_user(user_id):
+    '''
+    Drop the user from the USER_CACHE of every process sharing Django's cache.
+    Done again when the current transaction commits: until then another
+    process could still load and cache the old row under the new version.
+    users.signals calls this on save and delete; code changing users with
+    QuerySet.update() must call it itself.
+    '''
+    USER_CACHE.invalidate(user_id)
+    _increment(user_id)
+    transaction.on_commit(lambda: _increment(user_id))
+
+
+class CachedJWTAuthentication(InstrumentedJWTAuthentication):
+    '''
+    JWTAuthentication that keeps the users it loads in USER_CACHE, so an
+    authenticated request does not need a query for its User row. The token
+    itself (signature, expiry) is still validated on every request.
+
+    Each process has its own cache, so every hit is checked against the
+    user's version in Django's shared cache (one cache read, no query): a
+    user saved or deleted in another process is loaded again. Users changed
+    with QuerySet.update() and no invalidate_user() are served from the
+    cache for at most JWT_USER_CACHE_SECONDS.
+    '''
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = user_version(user_id) if user_id is not None else None
+        user = self.get_cached_user(validated_token, version)
+        if user is None:
+            generation = USER_CACHE.generation
+            user = super().get_user(validated_token)
+            USER_CACHE.set(validated_token[api_settings.USER_ID_CLAIM], user, generation, version)
+        return user
+
+    def get_cached_user(self, validated_token, version):
+        #returns None when the user has to be loaded from the database.
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = USER_CACHE.get(user_id, version) if user_id is not None else None
+        if user is None:
+            return None
+
+        #only active users are cached, but the revocation claim belongs to the token, not the user.
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+    async def aauthenticate(self, request):
+        '''
+        authenticate() for async views. Token validation is pure computation and
+        the user usually comes from USER_CACHE (checked against its version
+        with the cache's async API), so the event loop only hands off to a
+        thread for the database on a cache miss.
+        '''
+        started = time.perf_counter()
+        try:
+            header = self.get_header(request)
+            raw_token = self.get_raw_token(header) if header is not None else None
+            if raw_token is None:
+                metrics.JWT_AUTHENTICATIONS.inc(outcome='anonymous')
+                return None
+            validated_token = self.get_validated_token(raw_token)
+            user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+            version = await auser_version(user_id) if user_id is not None else None
+            user = self.get_cached_user(validated_token, version)
+            if user is None:
+                user = await sync_to_async(self.get_user)(validated_token)
+        except AuthenticationFailed:
+            metrics.JWT_AUTHENTICATIONS.inc(outcome='failed')
+            raise
+        finally:
+            metrics.JWT_AUTHENTICATION_SECONDS.observe(time.perf_counter() - started)
+        metrics.JWT_AUTHENTICATIONS.inc(outcome='success')
+        return user, validated_token
@@ -1,5 +1,8 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .tokens import FastRefreshToken
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -21,3 +24,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
         return user
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    #rotates with FastRefreshToken; blacklisting the old token and storing the new one commit together.
+    token_class = FastRefreshToken
+
+    def validate(self, attrs):
+        #known blacklisted and expired tokens are turned away before a transaction is opened.
+        self.token_class(attrs['refresh'])
+        with transaction.atomic():
+            return super().validate(attrs)
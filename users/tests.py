@@ -1,9 +1,19 @@
 # users/tests.py
 
+from unittest import mock
+
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from users.authentication import USER_CACHE, UserCache, user_version
+from users.tokens import BLACKLISTED_JTIS
+from workouts import benchmark
 
 class UserAuthenticationTests(APITestCase):
     def setUp(self):
@@ -85,4 +95,113 @@ class UserAuthenticationTests(APITestCase):
             "password": "WrongPassword"
         }
         response = self.client.post(self.login_url, login_payload, format='json')
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        USER_CACHE.clear()
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="StrongPass123")
+        self.url = reverse('workout_list_create')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_user_is_loaded_once(self):
+        """
+        Test that only the first authenticated request queries the user row.
+        """
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second), len(first) - 1)
+        self.assertFalse(any('auth_user' in query['sql'] for query in second.captured_queries))
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Test that deactivating a user invalidates the cached entry.
+        """
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_deactivated_by_another_process_is_rejected(self):
+        """
+        Test that a cached user is checked against the version in the shared cache.
+        """
+        self.client.get(self.url)
+        version = user_version(self.user.id)
+        #the save happens elsewhere: this process's entry is left alone.
+        with mock.patch.object(USER_CACHE, "invalidate"), self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertIsNotNone(USER_CACHE.get(self.user.id, version))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        """
+        Test that deleting a user invalidates the cached entry.
+        """
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_is_bounded(self):
+        """
+        Test that the least recently used entry is evicted past max_entries.
+        """
+        cache = UserCache(max_entries=2, ttl=60)
+        for user_id in (1, 2, 3):
+            cache.set(user_id, self.user, cache.generation)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(3))
+
+
+class RefreshTokenRotationTests(APITestCase):
+    def setUp(self):
+        BLACKLISTED_JTIS.clear()
+        self.user = User.objects.create_user(username="testuser", email="testuser@example.com", password="StrongPass123")
+        self.refresh_url = reverse('token_refresh')
+        self.refresh = str(RefreshToken.for_user(self.user))
+
+    def test_refresh_rotates_token(self):
+        """
+        Test that a refresh returns a new access and refresh token.
+        """
+        response = self.client.post(self.refresh_url, {"refresh": self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+        response = self.client.post(self.refresh_url, {"refresh": response.data['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_reused_refresh_token_is_rejected_without_queries(self):
+        """
+        Test that a rotated-out refresh token is rejected from the in-memory blacklist.
+        """
+        self.client.post(self.refresh_url, {"refresh": self.refresh}, format='json')
+        with self.assertNumQueries(0):
+            response = self.client.post(self.refresh_url, {"refresh": self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_blacklisted_elsewhere_is_rejected(self):
+        """
+        Test that a token blacklisted by another process (not in this process's set) is rejected by the database.
+        """
+        self.client.post(self.refresh_url, {"refresh": self.refresh}, format='json')
+        BLACKLISTED_JTIS.clear()
+        response = self.client.post(self.refresh_url, {"refresh": self.refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_rotation_needs_fewer_queries_than_stock_serializer(self):
+        """
+        Test the rotation flood benchmark: fewer queries per rotation and none per replay.
+        """
+        stock = benchmark.refresh_flood(self.user, rotations=5, serializer_class=TokenRefreshSerializer)
+        fast = benchmark.refresh_flood(self.user, rotations=5)
+        self.assertLess(fast['queries_per_rotation'], stock['queries_per_rotation'])
+        self.assertEqual(fast['queries_per_replay'], 0)
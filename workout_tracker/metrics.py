@@ -0,0 +1,226 @@
+'''
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms live in a module-level registry and are served by
+metrics_view at /metrics. MetricsMiddleware records, for every request, the
+route (the URL pattern name, so ids in the path do not create new series),
+the latency and the number of SQL queries.
+
+Each worker process keeps its own registry, so with several gunicorn workers
+every scrape returns the values of the worker that served it. Scrape each
+worker (or run one worker per target) when the totals matter.
+'''
+import hmac
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .profiling import async_execute_wrapper
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self.collect().items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.collect().get(self._key(labels), 0)
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, amount, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, amount)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0])
+            state[0][index] += 1
+            state[1] += amount
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def count(self, **labels):
+        counts, _ = self.collect().get(self._key(labels), ([0], 0))
+        return sum(counts)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_number(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total', 'HTTP requests handled, by route, method and status code.', ['route', 'method', 'status']))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Time to produce the response, by route and method.', ['route', 'method']))
+HTTP_REQUEST_QUERIES = REGISTRY.register(Histogram(
+    'http_request_db_queries', 'SQL queries run per request, by route and method.', ['route', 'method'], QUERY_BUCKETS))
+JWT_AUTHENTICATIONS = REGISTRY.register(Counter(
+    'jwt_authentications_total', 'JWT authentication attempts, by outcome (success, anonymous or failed).', ['outcome']))
+JWT_AUTHENTICATION_SECONDS = REGISTRY.register(Histogram(
+    'jwt_authentication_duration_seconds', 'Time to validate a JWT and load its user.'))
+REPORT_QUERY_SECONDS = REGISTRY.register(Histogram(
+    'report_query_duration_seconds', 'Time spent in the queries of a workout report, by report type.', ['report_type']))
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with connections['default'].execute_wrapper(queries):
+            response = self.get_response(request)
+        self.record(request, response, queries.count, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        async with async_execute_wrapper(queries, ['default']):
+            response = await self.get_response(request)
+        self.record(request, response, queries.count, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, query_count, elapsed):
+        match = request.resolver_match
+        route = match.url_name if match and match.url_name else 'unmatched'
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        HTTP_REQUEST_SECONDS.observe(elapsed, route=route, method=request.method)
+        HTTP_REQUEST_QUERIES.observe(query_count, route=route, method=request.method)
+
+
+def metrics_view(request):
+    '''
+    Serve the registry in Prometheus text format to a scraper sending
+    METRICS_TOKEN as a Bearer token; never without a token, since the
+    metrics show the traffic of every route.
+    '''
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorization = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,145 @@
+'''
+Opt-in per-request SQL profiling.
+
+QueryProfilingMiddleware counts and times every query a request runs, through
+connection.execute_wrapper(), and reports the result as a Server-Timing
+header (visible in the browser's network panel):
+
+    Server-Timing: db;dur=12.4;desc="7 queries", app;dur=30.1, total;dur=42.5, dup;desc="2 repeated"
+
+"app" is the time spent outside the database (views, serializers and
+rendering). Queries are grouped by fingerprint (the SQL with literals and
+IN lists collapsed), and a fingerprint that runs more than once in a request
+is counted as repeated, which is how an N+1 pattern shows up.
+Requests slower than SLOW_REQUEST_MS are logged with their repeated and
+slowest fingerprints.
+
+Queries a StreamingHttpResponse runs while its body is sent are not counted.
+Enable with QUERY_PROFILING=True in the environment.
+'''
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('workout_tracker.profiling')
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    '''Normalise sql so that the same statement with different values gives the same string.'''
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryProfile:
+    '''Collects the queries of one request; used as a connection execute wrapper.'''
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_time = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            key = fingerprint(sql)
+            self.duration += elapsed
+            self.count += 1
+            self.fingerprints[key] += 1
+            self.fingerprint_time[key] += elapsed
+
+    def repeated(self):
+        '''(fingerprint, times) of every statement that ran more than once, most frequent first.'''
+        return [(sql, times) for sql, times in self.fingerprints.most_common() if times > 1]
+
+    def offenders(self, limit=5):
+        '''Repeated statements plus the slowest ones, as (fingerprint, times, total ms).'''
+        slowest = [sql for sql, _ in self.fingerprint_time.most_common(limit)]
+        keys = dict.fromkeys([sql for sql, _ in self.repeated()] + slowest)
+        return [(sql, self.fingerprints[sql], self.fingerprint_time[sql] * 1000) for sql in keys]
+
+
+@asynccontextmanager
+async def async_execute_wrapper(wrapper, aliases=None):
+    '''
+    connection.execute_wrapper() for async middleware. Database connections
+    belong to a thread, and the async ORM runs queries in the request's sync
+    thread, so the wrapper is installed on that thread's connections.
+    '''
+    stack = ExitStack()
+
+    def install():
+        for connection in [connections[alias] for alias in aliases] if aliases else connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+
+    await sync_to_async(install)()
+    try:
+        yield
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class QueryProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        return self.report(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile = QueryProfile()
+        started = time.perf_counter()
+        async with async_execute_wrapper(profile):
+            response = await self.get_response(request)
+        return self.report(request, response, profile, started)
+
+    def report(self, request, response, profile, started):
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = profile.duration * 1000
+        repeated = profile.repeated()
+
+        timings = [
+            f'db;dur={db_ms:.1f};desc="{profile.count} queries"',
+            f'app;dur={total_ms - db_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ]
+        if repeated:
+            timings.append(f'dup;desc="{len(repeated)} repeated"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        if total_ms > getattr(settings, 'SLOW_REQUEST_MS', 500):
+            logger.warning(
+                'Slow request %s %s: %.0fms total, %.0fms in %d queries%s',
+                request.method, request.path, total_ms, db_ms, profile.count,
+                ''.join(f'\n  {times}x {ms:.1f}ms {sql}' for sql, times, ms in profile.offenders()),
+            )
+        return response
@@ -32,7 +32,7 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -61,6 +61,9 @@ SIMPLE_JWT = {
     'SIGNING_KEY': os.getenv('JWT_SIGNING_KEY', os.getenv('SECRET_KEY')),
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    #rotation and blacklisting with fewer queries (see users.tokens.FastRefreshToken).
+    #Run "manage.py flushexpiredtokens" daily to purge expired outstanding and blacklisted tokens.
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.RotatingTokenRefreshSerializer',
     
     #Security hardening
     'AUTH_COOKIE': None,  # Set to 'jwt' if using cookies
@@ -69,6 +72,48 @@ SIMPLE_JWT = {
     'AUTH_COOKIE_SAMESITE': 'Lax',
 }
 
+#Upper bound on how long an authenticated user is served from the in-process cache (see users.authentication);
+#saves and deletes invalidate it earlier, in every process that shares the cache below.
+JWT_USER_CACHE_SECONDS = int(os.getenv('JWT_USER_CACHE_SECONDS', '60'))
+
+#Deleted rows are remembered this long for delta sync clients (see workouts.views.SyncAPIView).
+#Clients that have not synced for longer get a full snapshot instead.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+#The "server_time" watermark of a sync trails the clock by this much, so rows saved before it but committed
+#after the sync read them are sent by the next sync (rows around the watermark may be sent twice).
+SYNC_CLOCK_SKEW_SECONDS = int(os.getenv('SYNC_CLOCK_SKEW_SECONDS', '60'))
+#Rows of each kind per sync response; larger syncs are paged with the response's "cursor".
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+
+#How long a report, chart or analytics result stays cached (see workouts.caching); new data invalidates it earlier.
+REPORT_CACHE_SECONDS = int(os.getenv('REPORT_CACHE_SECONDS', '300'))
+
+#Local memory by default, which is per process: a write only invalidates the cache of the process that served it,
+#so set REDIS_URL (e.g. redis://localhost:6379/0, needs the redis package) when running more than one worker.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'workout-tracker',
+        }
+    }
+
+#Reminders for upcoming scheduled workouts, sent by "manage.py dispatch_reminders" (see workouts.reminders).
+#REMINDER_BACKEND is a dotted path: workouts.reminders.ConsoleReminderBackend, FileReminderBackend or EmailReminderBackend.
+REMINDER_BACKEND = os.getenv('REMINDER_BACKEND', 'workouts.reminders.ConsoleReminderBackend')
+REMINDER_FILE_PATH = os.getenv('REMINDER_FILE_PATH', str(BASE_DIR / 'reminders.jsonl'))
+REMINDER_LEAD_MINUTES = int(os.getenv('REMINDER_LEAD_MINUTES', '60'))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '100'))
+REMINDER_POLL_SECONDS = int(os.getenv('REMINDER_POLL_SECONDS', '60'))
+
 
 # Application definition
 
@@ -80,6 +125,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
     'users',
     'workouts',
     'exercises',
@@ -96,6 +142,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+#Per-request query count and DB time in a Server-Timing header, and a log line for slow requests.
+QUERY_PROFILING = os.getenv('QUERY_PROFILING') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+if QUERY_PROFILING:
+    MIDDLEWARE.insert(0, 'workout_tracker.profiling.QueryProfilingMiddleware')
+
+#Request, JWT and report metrics served in Prometheus text format at /metrics (see workout_tracker.metrics).
+#Off by default. The endpoint is only served to a scraper sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'workout_tracker.metrics.MetricsMiddleware')
+
 ROOT_URLCONF = 'workout_tracker.urls'
 
 TEMPLATES = [
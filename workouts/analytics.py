@@ -0,0 +1,94 @@
+'''
+Training analytics computed from the WorkoutExercise entries of a user's workout plans.
+
+Volume is sets x reps x weight. The estimated one-rep max (e1RM) of an entry
+follows the Epley formula, weight x (1 + reps / 30), or the Brzycki formula,
+weight x 36 / (37 - reps), which is only defined below 37 reps; a single rep
+is its own one-rep max. Entries without a weight (bodyweight exercises) count
+towards sets and reps but not towards volume or e1RM.
+
+exercise_summary() aggregates per exercise in one grouped query, so the
+entries never leave the database. Personal records are not computed here but
+maintained on write in PersonalRecord, see workouts.records.
+'''
+from django.db.models import Case, Count, F, FloatField, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import WorkoutExercise
+
+EPLEY = 'epley'
+BRZYCKI = 'brzycki'
+FORMULAS = [EPLEY, BRZYCKI]
+
+
+def e1rm(weight, reps, formula=EPLEY):
+    '''Estimated one-rep max of weight lifted for reps, or None when it is not defined.'''
+    if not weight or not reps:
+        return None
+    if reps == 1:
+        return weight
+    if formula == EPLEY:
+        return weight * (1 + reps / 30)
+    if formula == BRZYCKI:
+        return weight * 36 / (37 - reps) if reps < 37 else None
+    raise ValueError(f"Unknown e1RM formula '{formula}'.")
+
+
+def e1rm_expression(formula=EPLEY):
+    '''The e1rm() of an entry as a database expression, to aggregate over WorkoutExercise rows.'''
+    weight, reps = F('weight'), F('reps')
+    if formula == EPLEY:
+        estimate = weight * (Value(1.0) + reps / Value(30.0))
+        undefined = Q(reps__lt=1)
+    elif formula == BRZYCKI:
+        estimate = weight * Value(36.0) / (Value(37.0) - reps)
+        undefined = Q(reps__lt=1) | Q(reps__gte=37)
+    else:
+        raise ValueError(f"Unknown e1RM formula '{formula}'.")
+    return Case(
+        When(undefined, then=Value(None)),
+        When(reps=1, then=weight),
+        default=estimate,
+        output_field=FloatField(),
+    )
+
+
+def exercise_summary(user, formula=EPLEY, start=None, end=None):
+    '''
+    Per-exercise totals of the user's entries, optionally only those of plans
+    created between start (inclusive) and end (exclusive): number of plans,
+    sets, reps (sets x reps), volume, heaviest weight and best e1RM.
+    '''
+    entries = WorkoutExercise.objects.for_user(user)
+    if start is not None:
+        entries = entries.filter(workout__created_at__gte=start)
+    if end is not None:
+        entries = entries.filter(workout__created_at__lt=end)
+    return (
+        entries.values('exercise_id', 'exercise__name')
+        .annotate(
+            workouts=Count('workout', distinct=True),
+            total_sets=Sum('sets'),
+            total_reps=Sum(F('sets') * F('reps')),
+            volume=Coalesce(Sum(F('sets') * F('reps') * F('weight'), output_field=FloatField()), Value(0.0)),
+            max_weight=Max('weight'),
+            best_e1rm=Max(e1rm_expression(formula)),
+        )
+        .order_by('exercise__name', 'exercise_id')
+    )
+
+
+def format_summary(rows):
+    return [
+        {
+            'exercise': row['exercise_id'],
+            'name': row['exercise__name'],
+            'workouts': row['workouts'],
+            'total_sets': row['total_sets'],
+            'total_reps': row['total_reps'],
+            'volume': row['volume'],
+            'max_weight': row['max_weight'],
+            'best_e1rm': row['best_e1rm'],
+        }
+        for row in rows
+    ]
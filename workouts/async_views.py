@@ -0,0 +1,145 @@
+'''
+Async read endpoints for ASGI deployments.
+
+These mirror the workout list, schedule list and report GET endpoints of
+workouts.views, but are plain Django async views using the async ORM, so one
+ASGI worker can keep many slow client connections open without holding a
+thread for each. DRF's APIView is sync only, which is why authentication,
+errors, throttling and JSON rendering are done by hand here. Responses are
+the same as the sync endpoints', and requests count against the same DRF
+throttle rates (DEFAULT_THROTTLE_CLASSES, on the same cache).
+
+Under WSGI (runserver, gunicorn sync workers) the views still work, but
+Django runs each one in its own event loop, which costs more than the sync view.
+'''
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from users.authentication import CachedJWTAuthentication
+from workout_tracker import metrics
+from . import caching, reports
+from .models import ScheduledWorkout, WorkoutPlan
+from .pagination import KeysetPagination
+from .serializers import ScheduledWorkoutSerializer, WorkoutPlanSerializer
+
+CHUNK_SIZE = 500
+
+authentication = CachedJWTAuthentication()
+
+
+def _error(detail, status, **headers):
+    return JsonResponse({'detail': str(detail)}, status=status, headers=headers)
+
+
+def _throttle_wait(request, user):
+    '''Seconds to wait if one of the default DRF throttles refuses the request, else None.'''
+    drf_request = Request(request)
+    drf_request.user = user
+    waits = []
+    for throttle in (throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES):
+        if not throttle.allow_request(drf_request, None):
+            waits.append(throttle.wait() or 0)
+    return max(waits) if waits else None
+
+
+async def _authenticate(request):
+    '''Returns (user, None), or (None, error response) for a missing or invalid token or a throttled request.'''
+    try:
+        result = await authentication.aauthenticate(request)
+    except AuthenticationFailed as error:
+        detail = error.detail.get('detail', error.detail) if isinstance(error.detail, dict) else error.detail
+        return None, _error(detail, 401, **{'WWW-Authenticate': authentication.authenticate_header(request)})
+    if result is None:
+        return None, _error(
+            'Authentication credentials were not provided.', 401,
+            **{'WWW-Authenticate': authentication.authenticate_header(request)},
+        )
+    user = result[0]
+    wait = await sync_to_async(_throttle_wait)(request, user)
+    if wait is not None:
+        return None, _error(
+            f'Request was throttled. Expected available in {int(wait)} seconds.', 429, **{'Retry-After': str(int(wait))}
+        )
+    return user, None
+
+
+@require_GET
+async def workout_list(request):
+    """
+    Async version of the workout plan list (GET workouts/): the user's plans,
+    newest first, cursor-paginated like KeysetPagination.
+    """
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    paginator = KeysetPagination()
+    workouts = WorkoutPlan.objects.for_user(user).prefetch_related('exercises')
+    try:
+        page = await paginator.apaginate_queryset(workouts, Request(request))
+    except NotFound as not_found:
+        return _error(not_found.detail, 404)
+    #exercises are prefetched and serialized by primary key, so serializing runs no queries.
+    data = WorkoutPlanSerializer(page, many=True).data
+    return JsonResponse(paginator.get_paginated_data(data))
+
+
+async def _json_array(queryset, serializer_class):
+    #written one chunk of rows at a time, so neither the rows nor the JSON are held in memory at once.
+    serializer = serializer_class()
+    yield '['
+    separator = ''
+    async for instance in queryset.aiterator(chunk_size=CHUNK_SIZE):
+        yield separator + json.dumps(serializer.to_representation(instance), cls=DjangoJSONEncoder)
+        separator = ','
+    yield ']'
+
+
+@require_GET
+async def scheduled_workout_list(request):
+    """
+    Async version of the scheduled workout lists (GET scheduled_workouts/ and
+    scheduled_workouts/sorted/), streamed as a JSON array.
+
+    Optional Query Parameter:
+        - order: 'asc' (default) for ascending, 'desc' for descending scheduled_datetime.
+    """
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    ordering = '-scheduled_datetime' if request.GET.get('order', 'asc').lower() == 'desc' else 'scheduled_datetime'
+    schedules = ScheduledWorkout.objects.for_user(user).order_by(ordering, 'id')
+    return StreamingHttpResponse(_json_array(schedules, ScheduledWorkoutSerializer), content_type='application/json')
+
+
+@require_GET
+async def workout_report(request):
+    """
+    Async version of the workout report (GET reports/workouts/).
+
+    Query Parameter:
+        - report_type: "frequency" (default) or "progress", see WorkoutReportAPIView.
+    """
+    user, error = await _authenticate(request)
+    if error:
+        return error
+
+    report_type = request.GET.get('report_type', 'frequency').lower()
+    if report_type not in reports.REPORTS:
+        return _error('Invalid report type.', 400)
+
+    async def compute():
+        with metrics.REPORT_QUERY_SECONDS.time(report_type=report_type):
+            rollups = [rollup async for rollup in reports.report_queryset(report_type, user)]
+        return reports.format_report(report_type, rollups)
+
+    #same cache entries as the sync view.
+    return JsonResponse(await caching.acached('report', user.id, {'report_type': report_type}, compute))
@@ -0,0 +1,469 @@
+'''
+Query-count, latency and memory benchmark of every API route.
+
+seed() fills the database with a configurable volume of realistic data and
+run() replays each route in ROUTE_CASES through the full Django stack
+(JWT authentication included), recording per route:
+
+    - queries: the highest number of SQL queries of one request,
+    - p50_ms / p95_ms: request latency percentiles,
+    - peak_kib: peak Python memory allocated during one request.
+
+GET routes are also replayed for a user with a single workout, and paginated
+routes with a page of one row; a route whose query count differs between the
+two users, or between the two page sizes, issues queries per row (N+1).
+Routes whose results are cached (workouts.caching, the exercise catalog) are
+measured cold, with the caches invalidated before every request, and the
+workout report and catalog list also warm, as cache hits.
+compare() checks results against a stored baseline. The benchmark_api
+management command wires these together on a throwaway test database.
+'''
+import datetime
+import itertools
+import statistics
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from exercises import cache as catalog_cache
+from exercises.importers import upsert_exercises
+from users.serializers import RotatingTokenRefreshSerializer
+from exercises.models import Exercise
+from . import caching, records, recurrence, rollups
+from .models import (
+    RecurrenceException, RecurringSchedule, ScheduledWorkout, WorkoutComment, WorkoutExercise, WorkoutPerformance, WorkoutPlan,
+)
+
+PASSWORD = 'Benchmark-pass-123'
+URL_MODULES = ['workouts.urls', 'users.urls', 'exercises.urls']
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Case:
+    '''
+    One benchmarked request. url_kwargs, data and params may be callables
+    taking the fixture dict, so they can refer to seeded rows or create a
+    fresh row per iteration (e.g. something to delete). cold invalidates the
+    user's cached results and the catalog cache before each request, so they
+    are computed; paged routes are also measured with page_size=1.
+    '''
+    def __init__(self, url_name, method='get', url_kwargs=None, data=None, params=None, auth=True, label=None, cold=False,
+                 paged=False):
+        self.url_name = url_name
+        self.method = method
+        self.url_kwargs = url_kwargs
+        self.data = data
+        self.params = params
+        self.auth = auth
+        self.cold = cold
+        self.paged = paged
+        self.label = label or f'{method.upper()} {url_name}'
+
+    def resolve(self, value, fixture):
+        return value(fixture) if callable(value) else value
+
+
+def _plan_payload(fixture):
+    return {
+        'title': 'Benchmark plan',
+        'description': 'Created by the benchmark',
+        'exercises': [
+            {'exercise': exercise_id, 'sets': 3, 'reps': 10, 'weight': 40.0}
+            for exercise_id in fixture['exercise_ids'][:5]
+        ],
+    }
+
+
+def _new_schedule(fixture):
+    return ScheduledWorkout.objects.create(
+        user=fixture['user'], workout=fixture['workout'], scheduled_datetime=fixture['now']
+    ).pk
+
+
+def _new_comment(fixture):
+    return WorkoutComment.objects.create(user=fixture['user'], workout=fixture['workout'], comment='Temporary').pk
+
+
+def _new_performance(fixture):
+    return WorkoutPerformance.objects.create(user=fixture['user'], workout=fixture['workout'], performance_metric=1.0).pk
+
+
+def _new_recurring(fixture):
+    return RecurringSchedule.objects.create(
+        user=fixture['user'], workout=fixture['workout'], start=fixture['now'], frequency='DAILY'
+    ).pk
+
+
+def _occurrence(fixture, number):
+    return next(itertools.islice(recurrence.occurrences(fixture['recurring']), number, None))
+
+
+def _new_exception(fixture):
+    return RecurrenceException.objects.create(
+        recurring_schedule=fixture['recurring'], original_datetime=_occurrence(fixture, 2), is_cancelled=True
+    ).pk
+
+
+def _new_plan(fixture):
+    return WorkoutPlan.objects.create(user=fixture['user'], title='Temporary', description='').pk
+
+
+def _unique_user(fixture):
+    number = next(fixture['counter'])
+    return {
+        'username': f'benchmark-new-{number}',
+        'email': f'benchmark-new-{number}@example.com',
+        'password': PASSWORD,
+        'password2': PASSWORD,
+    }
+
+
+ROUTE_CASES = [
+    Case('workout_list_create'),
+    Case('workout_list_create', params={'page_size': 100}, label='GET workout_list_create?page_size=100', paged=True),
+    Case('workout_list_create', 'post', data=_plan_payload),
+    Case('workout_detail', url_kwargs=lambda f: {'pk': f['workout'].pk}),
+    Case('workout_detail', 'put', url_kwargs=lambda f: {'pk': f['workout'].pk}, data=_plan_payload),
+    Case('workout_detail', 'delete', url_kwargs=lambda f: {'pk': _new_plan(f)}),
+    Case('scheduled_workout_list_create'),
+    Case('scheduled_workout_list_create', 'post',
+         data=lambda f: {'workout': f['workout'].pk, 'scheduled_datetime': f['now'].isoformat()}),
+    Case('scheduled_workout_detail', url_kwargs=lambda f: {'pk': f['schedule'].pk}),
+    Case('scheduled_workout_detail', 'put', url_kwargs=lambda f: {'pk': f['schedule'].pk},
+         data=lambda f: {'workout': f['workout'].pk, 'scheduled_datetime': f['now'].isoformat()}),
+    Case('scheduled_workout_detail', 'delete', url_kwargs=lambda f: {'pk': _new_schedule(f)}),
+    Case('scheduled_workout_sorted', params={'order': 'desc'}),
+    Case('scheduled_workout_calendar', params=lambda f: {
+        'start': f['now'].date().replace(day=1).isoformat(),
+        'end': (f['now'] + datetime.timedelta(days=31)).date().isoformat(),
+        'bucket': 'week',
+        'tz': 'Europe/Berlin',
+    }),
+    Case('recurring_schedule_list_create'),
+    Case('recurring_schedule_list_create', 'post', data=lambda f: {
+        'workout': f['workout'].pk, 'start': f['now'].isoformat(), 'timezone': 'Europe/Berlin',
+        'frequency': 'WEEKLY', 'weekdays': ['MO', 'TH'], 'count': 20,
+    }),
+    Case('recurring_schedule_detail', url_kwargs=lambda f: {'pk': f['recurring'].pk}),
+    Case('recurring_schedule_detail', 'put', url_kwargs=lambda f: {'pk': f['recurring'].pk}, data=lambda f: {
+        'workout': f['workout'].pk, 'start': f['recurring'].start.isoformat(), 'timezone': 'Europe/Berlin',
+        'frequency': 'WEEKLY', 'weekdays': ['MO', 'WE', 'FR'],
+    }),
+    Case('recurring_schedule_detail', 'delete', url_kwargs=lambda f: {'pk': _new_recurring(f)}),
+    Case('recurring_schedule_occurrences', url_kwargs=lambda f: {'pk': f['recurring'].pk}, params=lambda f: {
+        'start': f['now'].date().isoformat(),
+        'end': (f['now'] + datetime.timedelta(days=366)).date().isoformat(),
+    }),
+    Case('recurrence_exception_list_create', url_kwargs=lambda f: {'pk': f['recurring'].pk}),
+    Case('recurrence_exception_list_create', 'post', url_kwargs=lambda f: {'pk': f['recurring'].pk},
+         data=lambda f: {'original_datetime': _occurrence(f, 1).isoformat(), 'is_cancelled': True}),
+    Case('recurrence_exception_detail', 'delete',
+         url_kwargs=lambda f: {'pk': f['recurring'].pk, 'exception_pk': _new_exception(f)}),
+    Case('workout_comment_list_create'),
+    Case('workout_comment_list_create', 'post', data=lambda f: {'workout': f['workout'].pk, 'comment': 'Benchmark'}),
+    Case('workout_comment_detail', url_kwargs=lambda f: {'pk': f['comment'].pk}),
+    Case('workout_comment_detail', 'put', url_kwargs=lambda f: {'pk': f['comment'].pk},
+         data=lambda f: {'workout': f['workout'].pk, 'comment': 'Edited'}),
+    Case('workout_comment_detail', 'delete', url_kwargs=lambda f: {'pk': _new_comment(f)}),
+    Case('workout_performance_list_create'),
+    Case('workout_performance_list_create', 'post', data=lambda f: {'workout': f['workout'].pk, 'performance_metric': 5.0}),
+    Case('workout_performance_bulk_create', 'post',
+         data=lambda f: [{'workout': f['workout'].pk, 'performance_metric': float(i)} for i in range(100)]),
+    Case('workout_performance_detail', url_kwargs=lambda f: {'pk': f['performance'].pk}),
+    Case('workout_performance_detail', 'put', url_kwargs=lambda f: {'pk': f['performance'].pk},
+         data=lambda f: {'workout': f['workout'].pk, 'performance_metric': 7.5}),
+    Case('workout_performance_detail', 'delete', url_kwargs=lambda f: {'pk': _new_performance(f)}),
+    Case('sync'),
+    Case('export', params={'resource': 'workout_performances', 'fmt': 'csv'}),
+    Case('workout_report', params={'report_type': 'frequency'}, cold=True),
+    Case('workout_report', params={'report_type': 'progress'}, label='GET workout_report?report_type=progress', cold=True),
+    Case('workout_report', params={'report_type': 'progress'}, label='GET workout_report?report_type=progress (cached)'),
+    Case('workout_report', params={'report_type': 'volume', 'bucket': 'week', 'group_by': 'category', 'metrics': 'count,sum,median,p90'},
+         label='GET workout_report?report_type=volume', cold=True),
+    Case('exercise_analytics', params={'formula': 'brzycki'}, cold=True),
+    Case('personal_record_list'),
+    Case('personal_record_history', url_kwargs=lambda f: {'exercise_id': f['exercise_ids'][0]}, cold=True),
+    Case('performance_chart', params={'points': 100, 'algorithm': 'minmax'}, cold=True),
+    Case('performance_chart', params={'points': 100, 'granularity': 'week'}, label='GET performance_chart?granularity=week', cold=True),
+    Case('async_workout_list', paged=True),
+    Case('async_scheduled_workout_list', params={'order': 'desc'}),
+    Case('async_workout_report', params={'report_type': 'progress'}, cold=True),
+    Case('exercise_list', cold=True),
+    Case('exercise_list', label='GET exercise_list (cached)'),
+    Case('exercise_search', params={'q': 'benchmark ex'}, cold=True),
+    Case('exercise_detail', url_kwargs=lambda f: {'pk': f['exercise_ids'][0]}, cold=True),
+    Case('user_register', 'post', data=_unique_user, auth=False),
+    Case('token_obtain_pair', 'post', data=lambda f: {'username': f['user'].username, 'password': PASSWORD}, auth=False),
+    Case('token_refresh', 'post', data=lambda f: {'refresh': str(RefreshToken.for_user(f['user']))}, auth=False),
+]
+
+
+def _url_names(module_name):
+    module = __import__(module_name, fromlist=['urlpatterns'])
+    return {pattern.name for pattern in module.urlpatterns if pattern.name}
+
+
+def uncovered_routes():
+    '''Names of routes in URL_MODULES without a benchmark case.'''
+    covered = {case.url_name for case in ROUTE_CASES}
+    names = set().union(*(_url_names(module) for module in URL_MODULES))
+    return sorted(names - covered)
+
+
+def seed(users=50, plans_per_user=20, performances_per_plan=10, exercises=50, batch_size=2000):
+    '''
+    Insert the benchmark data set with bulk statements and return the fixture dict used by the cases.
+    For example users=1000, plans_per_user=100, performances_per_plan=10 gives 100k plans and 1M performances.
+    '''
+    upsert_exercises(
+        {'name': f'Benchmark exercise {i}', 'description': 'Seeded by the benchmark', 'category': 'strength'}
+        for i in range(exercises)
+    )
+    exercise_ids = list(Exercise.objects.filter(name__startswith='Benchmark exercise ').values_list('id', flat=True))
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        [User(username=f'benchmark-{i}', email=f'benchmark-{i}@example.com', password=password) for i in range(users)],
+        batch_size=batch_size,
+    )
+
+    for user in created:
+        plans = WorkoutPlan.objects.bulk_create(
+            [WorkoutPlan(user=user, title=f'Plan {i}', description='Seeded') for i in range(plans_per_user)],
+            batch_size=batch_size,
+        )
+        rollups.record_workouts_created(plans)
+        entries = WorkoutExercise.objects.bulk_create(
+            [WorkoutExercise(workout=plan, exercise_id=exercise_ids[(plan.pk + i) % len(exercise_ids)], sets=3, reps=10,
+                             weight=50.0 + (plan.pk + i) % 20)
+             for plan in plans for i in range(3)],
+            batch_size=batch_size,
+        )
+        records.record_exercises_created(entries)
+        ScheduledWorkout.objects.bulk_create(
+            [ScheduledWorkout(user=user, workout=plan, scheduled_datetime=plan.created_at) for plan in plans],
+            batch_size=batch_size,
+        )
+        WorkoutComment.objects.bulk_create(
+            [WorkoutComment(user=user, workout=plan, comment='Seeded') for plan in plans],
+            batch_size=batch_size,
+        )
+        performances = WorkoutPerformance.objects.bulk_create(
+            [WorkoutPerformance(user=user, workout=plan, performance_metric=float(i % 50), notes='')
+             for plan in plans for i in range(performances_per_plan)],
+            batch_size=batch_size,
+        )
+        rollups.record_performances_created(performances)
+        caching.bump(user.id)
+        RecurringSchedule.objects.create(
+            user=user, workout=plans[0], start=plans[0].created_at, timezone='Europe/Berlin',
+            frequency='WEEKLY', weekdays='MO,WE,FR',
+        )
+
+    user = created[0]
+    light_user = User.objects.create(username='benchmark-light', email='benchmark-light@example.com', password=password)
+    light_workout = WorkoutPlan.objects.create(user=light_user, title='Only plan', description='')
+    records.record_exercises_created([
+        WorkoutExercise.objects.create(workout=light_workout, exercise_id=exercise_ids[0], sets=3, reps=10, weight=40.0)
+    ])
+    for model, kwargs in ((ScheduledWorkout, {'scheduled_datetime': light_workout.created_at}),
+                          (WorkoutComment, {'comment': 'Only comment'}),
+                          (RecurringSchedule, {'start': light_workout.created_at, 'frequency': 'DAILY'}),
+                          (WorkoutPerformance, {'performance_metric': 1.0})):
+        model.objects.create(user=light_user, workout=light_workout, **kwargs)
+
+    return {
+        'user': user,
+        'light_user': light_user,
+        'workout': WorkoutPlan.objects.for_user(user).first(),
+        'schedule': ScheduledWorkout.objects.for_user(user).first(),
+        'comment': WorkoutComment.objects.for_user(user).first(),
+        'performance': WorkoutPerformance.objects.for_user(user).first(),
+        'recurring': RecurringSchedule.objects.for_user(user).first(),
+        'exercise_ids': exercise_ids,
+        'now': light_workout.created_at,
+        'counter': itertools.count(),
+    }
+
+
+def _client(case, user):
+    client = APIClient()
+    if case.auth:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+def _drain(response):
+    if response.is_async:
+        async def consume():
+            async for _ in response.streaming_content:
+                pass
+        async_to_sync(consume)()
+    else:
+        for _ in response.streaming_content:
+            pass
+
+
+def _request(case, fixture, user, extra_params=None):
+    url = reverse(case.url_name, kwargs=case.resolve(case.url_kwargs, fixture))
+    params = dict(case.resolve(case.params, fixture) or {}, **(extra_params or {}))
+    if params:
+        url = f'{url}?{urlencode(params)}'
+    data = case.resolve(case.data, fixture)
+    client = _client(case, user)
+    if case.cold:
+        caching.bump(user.id)
+        catalog_cache.invalidate()
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        send = getattr(client, case.method)
+        response = send(url) if data is None else send(url, data, format='json')
+        if response.streaming:
+            _drain(response)
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise BenchmarkError(f'{case.label} returned {response.status_code}')
+    return len(queries), elapsed
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _measure(case, fixture, iterations):
+    _request(case, fixture, fixture['user'])  # warm up
+    counts, timings = [], []
+    for _ in range(iterations):
+        count, elapsed = _request(case, fixture, fixture['user'])
+        counts.append(count)
+        timings.append(elapsed * 1000)
+
+    #memory is measured on a separate request, tracing would distort the timings.
+    tracemalloc.start()
+    try:
+        _request(case, fixture, fixture['user'])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'queries': max(counts),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+    if case.method == 'get' and case.auth:
+        light = dict(fixture, **_light_fixture(fixture))
+        _request(case, light, fixture['light_user'])  # warm up, as for the measured user
+        result['scaling_queries'] = _request(case, light, fixture['light_user'])[0]
+    if case.paged:
+        _request(case, fixture, fixture['user'], {'page_size': 1})  # warm up
+        result['page_queries'] = _request(case, fixture, fixture['user'], {'page_size': 1})[0]
+    return result
+
+
+def run(fixture, iterations=20, cases=None):
+    '''
+    Benchmark every case; returns {label: {queries, p50_ms, p95_ms, peak_kib, scaling_queries, page_queries}},
+    or {label: {error}} for a route that failed.
+    '''
+    results = {}
+    no_throttling = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_CLASSES=[])
+    with override_settings(REST_FRAMEWORK=no_throttling):
+        for case in cases or ROUTE_CASES:
+            try:
+                results[case.label] = _measure(case, fixture, iterations)
+            except Exception as error:
+                #keep going, a broken route is reported by compare() instead of hiding the others.
+                results[case.label] = {'error': f'{type(error).__name__}: {error}'}
+    return results
+
+
+def _light_fixture(fixture):
+    user = fixture['light_user']
+    return {
+        'workout': WorkoutPlan.objects.for_user(user).first(),
+        'schedule': ScheduledWorkout.objects.for_user(user).first(),
+        'comment': WorkoutComment.objects.for_user(user).first(),
+        'performance': WorkoutPerformance.objects.for_user(user).first(),
+        'recurring': RecurringSchedule.objects.for_user(user).first(),
+    }
+
+
+def refresh_flood(user, rotations=200, serializer_class=RotatingTokenRefreshSerializer):
+    '''
+    Rotate a refresh token `rotations` times in a row, then replay the first
+    (now blacklisted) token as often. Returns rotations and rejected replays
+    per second and the queries each takes.
+    '''
+    token = str(RefreshToken.for_user(user))
+    first = token
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(rotations):
+            serializer = serializer_class(data={'refresh': token})
+            serializer.is_valid(raise_exception=True)
+            token = serializer.validated_data['refresh']
+        rotation_seconds = time.perf_counter() - started
+    rotation_queries = len(queries)
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for _ in range(rotations):
+            try:
+                serializer_class(data={'refresh': first}).is_valid(raise_exception=True)
+            except TokenError:
+                continue
+            raise BenchmarkError('A blacklisted refresh token was accepted.')
+        replay_seconds = time.perf_counter() - started
+
+    return {
+        'rotations_per_s': round(rotations / rotation_seconds, 1),
+        'queries_per_rotation': round(rotation_queries / rotations, 2),
+        'replays_per_s': round(rotations / replay_seconds, 1),
+        'queries_per_replay': round(len(queries) / rotations, 2),
+    }
+
+
+def compare(results, baseline=None, tolerance=1.5, slack_ms=2.0):
+    '''
+    Return a list of regressions: query counts that depend on data volume or page size,
+    query counts above the baseline, and p95 latency above baseline * tolerance
+    (plus slack_ms, so sub-millisecond noise is not reported).
+    '''
+    problems = []
+    for label, result in results.items():
+        if 'error' in result:
+            problems.append(f"{label}: {result['error']}")
+            continue
+        if 'scaling_queries' in result and result['scaling_queries'] != result['queries']:
+            problems.append(
+                f"{label}: {result['queries']} queries for a large history but "
+                f"{result['scaling_queries']} for a single workout"
+            )
+        if 'page_queries' in result and result['page_queries'] != result['queries']:
+            problems.append(f"{label}: {result['queries']} queries for a full page but {result['page_queries']} for a page of one")
+        expected = (baseline or {}).get(label)
+        if not expected:
+            continue
+        if result['queries'] > expected['queries']:
+            problems.append(f"{label}: {result['queries']} queries, baseline {expected['queries']}")
+        limit = expected['p95_ms'] * tolerance + slack_ms
+        if result['p95_ms'] > limit:
+            problems.append(f"{label}: p95 {result['p95_ms']:.1f}ms, baseline {expected['p95_ms']:.1f}ms")
+    return problems
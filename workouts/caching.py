@@ -0,0 +1,107 @@
+'''
+Per-user cache of report and dashboard results.
+
+Results are stored in Django's cache (see CACHES in settings: local memory by
+default, Redis when REDIS_URL is set) under a key made of the endpoint, the
+user, the request parameters and the user's data version. The version is a
+counter, kept in the same cache, that bump() increments whenever one of the
+user's workout plans, exercise entries or performances is written (see
+workouts.signals, and the bulk paths that call bump() themselves). The key
+also holds the version of the exercise catalog, bumped by bump_catalog()
+whenever exercises change (names and categories show up in the results).
+Results computed before a write are never read again and simply expire, so
+a repeated report costs no query at all.
+
+Counters start at time.time_ns(), so a counter that was evicted or lost in
+a cache restart comes back above every value it had before and cannot make
+old results current again.
+'''
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CATALOG_VERSION_KEY = 'catalog-version'
+
+
+def _version_key(user_id):
+    return f'data-version:{user_id}'
+
+
+def _read(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+async def _aread(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key, time.time_ns())
+    return version
+
+
+def data_version(user_id):
+    return _read(_version_key(user_id))
+
+
+def catalog_version():
+    return _read(CATALOG_VERSION_KEY)
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        #no counter (never read, or evicted): a new one starts above any earlier value.
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def _bump(key):
+    #again when the current transaction commits: until then other requests still read the old rows,
+    #and could cache a result computed from them under the new version.
+    _increment(key)
+    transaction.on_commit(lambda: _increment(key))
+
+
+def bump(user_id):
+    '''Invalidate the user's cached results.'''
+    _bump(_version_key(user_id))
+
+
+def bump_catalog():
+    '''Invalidate every user's cached results, after a change of the exercise catalog.'''
+    _bump(CATALOG_VERSION_KEY)
+
+
+def cache_key(namespace, user_id, version, params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{namespace}:{user_id}:{version}:{digest}'
+
+
+def cached(namespace, user_id, params, compute):
+    '''compute() for this user and params (a JSON-serializable dict), cached for REPORT_CACHE_SECONDS or until the user's data changes.'''
+    key = cache_key(namespace, user_id, f'{data_version(user_id)}.{catalog_version()}', params)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, settings.REPORT_CACHE_SECONDS)
+    return result
+
+
+async def acached(namespace, user_id, params, compute):
+    '''cached() for async views; compute is a coroutine function.'''
+    version = f'{await _aread(_version_key(user_id))}.{await _aread(CATALOG_VERSION_KEY)}'
+    key = cache_key(namespace, user_id, version, params)
+    result = await cache.aget(key)
+    if result is None:
+        result = await compute()
+        await cache.aset(key, result, settings.REPORT_CACHE_SECONDS)
+    return result
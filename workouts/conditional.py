@@ -0,0 +1,58 @@
+'''
+Conditional GET for the workouts endpoints.
+
+Detail and list responses carry an ETag computed from the updated_at of the
+rows they show, so a polling client can send it back in If-None-Match and
+get 304 Not Modified, decided before anything is serialized:
+
+    - detail_etag(): the object's updated_at. Detail responses also carry a
+      Last-Modified header, for clients that send If-Modified-Since.
+    - list_etag(): the number of rows the list is drawn from and their
+      latest updated_at, in one aggregate query. The count catches deletes,
+      which leave the latest updated_at alone; for the same reason lists
+      have no Last-Modified.
+
+Both include the user and the request path with its query string, since
+pages, filters and orderings of the same rows differ. The ETags are weak:
+the JSON and browsable API renderings of a resource are not byte-identical.
+Nested rows are covered by their parent: writes of a plan's exercise
+entries also save the plan (see WorkoutPlanSerializer and workouts.signals).
+'''
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _etag(request, *parts):
+    key = repr((request.user.pk, request.get_full_path()) + parts)
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+
+def detail_etag(request, instance):
+    return _etag(request, instance.updated_at.isoformat())
+
+
+def list_etag(request, queryset):
+    stamp = queryset.order_by().aggregate(count=Count('pk'), last=Max('updated_at'))
+    return _etag(request, stamp['count'], stamp['last'].isoformat() if stamp['last'] else None)
+
+
+def respond(request, etag, build, last_modified=None):
+    '''
+    304 Not Modified (or 412 for a failed If-Match) if the client's copy is
+    current, else build(), the full response; either way with the ETag and
+    Last-Modified headers.
+    '''
+    #HTTP dates have whole seconds: two changes within one second share a Last-Modified, not an ETag.
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.headers['ETag'] = etag
+    if timestamp is not None:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    return response
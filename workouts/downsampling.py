@@ -0,0 +1,75 @@
+'''
+Downsampling of time series for charts.
+
+A chart cannot show more points than it has pixels, so series are reduced
+on the server to a requested number of points before they are sent. Both
+functions take a list of (x, y, ...) points sorted by x, with numeric x
+(e.g. a timestamp), and return a subset of them, in order, keeping the first
+and last point. Items after y are carried along untouched:
+
+    - lttb(): Largest-Triangle-Three-Buckets (Steinarsson, 2013). Keeps the
+      point of every bucket that forms the largest triangle with its
+      neighbours, which preserves the visual shape of the line.
+    - minmax(): the lowest and highest point of every bucket, so no peak or
+      dip is lost; better for noisy series where the extremes matter.
+'''
+ALGORITHMS = ['lttb', 'minmax']
+
+
+def _bucket_bounds(length, buckets):
+    '''Start and end indexes of `buckets` equal slices of range(1, length - 1): the first and last point are kept apart.'''
+    size = (length - 2) / buckets
+    return [(1 + int(i * size), 1 + int((i + 1) * size)) for i in range(buckets)]
+
+
+def lttb(points, threshold):
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    bounds = _bucket_bounds(len(points), threshold - 2)
+    previous = points[0]
+    for i, (start, end) in enumerate(bounds):
+        #the third corner of the triangle is the average of the next bucket (or the last point).
+        if i + 1 < len(bounds):
+            next_start, next_end = bounds[i + 1]
+            following = points[next_start:next_end]
+            average_x = sum(point[0] for point in following) / len(following)
+            average_y = sum(point[1] for point in following) / len(following)
+        else:
+            average_x, average_y = points[-1][0], points[-1][1]
+
+        best, best_area = None, -1.0
+        previous_x, previous_y = previous[0], previous[1]
+        for point in points[start:end]:
+            x, y = point[0], point[1]
+            area = abs((previous_x - average_x) * (y - previous_y) - (previous_x - x) * (average_y - previous_y))
+            if area > best_area:
+                best, best_area = point, area
+        sampled.append(best)
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, threshold):
+    if threshold >= len(points) or threshold < 4:
+        return list(points)
+
+    sampled = [points[0]]
+    for start, end in _bucket_bounds(len(points), (threshold - 2) // 2):
+        bucket = points[start:end]
+        low = min(range(len(bucket)), key=lambda index: bucket[index][1])
+        high = max(range(len(bucket)), key=lambda index: bucket[index][1])
+        for index in sorted({low, high}):
+            sampled.append(bucket[index])
+    sampled.append(points[-1])
+    return sampled
+
+
+def downsample(points, threshold, algorithm='lttb'):
+    if algorithm == 'lttb':
+        return lttb(points, threshold)
+    if algorithm == 'minmax':
+        return minmax(points, threshold)
+    raise ValueError(f"Unknown downsampling algorithm '{algorithm}'.")
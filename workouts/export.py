@@ -0,0 +1,78 @@
+'''
+Streaming export of a user's training history as CSV or NDJSON.
+
+Rows are read with QuerySet.iterator(chunk_size=...) (a server-side cursor
+on PostgreSQL) and written out one at a time, so memory use does not grow
+with the size of the history.
+'''
+import csv
+import datetime
+import json
+
+from .models import WorkoutExercise, WorkoutPerformance, WorkoutPlan
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# resource name -> (queryset for a user, exported columns)
+RESOURCES = {
+    'workouts': (
+        lambda user: WorkoutPlan.objects.for_user(user).order_by('id'),
+        ['id', 'title', 'description', 'scheduled_date', 'created_at', 'updated_at'],
+    ),
+    'workout_exercises': (
+        lambda user: WorkoutExercise.objects.for_user(user).order_by('workout_id', 'id'),
+        ['id', 'workout_id', 'exercise_id', 'exercise__name', 'sets', 'reps', 'weight'],
+    ),
+    'workout_performances': (
+        lambda user: WorkoutPerformance.objects.for_user(user).order_by('performed_at', 'id'),
+        ['id', 'workout_id', 'performance_metric', 'notes', 'performed_at'],
+    ),
+}
+
+
+class _Echo:
+    '''File-like object whose write() hands the line back, so csv.writer can feed a generator.'''
+    def write(self, value):
+        return value
+
+
+def _format(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def export_rows(resource, user):
+    '''Return (column names, row iterator) for one of RESOURCES.'''
+    queryset, columns = RESOURCES[resource]
+    rows = queryset(user).values_list(*columns).iterator(chunk_size=CHUNK_SIZE)
+    return [column.replace('__', '_') for column in columns], rows
+
+
+def _buffered(lines, size=500):
+    '''Group lines into larger chunks so the server does not write one row per syscall.'''
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    lines = (writer.writerow([_format(value) for value in row]) for row in rows)
+    yield writer.writerow(columns)
+    yield from _buffered(lines)
+
+
+def stream_ndjson(columns, rows):
+    lines = (json.dumps({column: _format(value) for column, value in zip(columns, row)}) + '\n' for row in rows)
+    yield from _buffered(lines)
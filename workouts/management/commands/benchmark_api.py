@@ -0,0 +1,82 @@
+# workouts/management/commands/benchmark_api.py
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from workouts import benchmark
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and report query count, p50/p95 latency and peak memory '
+            'of every API route. Fails when a route regresses against --baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--plans-per-user', type=int, default=20)
+        parser.add_argument('--performances-per-plan', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per route.')
+        parser.add_argument('--baseline', help='JSON file of earlier results to compare against.')
+        parser.add_argument('--write-baseline', help='Write the results to this JSON file.')
+        parser.add_argument('--tolerance', type=float, default=1.5, help='Allowed p95 latency factor over the baseline.')
+        parser.add_argument('--refresh-rotations', type=int, default=200,
+                            help='Refresh token rotations for the rotation flood benchmark.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database after the run.')
+
+    def handle(self, *args, **options):
+        missing = benchmark.uncovered_routes()
+        if missing:
+            raise CommandError(f"Routes without a benchmark case: {', '.join(missing)}")
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as handle:
+                baseline = json.load(handle)
+
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            self.stdout.write('Seeding benchmark data...')
+            fixture = benchmark.seed(
+                users=options['users'],
+                plans_per_user=options['plans_per_user'],
+                performances_per_plan=options['performances_per_plan'],
+            )
+            results = benchmark.run(fixture, iterations=options['iterations'])
+            flood = {
+                'stock': benchmark.refresh_flood(fixture['user'], options['refresh_rotations'], TokenRefreshSerializer),
+                'fast': benchmark.refresh_flood(fixture['user'], options['refresh_rotations']),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        width = max(len(label) for label in results)
+        self.stdout.write(f"{'route'.ljust(width)}  queries  p50 ms  p95 ms  peak KiB")
+        for label, result in results.items():
+            if 'error' in result:
+                self.stdout.write(f"{label.ljust(width)}  failed")
+                continue
+            self.stdout.write(
+                f"{label.ljust(width)}  {result['queries']:>7}  {result['p50_ms']:>6.1f}  "
+                f"{result['p95_ms']:>6.1f}  {result['peak_kib']:>8.1f}"
+            )
+
+        self.stdout.write('\nrefresh flood  rotations/s  queries  replays/s  queries')
+        for name, result in flood.items():
+            self.stdout.write(
+                f"{name.ljust(13)}  {result['rotations_per_s']:>11.1f}  {result['queries_per_rotation']:>7.2f}  "
+                f"{result['replays_per_s']:>9.1f}  {result['queries_per_replay']:>7.2f}"
+            )
+
+        if options['write_baseline']:
+            with open(options['write_baseline'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote baseline to {options['write_baseline']}.")
+
+        problems = benchmark.compare(results, baseline, tolerance=options['tolerance'])
+        if problems:
+            raise CommandError('Performance regressions:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} routes within budget.'))
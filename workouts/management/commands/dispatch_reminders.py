@@ -0,0 +1,38 @@
+# workouts/management/commands/dispatch_reminders.py
+
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from workouts.reminders import ConsoleReminderBackend, Dispatcher, get_backend
+
+class Command(BaseCommand):
+    help = ('Send reminders for scheduled workouts starting within REMINDER_LEAD_MINUTES. '
+            'Runs as a worker until interrupted, or once with --once; several workers can run side by side.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send the reminders due now and exit.')
+        parser.add_argument('--backend', help='Dotted path of the delivery backend (default: REMINDER_BACKEND).')
+        parser.add_argument('--lead-minutes', type=int, default=settings.REMINDER_LEAD_MINUTES)
+        parser.add_argument('--batch-size', type=int, default=settings.REMINDER_BATCH_SIZE)
+        parser.add_argument('--poll-seconds', type=int, default=settings.REMINDER_POLL_SECONDS,
+                            help='How often to look for newly scheduled workouts.')
+
+    def handle(self, *args, **options):
+        backend = get_backend(options['backend'])
+        if isinstance(backend, ConsoleReminderBackend):
+            backend.stream = self.stdout
+        dispatcher = Dispatcher(
+            backend=backend,
+            lead=datetime.timedelta(minutes=options['lead_minutes']),
+            batch_size=options['batch_size'],
+            poll_interval=datetime.timedelta(seconds=options['poll_seconds']),
+        )
+        if options['once']:
+            sent = dispatcher.dispatch_due()
+        else:
+            try:
+                sent = dispatcher.run()
+            except KeyboardInterrupt:
+                return
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminders."))
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    WorkoutPlan = apps.get_model('workouts', 'WorkoutPlan')
+    WorkoutPerformance = apps.get_model('workouts', 'WorkoutPerformance')
+    MonthlyWorkoutRollup = apps.get_model('workouts', 'MonthlyWorkoutRollup')
+    MonthlyPerformanceRollup = apps.get_model('workouts', 'MonthlyPerformanceRollup')
+
+    workouts = WorkoutPlan.objects.annotate(month=TruncMonth('created_at')) \
+        .values('user_id', 'month') \
+        .annotate(workout_count=Count('id'))
+    MonthlyWorkoutRollup.objects.bulk_create(
+        [MonthlyWorkoutRollup(user_id=row['user_id'], month=row['month'].date(), workout_count=row['workout_count'])
+         for row in workouts.iterator()],
+        batch_size=1000,
+    )
+
+    performances = WorkoutPerformance.objects.annotate(month=TruncMonth('performed_at')) \
+        .values('user_id', 'month') \
+        .annotate(
+            performance_count=Count('id'),
+            metric_count=Count('performance_metric'),
+            metric_sum=Sum('performance_metric'),
+            metric_sum_squares=Sum(F('performance_metric') * F('performance_metric')),
+            metric_min=Min('performance_metric'),
+            metric_max=Max('performance_metric'),
+        )
+    MonthlyPerformanceRollup.objects.bulk_create(
+        [MonthlyPerformanceRollup(
+            user_id=row['user_id'],
+            month=row['month'].date(),
+            performance_count=row['performance_count'],
+            metric_count=row['metric_count'],
+            metric_sum=row['metric_sum'] or 0,
+            metric_sum_squares=row['metric_sum_squares'] or 0,
+            metric_min=row['metric_min'],
+            metric_max=row['metric_max'],
+        ) for row in performances.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0003_workoutcomment_workoutperformance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPerformanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('performance_count', models.PositiveIntegerField(default=0)),
+                ('metric_count', models.PositiveIntegerField(default=0, help_text='Number of performances with a metric')),
+                ('metric_sum', models.FloatField(default=0)),
+                ('metric_sum_squares', models.FloatField(default=0)),
+                ('metric_min', models.FloatField(blank=True, null=True)),
+                ('metric_max', models.FloatField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_performance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_performance_rollup_per_month')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyWorkoutRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('workout_count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_workout_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='unique_workout_rollup_per_month')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_monthly_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduledworkout',
+            index=models.Index(fields=['user', 'scheduled_datetime'], name='schedule_user_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutcomment',
+            index=models.Index(fields=['user', 'workout', 'created_at'], name='comment_user_workout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutperformance',
+            index=models.Index(fields=['user', 'workout', 'performed_at'], name='performance_user_workout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutperformance',
+            index=models.Index(fields=['user', 'performed_at'], name='performance_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='workoutplan_user_created_idx'),
+        ),
+    ]
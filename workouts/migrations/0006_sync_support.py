@@ -0,0 +1,84 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0005_composite_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('workouts', 'Workout plan'), ('scheduled_workouts', 'Scheduled workout'), ('workout_performances', 'Workout performance')], max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('client_id', models.UUIDField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='scheduledworkout',
+            name='client_id',
+            field=models.UUIDField(blank=True, help_text='Client-generated idempotency key', null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledworkout',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workoutperformance',
+            name='client_id',
+            field=models.UUIDField(blank=True, help_text='Client-generated idempotency key', null=True),
+        ),
+        migrations.AddField(
+            model_name='workoutperformance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='client_id',
+            field=models.UUIDField(blank=True, help_text='Client-generated idempotency key', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledworkout',
+            index=models.Index(fields=['user', 'updated_at'], name='schedule_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutperformance',
+            index=models.Index(fields=['user', 'updated_at'], name='performance_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['user', 'updated_at'], name='workoutplan_user_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduledworkout',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_schedule_client_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutperformance',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_performance_client_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutplan',
+            constraint=models.UniqueConstraint(fields=('user', 'client_id'), name='unique_workoutplan_client_id'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ),
+    ]
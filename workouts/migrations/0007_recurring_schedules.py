@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0006_sync_support'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(help_text="First occurrence; later ones keep its wall-clock time in 'timezone'")),
+                ('timezone', models.CharField(default='UTC', help_text='IANA time zone name', max_length=64)),
+                ('frequency', models.CharField(choices=[('DAILY', 'Daily'), ('WEEKLY', 'Weekly'), ('MONTHLY', 'Monthly')], max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Repeat every N days, weeks or months')),
+                ('weekdays', models.CharField(blank=True, help_text='Comma-separated days for weekly rules, e.g. MO,WE,FR', max_length=20)),
+                ('until', models.DateTimeField(blank=True, help_text='No occurrences after this moment', null=True)),
+                ('count', models.PositiveIntegerField(blank=True, help_text='Total number of occurrences', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_schedules', to=settings.AUTH_USER_MODEL)),
+                ('workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_schedules', to='workouts.workoutplan')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_datetime', models.DateTimeField(help_text='The occurrence this exception replaces')),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('scheduled_datetime', models.DateTimeField(blank=True, help_text='New time of a moved occurrence', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recurring_schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='workouts.recurringschedule')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recurringschedule',
+            index=models.Index(fields=['user', 'start'], name='recurring_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrenceexception',
+            index=models.Index(fields=['recurring_schedule', 'scheduled_datetime'], name='exception_moved_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurrenceexception',
+            constraint=models.UniqueConstraint(fields=('recurring_schedule', 'original_datetime'), name='unique_exception_per_occurrence'),
+        ),
+    ]
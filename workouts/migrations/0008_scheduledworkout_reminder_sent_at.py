@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0007_recurring_schedules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledworkout',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the reminder was delivered, see workouts.reminders', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledworkout',
+            index=models.Index(condition=models.Q(('reminder_sent_at__isnull', True)), fields=['scheduled_datetime'], name='schedule_reminder_due_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_records(apps, schema_editor):
+    #same rules as workouts.records.entry_values at the time of this migration.
+    WorkoutExercise = apps.get_model('workouts', 'WorkoutExercise')
+    PersonalRecord = apps.get_model('workouts', 'PersonalRecord')
+
+    best = {}
+    entries = WorkoutExercise.objects.order_by('workout__created_at', 'id').values_list(
+        'id', 'workout__user_id', 'exercise_id', 'sets', 'reps', 'weight', 'workout__created_at'
+    )
+    for pk, user_id, exercise_id, sets, reps, weight, created_at in entries.iterator():
+        if not weight or weight <= 0 or not reps:
+            continue
+        e1rm = weight if reps == 1 else weight * (1 + reps / 30)
+        for kind, value in (('weight', weight), ('e1rm', e1rm), ('volume', sets * reps * weight)):
+            key = (user_id, exercise_id, kind)
+            if key not in best or value > best[key][0]:
+                best[key] = (value, pk, created_at)
+    PersonalRecord.objects.bulk_create(
+        [PersonalRecord(user_id=user_id, exercise_id=exercise_id, kind=kind, value=value, workout_exercise_id=pk, achieved_at=created_at)
+         for (user_id, exercise_id, kind), (value, pk, created_at) in best.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0004_exercise_name_unique'),
+        ('workouts', '0008_scheduledworkout_reminder_sent_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('weight', 'Heaviest weight'), ('e1rm', 'Best estimated one-rep max (Epley)'), ('volume', 'Most volume (sets x reps x weight) in one entry')], max_length=10)),
+                ('value', models.FloatField()),
+                ('achieved_at', models.DateTimeField(help_text='Creation time of the workout plan of that entry')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='exercises.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+                ('workout_exercise', models.ForeignKey(blank=True, help_text='Entry that set the record; cleared when it is deleted, until the record is rebuilt', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='workouts.workoutexercise')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'exercise', 'kind'), name='unique_record_per_exercise_kind')],
+            },
+        ),
+        migrations.RunPython(backfill_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0009_personal_records'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='synctombstone',
+            name='model',
+            field=models.CharField(choices=[('workouts', 'Workout plan'), ('scheduled_workouts', 'Scheduled workout'), ('workout_performances', 'Workout performance'), ('recurring_schedules', 'Recurring schedule'), ('recurrence_exceptions', 'Recurrence exception')], max_length=50),
+        ),
+    ]
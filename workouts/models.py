@@ -1,16 +1,43 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from exercises.models import Exercise
 
 
+
+class OwnedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        #rows owned by user, answered from the (user, ...) indexes; all per-user views go through this.
+        return self.filter(user=user)
+
+
+
+class WorkoutExerciseQuerySet(models.QuerySet):
+    def for_user(self, user):
+        return self.filter(workout__user=user)
+
+
 class WorkoutPlan(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workouts')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     scheduled_date = models.DateField(null=True, blank=True)
+    client_id = models.UUIDField(null=True, blank=True, help_text="Client-generated idempotency key")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            #the workout list filters by user and pages on (created_at, id), newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='workoutplan_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='workoutplan_user_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_workoutplan_client_id'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -21,6 +48,8 @@ class WorkoutExercise(models.Model):
     reps = models.PositiveIntegerField()
     weight = models.FloatField(blank=True, null=True)
 
+    objects = WorkoutExerciseQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.exercise.name} in {self.workout.title}"
 
@@ -32,7 +61,26 @@ class ScheduledWorkout(models.Model):#this model links a workout plan to a speci
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scheduled_workouts')
     workout = models.ForeignKey(WorkoutPlan, on_delete=models.CASCADE, related_name='schedules')
     scheduled_datetime = models.DateTimeField()
+    client_id = models.UUIDField(null=True, blank=True, help_text="Client-generated idempotency key")
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, help_text="When the reminder was delivered, see workouts.reminders")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'scheduled_datetime'], name='schedule_user_datetime_idx'),
+            models.Index(fields=['user', 'updated_at'], name='schedule_user_updated_idx'),
+            #the reminder dispatcher's "due soon" range scan; only rows still waiting for a reminder are indexed.
+            models.Index(
+                fields=['scheduled_datetime'], name='schedule_reminder_due_idx',
+                condition=models.Q(reminder_sent_at__isnull=True),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_schedule_client_id'),
+        ]
 
     def __str__(self):
         return f"{self.workout.title} scheduled for {self.scheduled_datetime}"
@@ -41,6 +89,65 @@ class ScheduledWorkout(models.Model):#this model links a workout plan to a speci
 
 
 
+class RecurringSchedule(models.Model):#a repeating schedule of a workout plan; occurrences are expanded on demand by workouts.recurrence.
+    FREQUENCY_CHOICES = [
+        ('DAILY', 'Daily'),
+        ('WEEKLY', 'Weekly'),
+        ('MONTHLY', 'Monthly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recurring_schedules')
+    workout = models.ForeignKey(WorkoutPlan, on_delete=models.CASCADE, related_name='recurring_schedules')
+    start = models.DateTimeField(help_text="First occurrence; later ones keep its wall-clock time in 'timezone'")
+    timezone = models.CharField(max_length=64, default='UTC', help_text="IANA time zone name")
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1, help_text="Repeat every N days, weeks or months")
+    weekdays = models.CharField(max_length=20, blank=True, help_text="Comma-separated days for weekly rules, e.g. MO,WE,FR")
+    until = models.DateTimeField(null=True, blank=True, help_text="No occurrences after this moment")
+    count = models.PositiveIntegerField(null=True, blank=True, help_text="Total number of occurrences")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start'], name='recurring_user_start_idx'),
+        ]
+
+    def weekday_list(self):
+        return [day for day in self.weekdays.split(',') if day]
+
+    def __str__(self):
+        return f"{self.workout.title} repeating {self.frequency.lower()} from {self.start}"
+
+
+
+class RecurrenceException(models.Model):#one occurrence of a recurring schedule that was cancelled or moved.
+    recurring_schedule = models.ForeignKey(RecurringSchedule, on_delete=models.CASCADE, related_name='exceptions')
+    original_datetime = models.DateTimeField(help_text="The occurrence this exception replaces")
+    is_cancelled = models.BooleanField(default=False)
+    scheduled_datetime = models.DateTimeField(null=True, blank=True, help_text="New time of a moved occurrence")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recurring_schedule', 'scheduled_datetime'], name='exception_moved_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_schedule', 'original_datetime'], name='unique_exception_per_occurrence'),
+        ]
+
+    def __str__(self):
+        action = 'cancelled' if self.is_cancelled else f'moved to {self.scheduled_datetime}'
+        return f"Occurrence {self.original_datetime} {action}"
+
+
+
+
+
+
 class WorkoutComment(models.Model):
     workout = models.ForeignKey('WorkoutPlan', on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workout_comments')
@@ -48,6 +155,13 @@ class WorkoutComment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'workout', 'created_at'], name='comment_user_workout_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.workout.title}"
 
@@ -58,7 +172,112 @@ class WorkoutPerformance(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='workout_performances')
     performance_metric = models.FloatField(null=True, blank=True, help_text="Numeric performance metric (e.g., weight lifted, time, etc.)")
     notes = models.TextField(blank=True, help_text="Additional notes about performance")
-    performed_at = models.DateTimeField(auto_now_add=True)
+    client_id = models.UUIDField(null=True, blank=True, help_text="Client-generated idempotency key")
+    #a default rather than auto_now_add: sessions synced after the fact keep the time the client recorded.
+    performed_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OwnedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'workout', 'performed_at'], name='performance_user_workout_idx'),
+            #used by the rollup rebuild of one month and by time-range scans over all workouts.
+            models.Index(fields=['user', 'performed_at'], name='performance_user_time_idx'),
+            models.Index(fields=['user', 'updated_at'], name='performance_user_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], name='unique_performance_client_id'),
+        ]
+
+    def __str__(self):
+        return f"Performance for {self.workout.title} by {self.user.username} on {self.performed_at}"
+
+
+
+class MonthlyWorkoutRollup(models.Model):#per-user, per-month count of created workout plans, maintained by workouts.rollups.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_workout_rollups')
+    month = models.DateField(help_text="First day of the month")
+    workout_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_workout_rollup_per_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.workout_count} workouts by {self.user_id} in {self.month:%Y-%m}"
+
+
+
+class MonthlyPerformanceRollup(models.Model):#per-user, per-month statistics of performance_metric, maintained by workouts.rollups.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_performance_rollups')
+    month = models.DateField(help_text="First day of the month")
+    performance_count = models.PositiveIntegerField(default=0)
+    metric_count = models.PositiveIntegerField(default=0, help_text="Number of performances with a metric")
+    metric_sum = models.FloatField(default=0)
+    metric_sum_squares = models.FloatField(default=0)
+    metric_min = models.FloatField(null=True, blank=True)
+    metric_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='unique_performance_rollup_per_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.performance_count} performances by {self.user_id} in {self.month:%Y-%m}"
+
+
+
+
+class PersonalRecord(models.Model):#a user's best result on an exercise, maintained by workouts.records.
+    KIND_CHOICES = [
+        ('weight', 'Heaviest weight'),
+        ('e1rm', 'Best estimated one-rep max (Epley)'),
+        ('volume', 'Most volume (sets x reps x weight) in one entry'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='personal_records')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='personal_records')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.FloatField()
+    workout_exercise = models.ForeignKey(
+        WorkoutExercise, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Entry that set the record; cleared when it is deleted, until the record is rebuilt",
+    )
+    achieved_at = models.DateTimeField(help_text="Creation time of the workout plan of that entry")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'exercise', 'kind'], name='unique_record_per_exercise_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} record of {self.value} on exercise {self.exercise_id} by {self.user_id}"
+
+
+
+
+class SyncTombstone(models.Model):#records a deleted row so that delta sync clients can drop it too.
+    MODEL_CHOICES = [
+        ('workouts', 'Workout plan'),
+        ('scheduled_workouts', 'Scheduled workout'),
+        ('workout_performances', 'Workout performance'),
+        ('recurring_schedules', 'Recurring schedule'),
+        ('recurrence_exceptions', 'Recurrence exception'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_tombstones')
+    model = models.CharField(max_length=50, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    client_id = models.UUIDField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
 
     def __str__(self):
-        return f"Performance for {self.workout.title} by {self.user.username} on {self.performed_at}"
\ No newline at end of file
+        return f"Deleted {self.model} {self.object_id} at {self.deleted_at}"
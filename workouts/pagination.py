@@ -0,0 +1,101 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    '''
+    Keyset (cursor) pagination over (created_at, id), newest first.
+
+    Instead of OFFSET, every page after the first is fetched with
+    "WHERE (created_at, id) < (cursor)" so the cost of a page does not depend
+    on how deep into the history the client has scrolled.
+
+    Query Parameters:
+        - cursor: opaque value taken from the "next" link of the previous page.
+        - page_size: number of results per page (capped at max_page_size).
+    '''
+    ordering_field = 'created_at'
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        #same as paginate_queryset() for async views; the page is fetched with the async ORM.
+        queryset = self._page_queryset(queryset, request)
+        return self._set_page([item async for item in queryset])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(f'-{self.ordering_field}', '-id')
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            position, last_id = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(**{f'{self.ordering_field}__lt': position})
+                | Q(**{self.ordering_field: position, 'id__lt': last_id})
+            )
+
+        #fetch one extra row to find out whether there is a next page.
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.last_item = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, item):
+        position = getattr(item, self.ordering_field).isoformat()
+        raw = f'{position}|{item.id}'.encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            position, last_id = raw.rsplit('|', 1)
+            position = parse_datetime(position)
+            last_id = int(last_id)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if position is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position, last_id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_item))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,151 @@
+'''
+Incremental maintenance of personal records.
+
+PersonalRecord keeps, per user, exercise and kind (heaviest weight, best
+Epley e1RM, most volume in one entry), the best value any of the user's
+WorkoutExercise entries reached, so reading a record is one indexed row
+instead of a scan of the user's history.
+
+WorkoutExercise rows are written with bulk statements (see
+WorkoutPlanSerializer), which send no model signals, so the writers call
+these functions themselves (entries saved or deleted one by one, e.g. in the
+admin or with their exercise, are covered by workouts.signals):
+
+    - record_exercises_created(rows) after inserting entries: better values
+      replace the stored records.
+    - record_exercises_updated(rows) after updating entries: as above, and
+      the records held by an updated entry are recomputed, since its values
+      may have gone down.
+    - rebuild_orphaned(user_id) after deleting entries or workout plans: the
+      records whose entry was deleted (workout_exercise set to NULL by the
+      foreign key) are recomputed from the remaining entries.
+
+Of two equal values the earlier entry keeps the record.
+'''
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+
+from .analytics import e1rm
+from .models import PersonalRecord, WorkoutExercise
+
+KINDS = [kind for kind, _ in PersonalRecord.KIND_CHOICES]
+
+
+def entry_values(sets, reps, weight):
+    '''{kind: value} of one entry; entries without a weight (bodyweight exercises) set no records.'''
+    if not weight or weight <= 0 or not reps:
+        return {}
+    return {'weight': weight, 'e1rm': e1rm(weight, reps), 'volume': sets * reps * weight}
+
+
+def _best_of(rows):
+    '''{(user_id, exercise_id, kind): PersonalRecord} of the best value in rows.'''
+    best = {}
+    for row in sorted(rows, key=lambda row: (row.workout.created_at, row.pk)):
+        for kind, value in entry_values(row.sets, row.reps, row.weight).items():
+            key = (row.workout.user_id, row.exercise_id, kind)
+            if key not in best or value > best[key].value:
+                best[key] = PersonalRecord(
+                    user_id=key[0], exercise_id=key[1], kind=kind, value=value,
+                    workout_exercise_id=row.pk, achieved_at=row.workout.created_at,
+                )
+    return best
+
+
+def record_exercises_created(rows):
+    best = _best_of(rows)
+    if not best:
+        return
+    user_ids = {user_id for user_id, _, _ in best}
+    exercise_ids = {exercise_id for _, exercise_id, _ in best}
+    try:
+        with transaction.atomic():
+            #locked so that concurrent writers of the same records apply their values one after the other.
+            existing = {
+                (record.user_id, record.exercise_id, record.kind): record
+                for record in PersonalRecord.objects.select_for_update().filter(user_id__in=user_ids, exercise_id__in=exercise_ids)
+            }
+            to_create, to_update = [], []
+            for key, candidate in best.items():
+                record = existing.get(key)
+                if record is None:
+                    to_create.append(candidate)
+                elif candidate.value > record.value:
+                    record.value = candidate.value
+                    record.workout_exercise_id = candidate.workout_exercise_id
+                    record.achieved_at = candidate.achieved_at
+                    to_update.append(record)
+            if to_create:
+                PersonalRecord.objects.bulk_create(to_create)
+            if to_update:
+                PersonalRecord.objects.bulk_update(to_update, ['value', 'workout_exercise', 'achieved_at'])
+    except IntegrityError:
+        #another request created some of these records in the meantime; recompute them from the entries.
+        exercises_by_user = defaultdict(set)
+        for user_id, exercise_id, _ in best:
+            exercises_by_user[user_id].add(exercise_id)
+        for user_id, exercise_ids in exercises_by_user.items():
+            rebuild_records(user_id, exercise_ids)
+
+
+def record_exercises_updated(rows):
+    rows = list(rows)
+    held = set(
+        PersonalRecord.objects.filter(workout_exercise__in=[row.pk for row in rows]).values_list('user_id', 'exercise_id')
+    )
+    exercises_by_user = defaultdict(set)
+    for user_id, exercise_id in held:
+        exercises_by_user[user_id].add(exercise_id)
+    for user_id, exercise_ids in exercises_by_user.items():
+        rebuild_records(user_id, exercise_ids)
+    #a rebuilt exercise already accounts for the updated rows.
+    record_exercises_created([row for row in rows if (row.workout.user_id, row.exercise_id) not in held])
+
+
+def rebuild_orphaned(user_id):
+    exercise_ids = set(
+        PersonalRecord.objects.filter(user_id=user_id, workout_exercise__isnull=True).values_list('exercise_id', flat=True)
+    )
+    if exercise_ids:
+        rebuild_records(user_id, exercise_ids)
+
+
+def rebuild_records(user_id, exercise_ids):
+    '''Recompute the user's records of the given exercises from their entries.'''
+    best = {}
+    entries = (
+        WorkoutExercise.objects.filter(workout__user_id=user_id, exercise_id__in=exercise_ids)
+        .order_by('workout__created_at', 'id')
+        .values_list('id', 'exercise_id', 'sets', 'reps', 'weight', 'workout__created_at')
+    )
+    for pk, exercise_id, sets, reps, weight, created_at in entries.iterator():
+        for kind, value in entry_values(sets, reps, weight).items():
+            if (exercise_id, kind) not in best or value > best[(exercise_id, kind)].value:
+                best[(exercise_id, kind)] = PersonalRecord(
+                    user_id=user_id, exercise_id=exercise_id, kind=kind, value=value,
+                    workout_exercise_id=pk, achieved_at=created_at,
+                )
+    with transaction.atomic():
+        PersonalRecord.objects.filter(user_id=user_id, exercise_id__in=exercise_ids).delete()
+        #a concurrent rebuild of the same records may have inserted them first; its values are as good.
+        PersonalRecord.objects.bulk_create(best.values(), ignore_conflicts=True)
+
+
+def record_history(user_id, exercise_id):
+    '''
+    {kind: [(value, entry id, workout id, achieved_at), ...]}: every entry
+    that set a new best of the exercise, in order, i.e. the progression of
+    the user's records.
+    '''
+    history = {kind: [] for kind in KINDS}
+    entries = (
+        WorkoutExercise.objects.filter(workout__user_id=user_id, exercise_id=exercise_id)
+        .order_by('workout__created_at', 'id')
+        .values_list('id', 'workout_id', 'sets', 'reps', 'weight', 'workout__created_at')
+    )
+    for pk, workout_id, sets, reps, weight, created_at in entries.iterator():
+        for kind, value in entry_values(sets, reps, weight).items():
+            if not history[kind] or value > history[kind][-1][0]:
+                history[kind].append((value, pk, workout_id, created_at))
+    return history
@@ -0,0 +1,164 @@
+'''
+Lazy expansion of recurring schedules into occurrences.
+
+A RecurringSchedule stores one RRULE-like rule (FREQ, INTERVAL, BYDAY,
+UNTIL, COUNT) instead of one ScheduledWorkout row per occurrence. The
+occurrences of a window are generated on demand by occurrences(); only the
+exceptions (a cancelled or moved occurrence) are stored, as
+RecurrenceException rows.
+
+Occurrences keep the wall-clock time of the rule's start in the rule's time
+zone, so a 07:00 workout stays at 07:00 across daylight saving changes.
+
+Expansion skips straight to the period of the requested start, also for
+COUNT rules (the occurrences before it are counted arithmetically), so its
+cost depends on the window, which callers keep to MAX_WINDOW_DAYS, and not
+on how far the window is from the rule's start.
+'''
+import datetime
+import zoneinfo
+from collections import namedtuple
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+Occurrence = namedtuple('Occurrence', ['rule', 'scheduled_datetime', 'original_datetime'])
+
+#bounds of a rule's COUNT and of an expanded window.
+MAX_COUNT = 5000
+MAX_WINDOW_DAYS = 366
+
+DAILY = 'DAILY'
+WEEKLY = 'WEEKLY'
+MONTHLY = 'MONTHLY'
+
+
+def _month_date(year, month, day):
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        #like RFC 5545: a month without that day (e.g. the 31st) has no occurrence.
+        return None
+
+
+def _period_dates(rule, first_day, period):
+    '''Dates of the rule's occurrences in its period number `period` (0 is the period of the start).'''
+    if rule.frequency == DAILY:
+        yield first_day + datetime.timedelta(days=period * rule.interval)
+    elif rule.frequency == WEEKLY:
+        week = first_day - datetime.timedelta(days=first_day.weekday()) + datetime.timedelta(weeks=period * rule.interval)
+        weekdays = sorted(WEEKDAYS.index(day) for day in rule.weekday_list()) or [first_day.weekday()]
+        for weekday in weekdays:
+            day = week + datetime.timedelta(days=weekday)
+            if day >= first_day:
+                yield day
+    elif rule.frequency == MONTHLY:
+        months = first_day.month - 1 + period * rule.interval
+        day = _month_date(first_day.year + months // 12, months % 12 + 1, first_day.day)
+        if day is not None:
+            yield day
+    else:
+        raise ValueError(f"Unsupported frequency '{rule.frequency}'.")
+
+
+def _first_period(rule, first_day, window_day):
+    '''A period number at or before the one containing window_day, to skip the periods before a window.'''
+    if window_day <= first_day:
+        return 0
+    if rule.frequency == DAILY:
+        return (window_day - first_day).days // rule.interval
+    if rule.frequency == WEEKLY:
+        return max(0, (window_day - first_day).days // (7 * rule.interval) - 1)
+    months = (window_day.year - first_day.year) * 12 + window_day.month - first_day.month
+    return max(0, months // rule.interval - 1)
+
+
+def _count_before(rule, first_day, period):
+    '''The number of occurrences in the periods before period number `period`.'''
+    if period == 0:
+        return 0
+    if rule.frequency == DAILY:
+        return period
+    if rule.frequency == WEEKLY:
+        #the start's week may be cut short by the start itself, every later week is complete.
+        weekdays = len(rule.weekday_list()) or 1
+        return len(list(_period_dates(rule, first_day, 0))) + (period - 1) * weekdays
+    if first_day.day <= 28:
+        return period
+    #the 29th to 31st are missing from some months; past COUNT the exact number no longer matters.
+    counted = 0
+    for earlier in range(period):
+        if next(_period_dates(rule, first_day, earlier), None) is not None:
+            counted += 1
+            if counted >= rule.count:
+                break
+    return counted
+
+
+def occurrences(rule, start=None, end=None):
+    '''
+    Yield the occurrences of rule (aware datetimes, in UTC) from start
+    (inclusive) to end (exclusive), in order. Without an end, a rule without
+    UNTIL or COUNT yields forever, so callers must stop iterating themselves.
+    '''
+    zone = zoneinfo.ZoneInfo(rule.timezone)
+    local_start = rule.start.astimezone(zone)
+    first_day, wall_time = local_start.date(), local_start.time().replace(tzinfo=None)
+
+    period = 0
+    if start is not None:
+        period = _first_period(rule, first_day, start.astimezone(zone).date())
+
+    emitted = _count_before(rule, first_day, period) if rule.count is not None else 0
+    while rule.count is None or emitted < rule.count:
+        for day in _period_dates(rule, first_day, period):
+            moment = datetime.datetime.combine(day, wall_time, tzinfo=zone).astimezone(datetime.timezone.utc)
+            if rule.until is not None and moment > rule.until:
+                return
+            if end is not None and moment >= end:
+                return
+            emitted += 1
+            if start is None or moment >= start:
+                yield moment
+            if rule.count is not None and emitted >= rule.count:
+                return
+        period += 1
+
+
+def is_occurrence(rule, moment):
+    '''Whether moment is one of the rule's occurrences.'''
+    moment = moment.astimezone(datetime.timezone.utc)
+    return next(occurrences(rule, moment, moment + datetime.timedelta(microseconds=1)), None) == moment
+
+
+def expand(rules, exceptions, start, end):
+    '''
+    Yield an Occurrence(rule, scheduled_datetime, original_datetime) for every occurrence
+    of rules between start and end, applying exceptions: cancelled
+    occurrences are left out and moved ones are yielded at their new time
+    (when that time is in the window). exceptions is an iterable of
+    RecurrenceException rows of these rules that either replace an
+    occurrence in the window or move one into it.
+    '''
+    rules = {rule.id: rule for rule in rules}
+    by_original = {(exception.recurring_schedule_id, exception.original_datetime): exception for exception in exceptions}
+    for rule in rules.values():
+        for moment in occurrences(rule, start, end):
+            if (rule.id, moment) not in by_original:
+                yield Occurrence(rule, moment, moment)
+    for exception in by_original.values():
+        if not exception.is_cancelled and start <= exception.scheduled_datetime < end:
+            yield Occurrence(rules[exception.recurring_schedule_id], exception.scheduled_datetime, exception.original_datetime)
+
+
+def to_rrule(rule):
+    '''The rule as an RFC 5545 RRULE value, e.g. "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=156".'''
+    parts = [f'FREQ={rule.frequency}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.weekday_list():
+        parts.append(f"BYDAY={','.join(rule.weekday_list())}")
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}")
+    if rule.count is not None:
+        parts.append(f'COUNT={rule.count}')
+    return ';'.join(parts)
@@ -0,0 +1,172 @@
+'''
+Reminders for upcoming scheduled workouts.
+
+A ScheduledWorkout is due for a reminder once its scheduled_datetime is less
+than REMINDER_LEAD_MINUTES away, until the workout starts. Dispatcher finds
+due rows with a range scan of the partial schedule_reminder_due_idx index
+(only rows without reminder_sent_at are in it) and claims them in batches
+with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run at once
+without sending a reminder twice: a row locked by one worker is skipped by
+the others. The batch is delivered and marked in the same transaction, so a
+failed delivery leaves the rows unclaimed for the next attempt.
+
+Between batches the worker sleeps until the next reminder falls due. The due
+times of the next upcoming rows are kept in a min-heap, refreshed every
+REMINDER_POLL_SECONDS to pick up schedules created in the meantime.
+
+Delivery goes through the backend named by REMINDER_BACKEND, a dotted path to
+a class with a send(schedules) method, like Django's EMAIL_BACKEND.
+'''
+import datetime
+import heapq
+import json
+import logging
+import sys
+import time
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ScheduledWorkout
+
+logger = logging.getLogger('workouts.reminders')
+
+
+def _message(schedule):
+    return f"Reminder: {schedule.workout.title} starts at {schedule.scheduled_datetime.isoformat()}."
+
+
+class BaseReminderBackend:
+    def send(self, schedules):
+        '''Deliver a reminder for every ScheduledWorkout in schedules (user and workout are loaded); raise to retry the batch.'''
+        raise NotImplementedError
+
+
+class ConsoleReminderBackend(BaseReminderBackend):
+    '''Write reminders to stdout (or the given stream), for development.'''
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, schedules):
+        for schedule in schedules:
+            self.stream.write(f"[{schedule.user.username}] {_message(schedule)}\n")
+        self.stream.flush()
+
+
+class FileReminderBackend(BaseReminderBackend):
+    '''Append reminders as JSON lines to REMINDER_FILE_PATH, for tests and local runs.'''
+    def __init__(self, path=None):
+        self.path = path or settings.REMINDER_FILE_PATH
+
+    def send(self, schedules):
+        with open(self.path, 'a', encoding='utf-8') as output:
+            for schedule in schedules:
+                output.write(json.dumps({
+                    'scheduled_workout': schedule.id,
+                    'user': schedule.user_id,
+                    'workout': schedule.workout_id,
+                    'scheduled_datetime': schedule.scheduled_datetime.isoformat(),
+                    'message': _message(schedule),
+                }) + '\n')
+
+
+class EmailReminderBackend(BaseReminderBackend):
+    '''Email every user with an address, over a single connection per batch.'''
+    def send(self, schedules):
+        send_mass_mail(
+            [('Workout reminder', _message(schedule), None, [schedule.user.email]) for schedule in schedules if schedule.user.email],
+            fail_silently=False,
+        )
+
+
+def get_backend(path=None):
+    return import_string(path or settings.REMINDER_BACKEND)()
+
+
+class Dispatcher:
+    def __init__(self, backend=None, lead=None, batch_size=None, poll_interval=None, clock=timezone.now, sleep=time.sleep):
+        self.backend = backend or get_backend()
+        self.lead = lead if lead is not None else datetime.timedelta(minutes=settings.REMINDER_LEAD_MINUTES)
+        self.batch_size = batch_size or settings.REMINDER_BATCH_SIZE
+        self.poll_interval = poll_interval if poll_interval is not None else datetime.timedelta(seconds=settings.REMINDER_POLL_SECONDS)
+        self.clock = clock
+        self.sleep = sleep
+        self.upcoming = []  #min-heap of (due time, scheduled workout id)
+        self.refreshed_at = None
+
+    def pending(self):
+        return ScheduledWorkout.objects.filter(reminder_sent_at__isnull=True)
+
+    def claim_batch(self, now):
+        '''Deliver and mark one batch of due reminders; returns the number sent.'''
+        with transaction.atomic():
+            batch = list(
+                self.pending()
+                .filter(scheduled_datetime__gt=now, scheduled_datetime__lte=now + self.lead)
+                .select_related('user', 'workout')
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('scheduled_datetime')[:self.batch_size]
+            )
+            if not batch:
+                return 0
+            self.backend.send(batch)
+            #reminder_sent_at is part of the schedule's representation: its ETag and sync clients follow updated_at.
+            ScheduledWorkout.objects.filter(pk__in=[schedule.pk for schedule in batch]).update(
+                reminder_sent_at=now, updated_at=timezone.now()
+            )
+        return len(batch)
+
+    def dispatch_due(self, now=None):
+        '''Send every reminder due at now, batch by batch; returns the number sent.'''
+        now = now or self.clock()
+        sent = 0
+        while True:
+            claimed = self.claim_batch(now)
+            sent += claimed
+            if claimed < self.batch_size:
+                break
+        while self.upcoming and self.upcoming[0][0] <= now:
+            heapq.heappop(self.upcoming)
+        return sent
+
+    def refresh(self, now):
+        '''Reload the due times of the reminders falling due within the next poll interval.'''
+        #rows already due are left to dispatch_due(); one still pending was skipped while another worker held it.
+        rows = (
+            self.pending()
+            .filter(scheduled_datetime__gt=now + self.lead, scheduled_datetime__lte=now + self.lead + self.poll_interval)
+            .order_by('scheduled_datetime')
+            .values_list('scheduled_datetime', 'id')[:self.batch_size]
+        )
+        self.upcoming = [(scheduled_datetime - self.lead, pk) for scheduled_datetime, pk in rows]
+        heapq.heapify(self.upcoming)
+        self.refreshed_at = now
+
+    def next_wakeup(self, now):
+        '''When to look for due reminders again: the earliest due time, or the next refresh.'''
+        wakeup = (self.refreshed_at or now) + self.poll_interval
+        if self.upcoming:
+            wakeup = min(wakeup, self.upcoming[0][0])
+        return max(wakeup, now)
+
+    def run(self, max_cycles=None):
+        '''Dispatch reminders until interrupted (or for max_cycles wake-ups); returns the number sent.'''
+        sent = cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            now = self.clock()
+            try:
+                sent += self.dispatch_due(now)
+                if self.refreshed_at is None or now >= self.refreshed_at + self.poll_interval:
+                    self.refresh(now)
+            except Exception:
+                #keep the worker alive; the unsent batch stays unclaimed and is retried on the next wake-up.
+                logger.exception('Reminder dispatch failed')
+                self.refreshed_at = now
+            cycles += 1
+            delay = (self.next_wakeup(now) - now).total_seconds()
+            if delay > 0 and (max_cycles is None or cycles < max_cycles):
+                self.sleep(delay)
+        return sent
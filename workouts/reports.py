@@ -0,0 +1,182 @@
+'''
+Workout reports.
+
+The default reports (frequency and progress per month over all time) are read
+from the per-month rollup tables (see workouts.rollups); they are shared by
+the sync WorkoutReportAPIView and the async report view, which only differ in
+how they run the query.
+
+Reports over a date range, with day/week/month/year buckets, a group-by or
+other metrics are built by run_report() from the source rows, in a single
+aggregate query. Medians and 90th percentiles use PostgreSQL's
+PERCENTILE_CONT; other databases have no percentile aggregate, so there the
+query fetches the (bucket, group, value) rows and the metrics are computed
+in Python. Results are cached per user and parameters, see workouts.caching.
+'''
+import itertools
+import math
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, DateTimeField, ExpressionWrapper, F, FloatField, Max, Min, Sum
+from django.db.models.functions import Trunc
+
+from .models import MonthlyPerformanceRollup, MonthlyWorkoutRollup, WorkoutExercise, WorkoutPerformance, WorkoutPlan
+
+
+def _frequency_row(rollup):
+    return {
+        'month': rollup.month.strftime('%Y-%m'),
+        'workout_count': rollup.workout_count
+    }
+
+
+def _progress_row(rollup):
+    average = stddev = None
+    if rollup.metric_count:
+        average = rollup.metric_sum / rollup.metric_count
+        variance = rollup.metric_sum_squares / rollup.metric_count - average * average
+        stddev = math.sqrt(max(variance, 0.0))
+    return {
+        'month': rollup.month.strftime('%Y-%m'),
+        'average_performance': average,
+        'performance_count': rollup.performance_count,
+        'min_performance': rollup.metric_min,
+        'max_performance': rollup.metric_max,
+        'stddev_performance': stddev,
+    }
+
+
+# report type -> (rollup queryset for a user, row formatter)
+REPORTS = {
+    #frequency report: count of workouts created per month.
+    'frequency': (
+        lambda user: MonthlyWorkoutRollup.objects.filter(user=user, workout_count__gt=0).order_by('month'),
+        _frequency_row,
+    ),
+    #progress report: average (and spread) of the performance metric logged per month.
+    'progress': (
+        lambda user: MonthlyPerformanceRollup.objects.filter(user=user, performance_count__gt=0).order_by('month'),
+        _progress_row,
+    ),
+}
+
+
+def report_queryset(report_type, user):
+    return REPORTS[report_type][0](user)
+
+
+def format_report(report_type, rollups):
+    row = REPORTS[report_type][1]
+    return {'report_type': report_type, 'data': [row(rollup) for rollup in rollups]}
+
+
+class PercentileCont(Aggregate):
+    '''PostgreSQL's PERCENTILE_CONT ordered-set aggregate: the percentile of expression, interpolated between rows.'''
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    output_field = FloatField()
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def percentile(values, fraction):
+    '''PERCENTILE_CONT of sorted values, for databases without it.'''
+    if not values:
+        return None
+    position = fraction * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+# rows: the user's source rows; time_field: what is bucketed and filtered by date;
+# value: the aggregated expression (None when only rows are counted); group_fields: group_by name -> field.
+Source = namedtuple('Source', ['rows', 'time_field', 'value', 'group_fields'])
+
+SOURCES = {
+    #workout plans created.
+    'frequency': Source(
+        lambda user: WorkoutPlan.objects.for_user(user),
+        'created_at', None, {},
+    ),
+    #performance_metric of the logged performances.
+    'progress': Source(
+        lambda user: WorkoutPerformance.objects.for_user(user),
+        'performed_at', F('performance_metric'), {'workout': 'workout_id'},
+    ),
+    #volume (sets x reps x weight) of the exercise entries, dated by their workout plan.
+    'volume': Source(
+        lambda user: WorkoutExercise.objects.for_user(user),
+        'workout__created_at',
+        ExpressionWrapper(F('sets') * F('reps') * F('weight'), output_field=FloatField()),
+        {'exercise': 'exercise_id', 'category': 'exercise__category', 'muscle_group': 'exercise__muscle_group'},
+    ),
+}
+
+BUCKETS = ['day', 'week', 'month', 'year']
+PERCENTILES = {'median': 0.5, 'p90': 0.9}
+METRICS = ['count', 'sum', 'avg', 'min', 'max'] + list(PERCENTILES)
+DEFAULT_METRICS = ['count', 'avg', 'min', 'max']
+
+
+def _aggregates(value, metrics):
+    aggregates = {'count': Count('pk'), 'sum': Sum(value), 'avg': Avg(value), 'min': Min(value), 'max': Max(value)}
+    aggregates.update({name: PercentileCont(value, fraction) for name, fraction in PERCENTILES.items()})
+    return {metric: aggregates[metric] for metric in metrics}
+
+
+def _compute(rows, metrics):
+    '''The metrics of one bucket from its rows' values (None values are only counted).'''
+    values = sorted(value for value in rows if value is not None)
+    results = {
+        'count': len(rows),
+        'sum': sum(values) if values else None,
+        'avg': sum(values) / len(values) if values else None,
+        'min': values[0] if values else None,
+        'max': values[-1] if values else None,
+    }
+    results.update({name: percentile(values, fraction) for name, fraction in PERCENTILES.items()})
+    return {metric: results[metric] for metric in metrics}
+
+
+def run_report(user, report_type, zone, start=None, end=None, bucket='month', group_by=None, metrics=DEFAULT_METRICS):
+    '''
+    Rows of {period, [group,] metric...} for the user's report_type source
+    between start (inclusive) and end (exclusive), bucketed in zone. The
+    caller validates the parameters against SOURCES, BUCKETS and METRICS.
+    '''
+    source = SOURCES[report_type]
+    rows = source.rows(user)
+    if start is not None:
+        rows = rows.filter(**{f'{source.time_field}__gte': start})
+    if end is not None:
+        rows = rows.filter(**{f'{source.time_field}__lt': end})
+    rows = rows.annotate(period=Trunc(source.time_field, bucket, output_field=DateTimeField(), tzinfo=zone))
+    keys = ['period']
+    if group_by:
+        rows = rows.annotate(group=F(source.group_fields[group_by]))
+        keys.append('group')
+
+    if connection.vendor == 'postgresql' or not set(metrics) & set(PERCENTILES):
+        results = rows.values(*keys).annotate(**_aggregates(source.value, metrics)).order_by(*keys)
+    else:
+        values = rows.annotate(value=source.value) if source.value is not None else rows.annotate(value=F('pk'))
+        ordered = values.order_by(*keys).values_list(*keys, 'value')
+        results = []
+        for key, group in itertools.groupby(ordered.iterator(), key=lambda row: row[:-1]):
+            result = dict(zip(keys, key))
+            result.update(_compute([row[-1] for row in group], metrics))
+            results.append(result)
+
+    data = []
+    for result in results:
+        row = {'period': result['period'].astimezone(zone).date().isoformat()}
+        if group_by:
+            row['group'] = result['group']
+        row.update({metric: result[metric] for metric in metrics})
+        data.append(row)
+    return data
+
@@ -0,0 +1,143 @@
+'''
+Incremental maintenance of the monthly report rollups.
+
+WorkoutReportAPIView reads MonthlyWorkoutRollup / MonthlyPerformanceRollup
+instead of aggregating the user's whole history. The rollups are kept in step
+with the source rows by the signal handlers in workouts.signals; code paths
+that bypass model signals (bulk_create, queryset.update) must call the
+record_* functions below themselves.
+'''
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import MonthlyPerformanceRollup, MonthlyWorkoutRollup, WorkoutPerformance
+
+
+def month_of(value):
+    '''First day of the month of an aware datetime, in the current time zone (as TruncMonth does).'''
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.datetime(month.year, month.month, 1))
+    if month.month == 12:
+        end = timezone.make_aware(datetime.datetime(month.year + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime.datetime(month.year, month.month + 1, 1))
+    return start, end
+
+
+def _apply(model, user_id, month, updates, initial):
+    '''Apply updates to an existing bucket, or create it with initial values. One query when it exists.'''
+    rollups = model.objects.filter(user_id=user_id, month=month)
+    if rollups.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(user_id=user_id, month=month, **initial)
+    except IntegrityError:
+        #another request created the bucket in the meantime.
+        rollups.update(**updates)
+
+
+def record_workouts_created(workouts):
+    counts = defaultdict(int)
+    for workout in workouts:
+        counts[(workout.user_id, month_of(workout.created_at))] += 1
+    for (user_id, month), count in counts.items():
+        _apply(MonthlyWorkoutRollup, user_id, month, {'workout_count': F('workout_count') + count}, {'workout_count': count})
+
+
+def record_workout_deleted(workout):
+    month = month_of(workout.created_at)
+    rollups = MonthlyWorkoutRollup.objects.filter(user_id=workout.user_id, month=month)
+    rollups.filter(workout_count__gt=0).update(workout_count=F('workout_count') - 1)
+    rollups.filter(workout_count=0).delete()
+
+
+def record_performances_created(performances):
+    buckets = defaultdict(lambda: {'count': 0, 'values': []})
+    for performance in performances:
+        bucket = buckets[(performance.user_id, month_of(performance.performed_at))]
+        bucket['count'] += 1
+        if performance.performance_metric is not None:
+            bucket['values'].append(performance.performance_metric)
+
+    for (user_id, month), bucket in buckets.items():
+        values = bucket['values']
+        updates = {'performance_count': F('performance_count') + bucket['count']}
+        initial = {'performance_count': bucket['count']}
+        if values:
+            low, high = min(values), max(values)
+            initial.update(
+                metric_count=len(values),
+                metric_sum=sum(values),
+                metric_sum_squares=sum(v * v for v in values),
+                metric_min=low,
+                metric_max=high,
+            )
+            updates.update(
+                metric_count=F('metric_count') + len(values),
+                metric_sum=F('metric_sum') + initial['metric_sum'],
+                metric_sum_squares=F('metric_sum_squares') + initial['metric_sum_squares'],
+                # Coalesce so that an empty (NULL) bucket takes the new value on every backend.
+                metric_min=Least(Coalesce(F('metric_min'), Value(low)), Value(low)),
+                metric_max=Greatest(Coalesce(F('metric_max'), Value(high)), Value(high)),
+            )
+        _apply(MonthlyPerformanceRollup, user_id, month, updates, initial)
+
+
+def record_performance_deleted(performance):
+    record_performances_deleted([performance])
+
+
+def record_performances_deleted(performances):
+    buckets = defaultdict(list)
+    for performance in performances:
+        buckets[(performance.user_id, month_of(performance.performed_at))].append(performance.performance_metric)
+
+    for (user_id, month), values in buckets.items():
+        rollup = MonthlyPerformanceRollup.objects.filter(user_id=user_id, month=month).first()
+        if rollup is None:
+            continue
+        metrics = [value for value in values if value is not None]
+        if rollup.metric_min in metrics or rollup.metric_max in metrics:
+            #the bucket's min or max may have gone with these rows, so recompute it from the source rows.
+            rebuild_performance_month(user_id, month)
+            continue
+
+        updates = {'performance_count': F('performance_count') - len(values)}
+        if metrics:
+            updates.update(
+                metric_count=F('metric_count') - len(metrics),
+                metric_sum=F('metric_sum') - sum(metrics),
+                metric_sum_squares=F('metric_sum_squares') - sum(v * v for v in metrics),
+            )
+        MonthlyPerformanceRollup.objects.filter(pk=rollup.pk).update(**updates)
+        MonthlyPerformanceRollup.objects.filter(pk=rollup.pk, performance_count=0).delete()
+
+
+def rebuild_performance_month(user_id, month):
+    '''Recompute one bucket from the WorkoutPerformance rows of that month.'''
+    start, end = month_bounds(month)
+    stats = WorkoutPerformance.objects.filter(
+        user_id=user_id, performed_at__gte=start, performed_at__lt=end
+    ).aggregate(
+        performance_count=Count('id'),
+        metric_count=Count('performance_metric'),
+        metric_sum=Sum('performance_metric'),
+        metric_sum_squares=Sum(F('performance_metric') * F('performance_metric')),
+        metric_min=Min('performance_metric'),
+        metric_max=Max('performance_metric'),
+    )
+    if not stats['performance_count']:
+        MonthlyPerformanceRollup.objects.filter(user_id=user_id, month=month).delete()
+        return
+    stats['metric_sum'] = stats['metric_sum'] or 0
+    stats['metric_sum_squares'] = stats['metric_sum_squares'] or 0
+    MonthlyPerformanceRollup.objects.update_or_create(user_id=user_id, month=month, defaults=stats)
@@ -1,12 +1,52 @@
+import zoneinfo
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import WorkoutExercise, WorkoutPlan, ScheduledWorkout, WorkoutComment, WorkoutPerformance
+from exercises.models import Exercise
+from . import recurrence, records
+from .models import WorkoutExercise, WorkoutPlan, ScheduledWorkout, WorkoutComment, WorkoutPerformance, RecurringSchedule, RecurrenceException, PersonalRecord
 
 
 
+def _as_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PrefetchedExerciseField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that first looks the exercise up in a batch loaded by
+    WorkoutExerciseListSerializer, falling back to a single query otherwise.
+    """
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is not None and _as_pk(data) in self.prefetched:
+            return self.prefetched[_as_pk(data)]
+        return super().to_internal_value(data)
+
+
+class WorkoutExerciseListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # Resolve every referenced exercise with one query instead of one per row.
+        if isinstance(data, list):
+            pks = {_as_pk(item.get('exercise')) for item in data if isinstance(item, dict)}
+            pks.discard(None)
+            self.child.fields['exercise'].prefetched = Exercise.objects.in_bulk(pks)
+        return super().to_internal_value(data)
+
+
 class WorkoutExerciseSerializer(serializers.ModelSerializer):
+    #writable so that updates can match submitted rows against the existing ones.
+    id = serializers.IntegerField(required=False)
+    exercise = PrefetchedExerciseField(queryset=Exercise.objects.all())
+
     class Meta:
         model = WorkoutExercise
         fields = ['id', 'exercise', 'sets', 'reps', 'weight']
+        list_serializer_class = WorkoutExerciseListSerializer
 
 
 
@@ -17,15 +57,20 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WorkoutPlan
-        fields = ['id', 'title', 'description', 'scheduled_date', 'exercises', 'created_at', 'updated_at']
+        fields = ['id', 'client_id', 'title', 'description', 'scheduled_date', 'exercises', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
+        extra_kwargs = {'client_id': {'required': False}}
 
     def create(self, validated_data):
         exercises_data = validated_data.pop('exercises')
-        workout = WorkoutPlan.objects.create(**validated_data)
-        for exercise_data in exercises_data:
-            # Create each WorkoutExercise linked to the workout
-            WorkoutExercise.objects.create(workout=workout, **exercise_data)
+        with transaction.atomic():
+            workout = WorkoutPlan.objects.create(**validated_data)
+            # Insert all WorkoutExercise rows linked to the workout in one statement.
+            rows = WorkoutExercise.objects.bulk_create([
+                WorkoutExercise(workout=workout, **self._exercise_fields(exercise_data))
+                for exercise_data in exercises_data
+            ])
+            records.record_exercises_created(rows)
         return workout
 
     def update(self, instance, validated_data):
@@ -33,14 +78,66 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
         instance.title = validated_data.get('title', instance.title)
         instance.description = validated_data.get('description', instance.description)
         instance.scheduled_date = validated_data.get('scheduled_date', instance.scheduled_date)
-        instance.save()
-        if exercises_data is not None:
-            # For simplicity, delete existing exercises and recreate them.
-            instance.exercises.all().delete()
-            for exercise_data in exercises_data:
-                WorkoutExercise.objects.create(workout=instance, **exercise_data)
+        with transaction.atomic():
+            instance.save()
+            if exercises_data is not None:
+                self._sync_exercises(instance, exercises_data)
+                # Drop exercises prefetched by the view so the response shows the saved rows.
+                instance._prefetched_objects_cache = {}
         return instance
 
+    @staticmethod
+    def _exercise_fields(exercise_data):
+        return {field: value for field, value in exercise_data.items() if field != 'id'}
+
+    def _sync_exercises(self, instance, exercises_data):
+        """
+        Make the workout's exercises match exercises_data with bulk statements.
+        Rows are matched by "id": submitted rows without an id are inserted,
+        matched rows are updated only if a field changed, and existing rows
+        missing from the payload are deleted.
+        """
+        existing = {row.id: row for row in instance.exercises.all()}
+        to_create, to_update, changed_fields, kept_ids = [], {}, set(), set()
+
+        for exercise_data in exercises_data:
+            row_id = exercise_data.get('id')
+            fields = self._exercise_fields(exercise_data)
+            if row_id is None:
+                to_create.append(WorkoutExercise(workout=instance, **fields))
+                continue
+            if row_id not in existing or row_id in kept_ids:
+                raise serializers.ValidationError(
+                    {'exercises': [f"Invalid exercise id {row_id} for this workout."]}
+                )
+            kept_ids.add(row_id)
+
+            row = existing[row_id]
+            for name, value in fields.items():
+                # Compare foreign keys by id so the related rows are never loaded.
+                attname = WorkoutExercise._meta.get_field(name).attname
+                new_value = value.pk if attname != name and value is not None else value
+                if getattr(row, attname) != new_value:
+                    setattr(row, attname, new_value)
+                    changed_fields.add(name)
+                    to_update[row_id] = row
+
+        stale_ids = existing.keys() - kept_ids
+        if stale_ids:
+            WorkoutExercise.objects.filter(id__in=stale_ids).delete()
+        if to_update:
+            WorkoutExercise.objects.bulk_update(list(to_update.values()), sorted(changed_fields))
+        if to_create:
+            WorkoutExercise.objects.bulk_create(to_create)
+
+        #bulk statements send no signals, so the personal records are kept up to date here.
+        if stale_ids:
+            records.rebuild_orphaned(instance.user_id)
+        if to_update:
+            records.record_exercises_updated(to_update.values())
+        if to_create:
+            records.record_exercises_created(to_create)
+
 
 
 
@@ -48,8 +145,96 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
 class ScheduledWorkoutSerializer(serializers.ModelSerializer):
     class Meta:
         model = ScheduledWorkout
-        fields = ['id', 'workout', 'scheduled_datetime', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'client_id', 'workout', 'scheduled_datetime', 'reminder_sent_at', 'created_at', 'updated_at']
+        read_only_fields = ['reminder_sent_at', 'created_at', 'updated_at']
+        extra_kwargs = {'client_id': {'required': False}}
+
+    def update(self, instance, validated_data):
+        #a rescheduled workout gets a new reminder.
+        if validated_data.get('scheduled_datetime', instance.scheduled_datetime) != instance.scheduled_datetime:
+            validated_data['reminder_sent_at'] = None
+        return super().update(instance, validated_data)
+
+
+
+
+
+
+class RecurringScheduleSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(child=serializers.ChoiceField(choices=recurrence.WEEKDAYS), required=False)
+    rrule = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecurringSchedule
+        fields = ['id', 'workout', 'start', 'timezone', 'frequency', 'interval', 'weekdays', 'until', 'count', 'rrule', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
+        extra_kwargs = {'interval': {'min_value': 1}, 'count': {'min_value': 1, 'max_value': recurrence.MAX_COUNT}}
+
+    def get_rrule(self, obj):
+        return recurrence.to_rrule(obj)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['weekdays'] = instance.weekday_list()
+        return data
+
+    def validate_timezone(self, value):
+        try:
+            zoneinfo.ZoneInfo(value)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError, OSError):
+            raise serializers.ValidationError("Unknown time zone.")
+        return value
+
+    def validate(self, data):
+        if not self.partial:
+            #a full update without weekdays clears them, like any other omitted optional field.
+            data.setdefault('weekdays', [])
+        weekdays = data.get('weekdays', self.instance.weekday_list() if self.instance else [])
+        frequency = data.get('frequency', getattr(self.instance, 'frequency', None))
+        if weekdays and frequency != recurrence.WEEKLY:
+            raise serializers.ValidationError({'weekdays': "Only weekly rules can repeat on given weekdays."})
+        if data.get('until') is not None and data.get('count') is not None:
+            raise serializers.ValidationError("Give either 'until' or 'count', not both.")
+        if 'weekdays' in data:
+            data['weekdays'] = ','.join(sorted(set(data['weekdays']), key=recurrence.WEEKDAYS.index))
+        return data
+
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    #read-only view of a workouts.recurrence.Occurrence.
+    recurring_schedule = serializers.IntegerField(source='rule.id')
+    workout = serializers.IntegerField(source='rule.workout_id')
+    scheduled_datetime = serializers.DateTimeField()
+    original_datetime = serializers.DateTimeField()
+
+
+
+class RecurrenceExceptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecurrenceException
+        fields = ['id', 'recurring_schedule', 'original_datetime', 'is_cancelled', 'scheduled_datetime', 'created_at', 'updated_at']
+        read_only_fields = ['recurring_schedule', 'created_at', 'updated_at']
+
+    def validate(self, data):
+        if bool(data.get('is_cancelled')) == bool(data.get('scheduled_datetime')):
+            raise serializers.ValidationError("Either cancel the occurrence or give its new 'scheduled_datetime'.")
+        if not recurrence.is_occurrence(self.context['recurring_schedule'], data['original_datetime']):
+            raise serializers.ValidationError({'original_datetime': "Not an occurrence of this recurring schedule."})
+        return data
+
+
+
+
+
+
+class PersonalRecordSerializer(serializers.ModelSerializer):
+    exercise_name = serializers.CharField(source='exercise.name', read_only=True)
+
+    class Meta:
+        model = PersonalRecord
+        fields = ['exercise', 'exercise_name', 'kind', 'value', 'workout_exercise', 'achieved_at']
+        read_only_fields = fields
 
 
 
@@ -71,5 +256,19 @@ class WorkoutPerformanceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WorkoutPerformance
-        fields = ['id', 'workout', 'user', 'performance_metric', 'notes', 'performed_at']
-        read_only_fields = ['id', 'user', 'performed_at']
+        fields = ['id', 'client_id', 'workout', 'user', 'performance_metric', 'notes', 'performed_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'performed_at', 'updated_at']
+        extra_kwargs = {'client_id': {'required': False}}
+
+
+
+class WorkoutPerformanceBulkItemSerializer(WorkoutPerformanceSerializer):
+    #a plain id: ownership of all referenced workouts is checked with one query by the view.
+    workout = serializers.IntegerField(min_value=1)
+    #when the set was done, for sessions recorded offline; the upload time by default.
+    performed_at = serializers.DateTimeField(required=False)
+
+    def validate_performed_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Performances cannot be logged in the future.")
+        return value
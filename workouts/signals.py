@@ -0,0 +1,147 @@
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from exercises.cache import catalog_changed
+
+from . import caching, records, rollups
+from .models import RecurrenceException, RecurringSchedule, ScheduledWorkout, SyncTombstone, WorkoutExercise, WorkoutPerformance, WorkoutPlan
+
+
+def _deleting_user(origin):
+    #when the user account itself is deleted there is nobody left to sync or report to.
+    if isinstance(origin, QuerySet):
+        return origin.model is User
+    return isinstance(origin, User)
+
+
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _tombstone(model, instance, user_id=None):
+    return SyncTombstone(
+        user_id=user_id or instance.user_id, model=model, object_id=instance.pk, client_id=getattr(instance, 'client_id', None)
+    )
+
+
+def _record_tombstone(model, instance, user_id=None):
+    _tombstone(model, instance, user_id).save()
+
+
+@receiver(catalog_changed)
+def exercise_catalog_changed(sender, **kwargs):
+    #exercise names and categories are part of the cached reports and analytics.
+    caching.bump_catalog()
+
+
+@receiver(post_save, sender=WorkoutPlan)
+def workout_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        rollups.record_workouts_created([instance])
+    caching.bump(instance.user_id)
+
+
+@receiver(pre_delete, sender=WorkoutPlan)
+def workout_deleting(sender, instance, origin=None, **kwargs):
+    #the plan's performances go with it: performance_deleted() leaves them alone and workout_deleted()
+    #updates their rollups and tombstones in a few statements, however many there are.
+    if _deleting_user(origin):
+        return
+    instance._deleted_performances = list(
+        WorkoutPerformance.objects.filter(workout=instance).only('user_id', 'client_id', 'performance_metric', 'performed_at')
+    )
+
+
+@receiver(post_delete, sender=WorkoutPlan)
+def workout_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    rollups.record_workout_deleted(instance)
+    performances = getattr(instance, '_deleted_performances', [])
+    if performances:
+        rollups.record_performances_deleted(performances)
+        SyncTombstone.objects.bulk_create([_tombstone('workout_performances', performance) for performance in performances])
+    #the plan's entries are gone, and with them the source of any record they held.
+    records.rebuild_orphaned(instance.user_id)
+    _record_tombstone('workouts', instance)
+    caching.bump(instance.user_id)
+
+
+def _touch_workout(entry):
+    #a plan's ETag (see workouts.conditional) and cached results cover its entries.
+    WorkoutPlan.objects.filter(pk=entry.workout_id).update(updated_at=timezone.now())
+    caching.bump(entry.workout.user_id)
+
+
+#entries are mostly written and deleted with bulk statements (see WorkoutPlanSerializer), which send no
+#post_save and whose writer saves the plan and the personal records itself; these cover the other writes.
+@receiver(post_save, sender=WorkoutExercise)
+def exercise_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        records.record_exercises_created([instance])
+    else:
+        records.record_exercises_updated([instance])
+    _touch_workout(instance)
+
+
+@receiver(post_delete, sender=WorkoutExercise)
+def exercise_deleted(sender, instance, origin=None, **kwargs):
+    #deleted along with their plan, or by a bulk writer: the plan's signals cover them. Entries removed
+    #with their exercise (one, or a queryset of them) still touch their plan.
+    if isinstance(origin, WorkoutPlan) or _deleting_user(origin):
+        return
+    if isinstance(origin, QuerySet) and origin.model in (WorkoutExercise, WorkoutPlan):
+        return
+    records.rebuild_orphaned(instance.workout.user_id)
+    _touch_workout(instance)
+
+
+@receiver(post_delete, sender=ScheduledWorkout)
+def schedule_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    _record_tombstone('scheduled_workouts', instance)
+
+
+@receiver(post_delete, sender=RecurringSchedule)
+def recurring_schedule_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    _record_tombstone('recurring_schedules', instance)
+
+
+@receiver(post_delete, sender=RecurrenceException)
+def recurrence_exception_deleted(sender, instance, origin=None, **kwargs):
+    #deleted along with their rule (or its plan, or the user): the rule's tombstone covers them.
+    if _origin_model(origin) in (RecurringSchedule, WorkoutPlan) or _deleting_user(origin):
+        return
+    _record_tombstone('recurrence_exceptions', instance, user_id=instance.recurring_schedule.user_id)
+
+
+@receiver(post_save, sender=WorkoutPerformance)
+def performance_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        rollups.record_performances_created([instance])
+    else:
+        #the old metric is not known here, so recompute the month from its rows.
+        rollups.rebuild_performance_month(instance.user_id, rollups.month_of(instance.performed_at))
+    caching.bump(instance.user_id)
+
+
+@receiver(post_delete, sender=WorkoutPerformance)
+def performance_deleted(sender, instance, origin=None, **kwargs):
+    #deleted along with their plan: workout_deleted() covers them.
+    if _origin_model(origin) is WorkoutPlan or _deleting_user(origin):
+        return
+    rollups.record_performance_deleted(instance)
+    _record_tombstone('workout_performances', instance)
+    caching.bump(instance.user_id)
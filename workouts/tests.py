@@ -1,11 +1,27 @@
 import datetime
+import io
+import json
+import os
+import tempfile
+import uuid
+from unittest import mock
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
-from workouts.models import WorkoutPlan, WorkoutExercise, ScheduledWorkout
+from workouts.models import WorkoutPlan, WorkoutExercise, ScheduledWorkout, WorkoutComment, WorkoutPerformance, MonthlyPerformanceRollup, SyncTombstone, RecurringSchedule, RecurrenceException, PersonalRecord
 from exercises.models import Exercise
 from django.utils import timezone
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from workouts import analytics, benchmark, caching, downsampling, records, recurrence, reminders, reports
+from workout_tracker import metrics
+from workout_tracker.profiling import fingerprint
+from rest_framework_simplejwt.tokens import AccessToken
 
 
 
@@ -68,8 +84,46 @@ class WorkoutCRUDTests(APITestCase):
         response = self.client.get(self.list_create_url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         #Only one workout should be returned for user1.
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["title"], "User1 Workout")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["title"], "User1 Workout")
+        self.assertIsNone(response.data["next"])
+
+    def test_list_workouts_cursor_pagination(self):
+        """
+        Ensure the workout list is paged newest first and following "next" walks every plan exactly once.
+        """
+        for i in range(5):
+            WorkoutPlan.objects.create(user=self.user1, title=f"Workout {i}", description="Desc")
+
+        self.authenticate(self.user1)
+        titles = []
+        url = f"{self.list_create_url}?page_size=2"
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            titles.extend(item["title"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(titles, [f"Workout {i}" for i in reversed(range(5))])
+
+    def test_list_workouts_query_count_is_flat(self):
+        """
+        Ensure nested exercises are prefetched instead of queried once per plan.
+        """
+        for i in range(10):
+            workout = WorkoutPlan.objects.create(user=self.user1, title=f"Workout {i}", description="Desc")
+            WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, sets=3, reps=10)
+
+        self.authenticate(self.user1)
+        #the ETag aggregate, one query for the page of plans and one for their exercises.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_create_url, format='json')
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_list_workouts_invalid_cursor(self):
+        self.authenticate(self.user1)
+        response = self.client.get(f"{self.list_create_url}?cursor=not-a-cursor", format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     
     
@@ -116,6 +170,84 @@ class WorkoutCRUDTests(APITestCase):
 
     
     
+    def test_update_workout_diffs_exercises(self):
+        """
+        Test that rows submitted with an id are kept, changed rows are updated,
+        omitted rows are deleted and rows without an id are added.
+        """
+        workout = WorkoutPlan.objects.create(user=self.user1, title="Plan", description="Desc")
+        kept = WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, sets=3, reps=10, weight=50.0)
+        changed = WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, sets=3, reps=10, weight=50.0)
+        removed = WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, sets=3, reps=10, weight=50.0)
+        detail_url = reverse("workout_detail", kwargs={"pk": workout.id})
+        self.authenticate(self.user1)
+
+        payload = {
+            "title": "Plan",
+            "description": "Desc",
+            "exercises": [
+                {"id": kept.id, "exercise": self.exercise.id, "sets": 3, "reps": 10, "weight": 50.0},
+                {"id": changed.id, "exercise": self.exercise.id, "sets": 5, "reps": 5, "weight": 80.0},
+                {"exercise": self.exercise.id, "sets": 2, "reps": 20},
+            ]
+        }
+        response = self.client.put(detail_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["exercises"]), 3)
+        self.assertTrue(WorkoutExercise.objects.filter(id=kept.id, reps=10).exists())
+        self.assertTrue(WorkoutExercise.objects.filter(id=changed.id, sets=5, reps=5, weight=80.0).exists())
+        self.assertFalse(WorkoutExercise.objects.filter(id=removed.id).exists())
+        self.assertEqual(WorkoutExercise.objects.filter(workout=workout, reps=20).count(), 1)
+
+    def test_update_workout_rejects_foreign_exercise_id(self):
+        """
+        Test that a row id belonging to another workout is rejected and nothing is written.
+        """
+        other = WorkoutPlan.objects.create(user=self.user2, title="Other", description="Desc")
+        foreign = WorkoutExercise.objects.create(workout=other, exercise=self.exercise, sets=3, reps=10)
+        workout = WorkoutPlan.objects.create(user=self.user1, title="Plan", description="Desc")
+        detail_url = reverse("workout_detail", kwargs={"pk": workout.id})
+        self.authenticate(self.user1)
+
+        payload = {
+            "title": "Renamed",
+            "description": "Desc",
+            "exercises": [{"id": foreign.id, "exercise": self.exercise.id, "sets": 1, "reps": 1}]
+        }
+        response = self.client.put(detail_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        workout.refresh_from_db()
+        self.assertEqual(workout.title, "Plan")
+        self.assertEqual(WorkoutExercise.objects.get(id=foreign.id).reps, 10)
+
+    def test_save_large_workout_uses_bulk_statements(self):
+        """
+        Test that creating and updating a 40-exercise plan does not issue a query per row.
+        """
+        self.authenticate(self.user1)
+        payload = {
+            "title": "Big Plan",
+            "description": "Desc",
+            "exercises": [
+                {"exercise": self.exercise.id, "sets": 3, "reps": 10, "weight": 50.0}
+                for _ in range(40)
+            ]
+        }
+        with CaptureQueriesContext(connection) as create_queries:
+            response = self.client.post(self.list_create_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        #personal records add a constant 4 (savepoint, locked select, insert, release).
+        self.assertLess(len(create_queries), 16)
+
+        payload["exercises"] = response.data["exercises"]
+        payload["exercises"][0]["reps"] = 12
+        detail_url = reverse("workout_detail", kwargs={"pk": response.data["id"]})
+        with CaptureQueriesContext(connection) as update_queries:
+            response = self.client.put(detail_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        #the updated row holds the records, which are rebuilt with a constant number of queries.
+        self.assertLess(len(update_queries), 18)
+
     def test_delete_workout(self):
         """
         Test that the owner can delete a workout plan.
@@ -338,4 +470,1284 @@ class ScheduledWorkoutCRUDTests(APITestCase):
         detail_url = reverse("scheduled_workout_detail", kwargs={"pk": schedule.id})
         self.authenticate(self.user2)
         response = self.client.delete(detail_url, format="json")
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+
+
+class WorkoutReportTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.workout1 = WorkoutPlan.objects.create(user=self.user1, title="Plan A", description="Desc")
+        self.workout2 = WorkoutPlan.objects.create(user=self.user1, title="Plan B", description="Desc")
+        WorkoutPlan.objects.create(user=self.user2, title="User2 Plan", description="Desc")
+        self.report_url = reverse("workout_report")
+        self.month = timezone.localtime().strftime('%Y-%m')
+        self.client.force_authenticate(user=self.user1)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def log(self, metric, user=None, workout=None):
+        return WorkoutPerformance.objects.create(
+            user=user or self.user1, workout=workout or self.workout1, performance_metric=metric
+        )
+
+    def test_frequency_report(self):
+        """
+        Test that the frequency report counts only the user's workouts and follows deletes.
+        """
+        response = self.client.get(self.report_url, {"report_type": "frequency"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"], [{"month": self.month, "workout_count": 2}])
+
+        self.workout2.delete()
+        response = self.client.get(self.report_url, {"report_type": "frequency"})
+        self.assertEqual(response.data["data"], [{"month": self.month, "workout_count": 1}])
+
+    def test_progress_report(self):
+        """
+        Test that the progress report statistics follow creates, updates and deletes.
+        """
+        self.log(10.0)
+        middle = self.log(20.0)
+        highest = self.log(60.0)
+        self.log(None)
+        self.log(1000.0, user=self.user2)
+
+        response = self.client.get(self.report_url, {"report_type": "progress"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row, = response.data["data"]
+        self.assertEqual(row["month"], self.month)
+        self.assertEqual(row["performance_count"], 4)
+        self.assertAlmostEqual(row["average_performance"], 30.0)
+        self.assertEqual((row["min_performance"], row["max_performance"]), (10.0, 60.0))
+
+        highest.delete()
+        middle.performance_metric = 40.0
+        middle.save()
+        row, = self.client.get(self.report_url, {"report_type": "progress"}).data["data"]
+        self.assertEqual(row["performance_count"], 3)
+        self.assertAlmostEqual(row["average_performance"], 25.0)
+        self.assertAlmostEqual(row["stddev_performance"], 15.0)
+        self.assertEqual((row["min_performance"], row["max_performance"]), (10.0, 40.0))
+
+        WorkoutPerformance.objects.filter(user=self.user1).delete()
+        self.assertFalse(MonthlyPerformanceRollup.objects.filter(user=self.user1).exists())
+
+    def test_deleting_a_plan_does_not_query_per_performance(self):
+        def delete_plan(performances):
+            workout = WorkoutPlan.objects.create(user=self.user1, title="Logged", description="Desc")
+            for metric in range(performances):
+                self.log(float(metric), workout=workout)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(reverse("workout_detail", kwargs={"pk": workout.id}))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            self.assertEqual(SyncTombstone.objects.filter(user=self.user1, model="workout_performances").count(), performances)
+            SyncTombstone.objects.all().delete()
+            return len(queries)
+
+        self.log(5.0, workout=self.workout2)
+        self.assertEqual(delete_plan(3), delete_plan(30))
+        row, = self.client.get(self.report_url, {"report_type": "progress"}).data["data"]
+        self.assertEqual((row["performance_count"], row["min_performance"], row["max_performance"]), (1, 5.0, 5.0))
+
+    def test_report_reads_rollups_only(self):
+        for metric in range(50):
+            self.log(float(metric))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.report_url, {"report_type": "progress"})
+        self.assertEqual(response.data["data"][0]["performance_count"], 50)
+
+    def test_invalid_report_type(self):
+        response = self.client.get(self.report_url, {"report_type": "unknown"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def log_at(self, metric, moment):
+        performance = self.log(metric)
+        WorkoutPerformance.objects.filter(pk=performance.pk).update(performed_at=moment)
+
+    def test_date_range_buckets_and_percentiles(self):
+        utc = datetime.timezone.utc
+        for day, metric in ((1, 10.0), (1, 20.0), (1, 30.0), (1, 100.0), (2, 5.0), (40, 7.0)):
+            self.log_at(metric, datetime.datetime(2026, 1, 1, 12, tzinfo=utc) + datetime.timedelta(days=day - 1))
+        response = self.client.get(self.report_url, {
+            "report_type": "progress", "start": "2026-01-01", "end": "2026-02-01", "bucket": "day", "metrics": "count,median,p90,sum",
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first, second = response.data["data"]
+        self.assertEqual((first["period"], first["count"], first["sum"], first["median"]), ("2026-01-01", 4, 160.0, 25.0))
+        self.assertAlmostEqual(first["p90"], 79.0)  #interpolated like PERCENTILE_CONT
+        self.assertEqual((second["period"], second["median"]), ("2026-01-02", 5.0))
+
+        response = self.client.get(self.report_url, {"report_type": "progress", "bucket": "year", "metrics": "count,max"})
+        self.assertEqual(response.data["data"], [{"period": "2026-01-01", "count": 6, "max": 100.0}])
+
+    def test_volume_grouped_by_category(self):
+        strength = Exercise.objects.create(name="Squat", description="", category="strength", muscle_group="legs")
+        cardio = Exercise.objects.create(name="Rowing", description="", category="cardio", muscle_group="back")
+        WorkoutExercise.objects.create(workout=self.workout1, exercise=strength, sets=3, reps=5, weight=100.0)
+        WorkoutExercise.objects.create(workout=self.workout2, exercise=strength, sets=1, reps=5, weight=80.0)
+        WorkoutExercise.objects.create(workout=self.workout2, exercise=cardio, sets=1, reps=10, weight=20.0)
+        response = self.client.get(self.report_url, {"report_type": "volume", "group_by": "category", "metrics": "count,sum,median"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row["group"], row["count"], row["sum"], row["median"]) for row in response.data["data"]],
+                         [("cardio", 1, 200.0, 200.0), ("strength", 2, 1900.0, 950.0)])
+
+    def test_metrics_may_be_separated_by_spaces(self):
+        self.log(10.0)
+        response = self.client.get(self.report_url, {"report_type": "progress", "metrics": "count, avg"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["metrics"]), {"count", "avg"})
+
+    def test_custom_reports_are_cached_until_new_data(self):
+        self.log(10.0)
+        params = {"report_type": "progress", "bucket": "week", "metrics": "count,median"}
+        first = self.client.get(self.report_url, params).data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.report_url, params).data, first)
+        self.log(30.0)
+        self.assertEqual(self.client.get(self.report_url, params).data["data"][0]["median"], 20.0)
+
+    def test_repeated_reports_do_not_query(self):
+        self.log(10.0)
+        params = {"report_type": "progress"}
+        first = self.client.get(self.report_url, params).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.report_url, params).json(), first)
+        #the async view reads the same entries; its first request also loads the token's user.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user1)}")
+        self.assertEqual(self.client.get(reverse("async_workout_report"), params).json(), first)
+        with self.assertNumQueries(0):
+            self.client.get(reverse("async_workout_report"), params)
+
+    def test_writes_bump_the_data_version(self):
+        exercise = Exercise.objects.create(name="Squat", description="", category="strength", muscle_group="legs")
+        writes = [
+            lambda: self.workout1.save(),
+            lambda: WorkoutExercise.objects.create(workout=self.workout1, exercise=exercise, sets=3, reps=5, weight=100.0),
+            lambda: WorkoutExercise.objects.filter(workout=self.workout1).first().delete(),
+            lambda: self.log(10.0),
+            lambda: WorkoutPerformance.objects.filter(user=self.user1).first().delete(),
+            lambda: self.workout2.delete(),
+        ]
+        for write in writes:
+            version = caching.data_version(self.user1.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertGreater(caching.data_version(self.user1.id), version)
+        other = caching.data_version(self.user2.id)
+        self.log(5.0, user=self.user2, workout=WorkoutPlan.objects.filter(user=self.user2).first())
+        self.assertGreater(caching.data_version(self.user2.id), other)
+
+    def test_bulk_performances_invalidate_reports(self):
+        self.log(10.0)
+        self.assertEqual(self.client.get(self.report_url, {"report_type": "progress"}).data["data"][0]["performance_count"], 1)
+        self.client.post(reverse("workout_performance_bulk_create"), [
+            {"workout": self.workout1.id, "performance_metric": 20.0},
+        ], format="json")
+        self.assertEqual(self.client.get(self.report_url, {"report_type": "progress"}).data["data"][0]["performance_count"], 2)
+
+    def test_catalog_changes_invalidate_reports(self):
+        exercise = Exercise.objects.create(name="Squat", description="", category="strength", muscle_group="legs")
+        WorkoutExercise.objects.create(workout=self.workout1, exercise=exercise, sets=3, reps=5, weight=100.0)
+        params = {"report_type": "volume", "group_by": "category"}
+        self.assertEqual([row["group"] for row in self.client.get(self.report_url, params).data["data"]], ["strength"])
+        exercise.category = "cardio"
+        exercise.save()
+        self.assertEqual([row["group"] for row in self.client.get(self.report_url, params).data["data"]], ["cardio"])
+
+    def test_evicted_version_restarts_above_old_values(self):
+        version = caching.data_version(self.user1.id)
+        cache.delete(f"data-version:{self.user1.id}")
+        caching.bump(self.user1.id)
+        self.assertGreater(caching.data_version(self.user1.id), version)
+
+    def test_invalid_report_parameters(self):
+        for params in (
+            {"report_type": "frequency", "metrics": "sum"},
+            {"report_type": "progress", "group_by": "category"},
+            {"report_type": "volume", "bucket": "hour"},
+            {"report_type": "progress", "metrics": "mode"},
+            {"report_type": "progress", "tz": "Mars/Olympus"},
+            {"report_type": "progress", "tz": "Etc", "bucket": "week"},
+            {"report_type": "progress", "start": "2026-01-01"},
+        ):
+            self.assertEqual(self.client.get(self.report_url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_percentile_matches_database_definition(self):
+        self.assertEqual(reports.percentile([], 0.5), None)
+        self.assertEqual(reports.percentile([4.0], 0.9), 4.0)
+        self.assertEqual(reports.percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.5)
+
+
+
+
+
+class WorkoutPerformanceBulkTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.workout1 = WorkoutPlan.objects.create(user=self.user1, title="Plan A", description="Desc")
+        self.workout2 = WorkoutPlan.objects.create(user=self.user2, title="Plan B", description="Desc")
+        self.bulk_url = reverse("workout_performance_bulk_create")
+        self.client.force_authenticate(user=self.user1)
+
+    def test_bulk_create_reports_each_item(self):
+        """
+        Test that valid records are created and invalid or foreign ones are reported per item.
+        """
+        payload = [
+            {"workout": self.workout1.id, "performance_metric": 100.0, "notes": "set 1"},
+            {"workout": self.workout1.id, "performance_metric": "heavy"},
+            {"workout": self.workout2.id, "performance_metric": 50.0},
+            {"workout": self.workout1.id},
+        ]
+        response = self.client.post(self.bulk_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual((response.data["created"], response.data["failed"]), (2, 2))
+        self.assertEqual([item["status"] for item in response.data["results"]], [201, 400, 403, 201])
+        self.assertEqual(response.data["results"][0]["data"]["notes"], "set 1")
+        self.assertEqual(WorkoutPerformance.objects.filter(user=self.user1).count(), 2)
+        self.assertFalse(WorkoutPerformance.objects.filter(workout=self.workout2).exists())
+
+        report = self.client.get(reverse("workout_report"), {"report_type": "progress"})
+        self.assertEqual(report.data["data"][0]["performance_count"], 2)
+
+    def test_bulk_create_keeps_the_recorded_time(self):
+        """
+        Test that sessions recorded offline keep their time, which may not be in the future.
+        """
+        recorded = timezone.now() - datetime.timedelta(days=40)
+        payload = [
+            {"workout": self.workout1.id, "performance_metric": 10.0, "performed_at": recorded.isoformat()},
+            {"workout": self.workout1.id, "performance_metric": 20.0},
+            {"workout": self.workout1.id, "performance_metric": 30.0, "performed_at": (timezone.now() + datetime.timedelta(hours=1)).isoformat()},
+        ]
+        response = self.client.post(self.bulk_url, payload, format="json")
+        self.assertEqual([item["status"] for item in response.data["results"]], [201, 201, 400])
+        self.assertEqual(WorkoutPerformance.objects.get(performance_metric=10.0).performed_at, recorded)
+        self.assertGreater(WorkoutPerformance.objects.get(performance_metric=20.0).performed_at, recorded)
+        months = self.client.get(reverse("workout_report"), {"report_type": "progress"}).data["data"]
+        self.assertEqual(sorted(row["month"] for row in months),
+                         sorted({timezone.localtime(recorded).strftime("%Y-%m"), timezone.localtime().strftime("%Y-%m")}))
+
+    def test_bulk_create_query_count_is_flat(self):
+        """
+        Test that the number of queries does not depend on the number of records.
+        """
+        payload = [{"workout": self.workout1.id, "performance_metric": float(i)} for i in range(200)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.bulk_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 200)
+        self.assertLess(len(queries), 10)
+
+    def test_bulk_create_with_no_valid_item_is_a_bad_request(self):
+        payload = [{"workout": self.workout2.id, "performance_metric": 50.0}, {"workout": self.workout1.id, "performance_metric": "heavy"}]
+        response = self.client.post(self.bulk_url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual((response.data["created"], response.data["failed"]), (0, 2))
+        self.assertEqual([item["status"] for item in response.data["results"]], [403, 400])
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(self.bulk_url, {"workout": self.workout1.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+
+class SyncTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user1, title="Plan", description="Desc")
+        WorkoutPlan.objects.create(user=self.user2, title="User2 Plan", description="Desc")
+        self.sync_url = reverse("sync")
+        self.client.force_authenticate(user=self.user1)
+
+    def test_full_snapshot_then_delta(self):
+        """
+        Test that a sync without "since" returns everything, and the next one only what changed.
+        """
+        schedule = ScheduledWorkout.objects.create(
+            user=self.user1, workout=self.workout, scheduled_datetime=timezone.now() + datetime.timedelta(days=1)
+        )
+        #older than the watermark's safety margin, so not sent again.
+        WorkoutPlan.objects.filter(pk=self.workout.pk).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        response = self.client.get(self.sync_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["full"])
+        self.assertEqual([w["id"] for w in response.data["workouts"]], [self.workout.id])
+        self.assertEqual(len(response.data["scheduled_workouts"]), 1)
+        watermark = response.data["server_time"]
+
+        performance = WorkoutPerformance.objects.create(user=self.user1, workout=self.workout, performance_metric=5.0)
+        schedule_id = schedule.id
+        schedule.delete()
+
+        response = self.client.get(self.sync_url, {"since": watermark})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["full"])
+        self.assertEqual(response.data["workouts"], [])
+        self.assertEqual([p["id"] for p in response.data["workout_performances"]], [performance.id])
+        self.assertEqual(response.data["deleted"]["scheduled_workouts"], [schedule_id])
+
+    def test_late_commits_are_not_skipped(self):
+        watermark = self.client.get(self.sync_url).data["server_time"]
+        #saved a few seconds before that sync, but committed after it read the table.
+        performance = WorkoutPerformance.objects.create(user=self.user1, workout=self.workout, performance_metric=5.0)
+        WorkoutPerformance.objects.filter(pk=performance.pk).update(updated_at=timezone.now() - datetime.timedelta(seconds=5))
+        response = self.client.get(self.sync_url, {"since": watermark})
+        self.assertEqual([p["id"] for p in response.data["workout_performances"]], [performance.id])
+
+    def test_recurring_schedules_are_synced(self):
+        start = timezone.now() - datetime.timedelta(days=2)
+        rule = RecurringSchedule.objects.create(user=self.user1, workout=self.workout, start=start, frequency="DAILY")
+        exception = RecurrenceException.objects.create(recurring_schedule=rule, original_datetime=start, is_cancelled=True)
+        response = self.client.get(self.sync_url)
+        self.assertEqual([r["id"] for r in response.data["recurring_schedules"]], [rule.id])
+        self.assertEqual([(e["id"], e["recurring_schedule"]) for e in response.data["recurrence_exceptions"]], [(exception.id, rule.id)])
+
+        exception_id, rule_id = exception.id, rule.id
+        exception.delete()
+        rule.delete()
+        deleted = self.client.get(self.sync_url, {"since": response.data["server_time"]}).data["deleted"]
+        self.assertEqual((deleted["recurrence_exceptions"], deleted["recurring_schedules"]), ([exception_id], [rule_id]))
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_large_syncs_are_paged(self):
+        performances = [WorkoutPerformance.objects.create(user=self.user1, workout=self.workout, performance_metric=float(i)) for i in range(5)]
+        #rows with the same updated_at are split between pages without being skipped.
+        WorkoutPerformance.objects.filter(pk__in=[p.pk for p in performances[:3]]).update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+
+        def sync(params):
+            pages = [self.client.get(self.sync_url, params).data]
+            while pages[-1]["cursor"]:
+                pages.append(self.client.get(self.sync_url, {"cursor": pages[-1]["cursor"]}).data)
+            self.assertEqual({(page["server_time"], page["full"]) for page in pages}, {(pages[0]["server_time"], pages[0]["full"])})
+            return pages
+
+        pages = sync({})
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(p["id"] for page in pages for p in page["workout_performances"]), [p.pk for p in performances])
+        self.assertEqual([w["id"] for page in pages for w in page["workouts"]], [self.workout.id])
+
+        deleted_ids = [p.pk for p in performances]
+        for performance in performances:
+            performance.delete()
+        pages = sync({"since": pages[0]["server_time"]})
+        self.assertEqual(sorted(i for page in pages for i in page["deleted"]["workout_performances"]), deleted_ids)
+        self.assertEqual(self.client.get(self.sync_url, {"cursor": "bm90IGEgY3Vyc29y"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_since(self):
+        response = self.client.get(self.sync_url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_with_client_id_is_idempotent(self):
+        """
+        Test that retrying a create with the same client_id returns the first object instead of a duplicate.
+        """
+        client_id = str(uuid.uuid4())
+        payload = {"client_id": client_id, "workout": self.workout.id, "performance_metric": 42.0}
+        url = reverse("workout_performance_list_create")
+        first = self.client.post(url, payload, format="json")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        retry = self.client.post(url, payload, format="json")
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data["id"], first.data["id"])
+
+        bulk = self.client.post(reverse("workout_performance_bulk_create"), [payload, payload], format="json")
+        self.assertEqual(bulk.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(bulk.data["created"], 0)
+        self.assertEqual([item["data"]["id"] for item in bulk.data["results"]], [first.data["id"]] * 2)
+        self.assertEqual(WorkoutPerformance.objects.filter(user=self.user1).count(), 1)
+
+    def test_deleting_user_leaves_no_tombstones(self):
+        WorkoutPerformance.objects.create(user=self.user1, workout=self.workout, performance_metric=5.0)
+        self.user1.delete()
+        self.assertFalse(SyncTombstone.objects.exists())
+
+
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.exercise = Exercise.objects.create(name="Squat", description="Legs", category="strength", muscle_group="legs")
+        self.workout = WorkoutPlan.objects.create(user=self.user1, title="Leg Day", description="Desc")
+        WorkoutExercise.objects.create(workout=self.workout, exercise=self.exercise, sets=5, reps=5, weight=100.0)
+        other = WorkoutPlan.objects.create(user=self.user2, title="Other", description="Desc")
+        for metric in (1.0, 2.0, 3.0):
+            WorkoutPerformance.objects.create(user=self.user1, workout=self.workout, performance_metric=metric)
+        WorkoutPerformance.objects.create(user=self.user2, workout=other, performance_metric=99.0)
+        self.export_url = reverse("export")
+        self.client.force_authenticate(user=self.user1)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_export_csv(self):
+        response = self.client.get(self.export_url, {"resource": "workout_exercises"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], "id,workout_id,exercise_id,exercise_name,sets,reps,weight")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Squat,5,5,100.0", lines[1])
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.export_url, {"resource": "workout_performances", "fmt": "ndjson"})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([record["performance_metric"] for record in records], [1.0, 2.0, 3.0])
+
+    def test_export_invalid_resource(self):
+        response = self.client.get(self.export_url, {"resource": "users"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+
+class EndpointQueryCountTests(APITestCase):
+    """
+    Regression tests for the number of queries per endpoint. Each detail lookup
+    is a single query filtered by the owner, and no endpoint loads related rows one by one.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.other = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.exercise = Exercise.objects.create(name="Row", description="Back", category="strength", muscle_group="back")
+        for i in range(5):
+            workout = WorkoutPlan.objects.create(user=self.user, title=f"Plan {i}", description="Desc")
+            WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, sets=3, reps=10)
+            ScheduledWorkout.objects.create(user=self.user, workout=workout, scheduled_datetime=timezone.now())
+            WorkoutComment.objects.create(user=self.user, workout=workout, comment="Nice")
+            WorkoutPerformance.objects.create(user=self.user, workout=workout, performance_metric=float(i))
+        self.workout = workout
+        self.schedule = ScheduledWorkout.objects.filter(user=self.user).first()
+        self.comment = WorkoutComment.objects.filter(user=self.user).first()
+        self.performance = WorkoutPerformance.objects.filter(user=self.user).first()
+        self.client.force_authenticate(user=self.user)
+
+    def assertQueries(self, count, url, params=None):
+        with self.assertNumQueries(count):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_list_endpoints(self):
+        #lists start with the aggregate of their ETag (see workouts.conditional).
+        self.assertQueries(3, reverse("workout_list_create"))
+        self.assertQueries(2, reverse("scheduled_workout_list_create"))
+        self.assertQueries(2, reverse("scheduled_workout_sorted"), {"order": "desc"})
+        self.assertQueries(2, reverse("workout_comment_list_create"))
+        self.assertQueries(2, reverse("workout_comment_list_create"), {"workout": self.workout.id})
+        self.assertQueries(2, reverse("workout_performance_list_create"))
+        self.assertQueries(2, reverse("workout_performance_list_create"), {"workout": self.workout.id})
+        self.assertQueries(1, reverse("workout_report"))
+
+    def test_unchanged_resources_are_not_modified(self):
+        for url, params in (
+            (reverse("workout_list_create"), {"page_size": 2}),
+            (reverse("scheduled_workout_sorted"), {"order": "desc"}),
+            (reverse("workout_performance_list_create"), {"workout": self.workout.id}),
+            (reverse("workout_detail", kwargs={"pk": self.workout.id}), {}),
+            (reverse("workout_comment_detail", kwargs={"pk": self.comment.id}), {}),
+        ):
+            etag = self.client.get(url, params)["ETag"]
+            #the ETag (or the object) only: nothing is serialized.
+            with self.assertNumQueries(1):
+                response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual((response["ETag"], response.content), (etag, b""))
+            #other parameters, other ETag.
+            self.assertEqual(self.client.get(url, dict(params, x=1), HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_changes_invalidate_etags(self):
+        list_url, detail_url = reverse("workout_performance_list_create"), reverse("workout_detail", kwargs={"pk": self.workout.id})
+        list_etag = self.client.get(list_url)["ETag"]
+        detail = self.client.get(detail_url)
+        self.assertIn("Last-Modified", detail)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_MODIFIED_SINCE=detail["Last-Modified"]).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        #deleting a row that is not the latest leaves max(updated_at) alone, but not the count.
+        self.performance.delete()
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual((response.status_code, len(response.data)), (status.HTTP_200_OK, 4))
+        self.assertNotEqual(response["ETag"], list_etag)
+
+        #exercise entries written on their own touch their plan.
+        WorkoutExercise.objects.create(workout=self.workout, exercise=self.exercise, sets=1, reps=1)
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail["ETag"])
+        self.assertEqual((response.status_code, len(response.data["exercises"])), (status.HTTP_200_OK, 2))
+        self.assertEqual(self.client.get(reverse("workout_detail", kwargs={"pk": 0}), HTTP_IF_NONE_MATCH=detail["ETag"]).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_exercises_touches_their_plans(self):
+        detail_url = reverse("workout_detail", kwargs={"pk": self.workout.id})
+        etag = self.client.get(detail_url)["ETag"]
+        version = caching.data_version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercise.objects.filter(pk=self.exercise.pk).delete()
+        self.assertGreater(caching.data_version(self.user.id), version)
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data["exercises"]), (status.HTTP_200_OK, []))
+
+    def test_detail_endpoints(self):
+        self.assertQueries(2, reverse("workout_detail", kwargs={"pk": self.workout.id}))
+        self.assertQueries(1, reverse("scheduled_workout_detail", kwargs={"pk": self.schedule.id}))
+        self.assertQueries(1, reverse("workout_comment_detail", kwargs={"pk": self.comment.id}))
+        self.assertQueries(1, reverse("workout_performance_detail", kwargs={"pk": self.performance.id}))
+
+    def test_detail_of_another_user_is_one_query(self):
+        self.client.force_authenticate(user=self.other)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("workout_comment_detail", kwargs={"pk": self.comment.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_checks_ownership_without_loading_the_owner(self):
+        payload = {"workout": self.workout.id, "comment": "Great session"}
+        #workout lookup by the serializer, then the insert.
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse("workout_comment_list_create"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["user"], "user1")
+
+    def test_delete_comment(self):
+        response = self.client.delete(reverse("workout_comment_detail", kwargs={"pk": self.comment.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+
+
+class BenchmarkSuiteTests(APITestCase):
+    """
+    Smoke test of the benchmark_api suite on a tiny data set.
+    """
+    def test_every_route_has_a_case(self):
+        self.assertEqual(benchmark.uncovered_routes(), [])
+
+    def test_run_reports_every_case_without_regressions(self):
+        fixture = benchmark.seed(users=2, plans_per_user=25, performances_per_plan=2, exercises=5)
+        results = benchmark.run(fixture, iterations=1)
+        self.assertEqual(set(results), {case.label for case in benchmark.ROUTE_CASES})
+        self.assertEqual(benchmark.compare(results), [])
+        baseline = {label: dict(result, queries=result['queries'] - 1) for label, result in results.items()}
+        self.assertEqual(len(benchmark.compare(results, baseline)), len(results))
+        self.assertEqual(results["GET async_workout_list"]["page_queries"], results["GET async_workout_list"]["queries"])
+        self.assertEqual(benchmark.compare({"GET list": dict(results["GET async_workout_list"], page_queries=0)}),
+                         [f"GET list: {results['GET async_workout_list']['queries']} queries for a full page but 0 for a page of one"])
+        #cold cases compute the report on every request, the warm one is served from the cache.
+        self.assertGreater(results["GET workout_report?report_type=progress"]["queries"], 0)
+        self.assertEqual(results["GET workout_report?report_type=progress (cached)"]["queries"], 0)
+
+
+
+@modify_settings(MIDDLEWARE={"prepend": "workout_tracker.profiling.QueryProfilingMiddleware"})
+class QueryProfilingMiddlewareTests(APITestCase):
+    """
+    Test the opt-in query profiling middleware.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        WorkoutPlan.objects.create(user=self.user, title="Plan", description="Desc")
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("workout_list_create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 5"),
+        )
+
+    @override_settings(SLOW_REQUEST_MS=-1)
+    def test_slow_request_is_logged_with_fingerprints(self):
+        with self.assertLogs("workout_tracker.profiling", level="WARNING") as logs:
+            self.client.get(reverse("workout_list_create"))
+        self.assertIn("Slow request GET /api/workouts/", logs.output[0])
+        self.assertIn('FROM "workouts_workoutplan"', logs.output[0])
+
+
+
+@modify_settings(MIDDLEWARE={"prepend": "workout_tracker.metrics.MetricsMiddleware"})
+class MetricsTests(APITestCase):
+    """
+    Test the request, JWT and report metrics exposed at /metrics.
+    The URL is only registered with METRICS_ENABLED, so the view is called directly.
+    """
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        WorkoutPlan.objects.create(user=self.user, title="Plan", description="Desc")
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_requests_are_counted_per_route(self):
+        self.client.get(reverse("workout_list_create"))
+        self.client.get(reverse("workout_detail", kwargs={"pk": 999999}))
+        self.assertEqual(metrics.HTTP_REQUESTS.value(route="workout_list_create", method="GET", status=200), 1)
+        self.assertEqual(metrics.HTTP_REQUESTS.value(route="workout_detail", method="GET", status=404), 1)
+        self.assertEqual(metrics.HTTP_REQUEST_QUERIES.count(route="workout_list_create", method="GET"), 1)
+        self.assertEqual(metrics.JWT_AUTHENTICATIONS.value(outcome="success"), 2)
+
+    def test_report_queries_are_timed(self):
+        self.client.get(reverse("workout_report"), {"report_type": "progress"})
+        self.assertEqual(metrics.REPORT_QUERY_SECONDS.count(report_type="progress"), 1)
+
+    def scrape(self, authorization=None):
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        return metrics.metrics_view(RequestFactory().get("/metrics", **headers))
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_endpoint_uses_prometheus_text_format(self):
+        self.client.get(reverse("workout_list_create"))
+        response = self.scrape("Bearer scrape-secret")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE http_requests_total counter", body)
+        self.assertIn('http_requests_total{route="workout_list_create",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="workout_list_create",method="GET",le="+Inf"} 1', body)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_metrics_token_is_required(self):
+        self.assertEqual(self.scrape().status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.scrape("Bearer wrong").status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.scrape("Bearer scrape-secret").status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_are_not_served_without_a_token(self):
+        self.assertEqual(self.scrape().status_code, status.HTTP_403_FORBIDDEN)
+
+
+
+@modify_settings(MIDDLEWARE={"prepend": "workout_tracker.metrics.MetricsMiddleware"})
+class AsyncReadEndpointTests(APITestCase):
+    """
+    Test that the async read endpoints return the same data as their sync versions.
+    """
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        exercise = Exercise.objects.create(name="Squat", description="Legs", category="strength", muscle_group="legs")
+        for owner in (self.user, self.user2):
+            for i in range(3):
+                workout = WorkoutPlan.objects.create(user=owner, title=f"Plan {i}", description="Desc")
+                WorkoutExercise.objects.create(workout=workout, exercise=exercise, sets=3, reps=10)
+                ScheduledWorkout.objects.create(user=owner, workout=workout, scheduled_datetime=timezone.now() + datetime.timedelta(days=i))
+                WorkoutPerformance.objects.create(user=owner, workout=workout, performance_metric=float(i))
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def stream(self, response):
+        return json.loads(b"".join(async_to_sync(self.collect)(response)))
+
+    async def collect(self, response):
+        return [chunk async for chunk in response.streaming_content]
+
+    def test_workout_list_matches_sync_endpoint(self):
+        params = {"page_size": 2}
+        expected = self.client.get(reverse("workout_list_create"), params).json()
+        response = self.client.get(reverse("async_workout_list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], expected["results"])
+        next_page = self.client.get(response.json()["next"])
+        self.assertEqual(len(next_page.json()["results"]), 1)
+
+    def test_scheduled_workout_list_matches_sync_endpoints(self):
+        response = self.client.get(reverse("async_scheduled_workout_list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stream(response), self.client.get(reverse("scheduled_workout_list_create")).json())
+        response = self.client.get(reverse("async_scheduled_workout_list"), {"order": "desc"})
+        expected = self.client.get(reverse("scheduled_workout_sorted"), {"order": "desc"}).json()
+        self.assertEqual(self.stream(response), expected)
+
+    def test_report_matches_sync_endpoint(self):
+        for report_type in ("frequency", "progress"):
+            expected = self.client.get(reverse("workout_report"), {"report_type": report_type}).json()
+            response = self.client.get(reverse("async_workout_report"), {"report_type": report_type})
+            self.assertEqual(response.json(), expected)
+        response = self.client.get(reverse("async_workout_report"), {"report_type": "unknown"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_throttle_applies(self):
+        from rest_framework.throttling import UserRateThrottle
+        cache.clear()
+        self.addCleanup(cache.clear)
+        with mock.patch.object(UserRateThrottle, "THROTTLE_RATES", {"user": "3/day"}):
+            #the sync and async views share the user's rate.
+            self.assertEqual(self.client.get(reverse("workout_list_create")).status_code, status.HTTP_200_OK)
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse("async_workout_list")).status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse("async_workout_list"))
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn("Retry-After", response)
+
+    def test_requires_valid_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse("async_workout_list")).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(self.client.get(reverse("async_workout_report")).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_runs_under_async_client(self):
+        response = await self.async_client.get(reverse("async_workout_list"), headers={"Authorization": self.auth})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 3)
+        #queries of the async ORM are seen by the async path of MetricsMiddleware.
+        #the user (first request, not cached yet), the plans and their exercises.
+        _, queries = metrics.HTTP_REQUEST_QUERIES.collect()[("async_workout_list", "GET")]
+        self.assertEqual(queries, 3)
+
+
+
+class ScheduledWorkoutCalendarTests(APITestCase):
+    """
+    Test the calendar range endpoint for scheduled workouts.
+    """
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user1, title="Plan", description="Desc")
+        other = WorkoutPlan.objects.create(user=self.user2, title="Other", description="Desc")
+        utc = datetime.timezone.utc
+        for moment in (
+            datetime.datetime(2026, 1, 5, 9, 0, tzinfo=utc),
+            datetime.datetime(2026, 1, 31, 23, 30, tzinfo=utc),  #already February 1st in Berlin
+            datetime.datetime(2026, 2, 10, 9, 0, tzinfo=utc),
+            datetime.datetime(2026, 6, 1, 9, 0, tzinfo=utc),  #outside the window
+        ):
+            ScheduledWorkout.objects.create(user=self.user1, workout=self.workout, scheduled_datetime=moment)
+        ScheduledWorkout.objects.create(user=self.user2, workout=other, scheduled_datetime=datetime.datetime(2026, 1, 6, tzinfo=utc))
+        self.client.force_authenticate(user=self.user1)
+        self.url = reverse("scheduled_workout_calendar")
+
+    def periods(self, response):
+        return [(bucket["period"], bucket["count"]) for bucket in response.data["buckets"]]
+
+    def test_month_buckets(self):
+        response = self.client.get(self.url, {"start": "2026-01-01", "end": "2026-03-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.periods(response), [("2026-01-01", 2), ("2026-02-01", 1)])
+        self.assertEqual(len(response.data["buckets"][0]["scheduled_workouts"]), 2)
+
+    def test_buckets_use_requested_time_zone(self):
+        response = self.client.get(self.url, {"start": "2026-01-01", "end": "2026-03-01", "tz": "Europe/Berlin"})
+        self.assertEqual(self.periods(response), [("2026-01-01", 1), ("2026-02-01", 2)])
+
+    def test_week_buckets(self):
+        response = self.client.get(self.url, {"start": "2026-01-01", "end": "2026-02-15", "bucket": "week"})
+        self.assertEqual(self.periods(response), [("2026-01-05", 1), ("2026-01-26", 1), ("2026-02-09", 1)])
+
+    def test_datetime_bounds_end_is_exclusive(self):
+        response = self.client.get(self.url, {"start": "2026-01-05T09:00:00Z", "end": "2026-02-10T09:00:00Z", "bucket": "day"})
+        self.assertEqual(self.periods(response), [("2026-01-05", 1), ("2026-01-31", 1)])
+
+    def test_invalid_parameters(self):
+        for params in (
+            {"start": "2026-01-01"},
+            {"start": "2026-02-01", "end": "2026-01-01"},
+            {"start": "2026-01-01", "end": "2028-01-01"},
+            {"start": "2026-01-01", "end": "2026-02-01", "tz": "Mars/Olympus"},
+            {"start": "2026-01-01", "end": "2026-02-01", "tz": "America"},
+            {"start": "2026-01-01", "end": "2026-02-01", "tz": "Europe/" + "x" * 300},
+            {"start": "2026-01-01", "end": "2026-02-01", "bucket": "year"},
+            {"start": "yesterday", "end": "2026-02-01"},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+
+class RecurringScheduleTests(APITestCase):
+    """
+    Test recurring schedules: rule expansion, exceptions and the calendar merge.
+    """
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.user2 = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user1, title="Plan", description="Desc")
+        self.other_workout = WorkoutPlan.objects.create(user=self.user2, title="Other", description="Desc")
+        self.client.force_authenticate(user=self.user1)
+        self.utc = datetime.timezone.utc
+
+    def rule(self, **fields):
+        fields.setdefault("start", datetime.datetime(2026, 3, 2, 7, 0, tzinfo=self.utc))  #a Monday
+        return RecurringSchedule.objects.create(user=self.user1, workout=self.workout, **fields)
+
+    def test_weekly_on_weekdays_with_count(self):
+        rule = self.rule(frequency="WEEKLY", weekdays="MO,WE,FR", count=5)
+        days = [moment.day for moment in recurrence.occurrences(rule)]
+        self.assertEqual(days, [2, 4, 6, 9, 11])
+        self.assertEqual(recurrence.to_rrule(rule), "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=5")
+
+    def test_window_skips_to_the_requested_period(self):
+        rule = self.rule(frequency="DAILY", interval=2)
+        start = datetime.datetime(2027, 3, 1, tzinfo=self.utc)
+        window = list(recurrence.occurrences(rule, start, start + datetime.timedelta(days=6)))
+        self.assertEqual([moment.day for moment in window], [1, 3, 5])  #364 days after the start
+
+    def test_windows_of_count_rules_skip_ahead(self):
+        for fields in (
+            {"frequency": "DAILY", "interval": 3, "count": 400},
+            {"frequency": "WEEKLY", "weekdays": "MO,WE,SU", "count": 300,
+             "start": datetime.datetime(2026, 3, 4, 7, 0, tzinfo=self.utc)},  #a Wednesday: no Monday in the first week
+            {"frequency": "MONTHLY", "start": datetime.datetime(2026, 1, 31, 7, 0, tzinfo=self.utc), "count": 40},
+        ):
+            rule = self.rule(**fields)
+            everything = list(recurrence.occurrences(rule))
+            self.assertEqual(len(everything), fields["count"])
+            for start in (everything[0], everything[21], everything[-1], everything[-1] + datetime.timedelta(days=1)):
+                end = start + datetime.timedelta(days=200)
+                self.assertEqual(list(recurrence.occurrences(rule, start, end)),
+                                 [moment for moment in everything if start <= moment < end], fields)
+        rule = self.rule(frequency="DAILY", count=recurrence.MAX_COUNT)
+        self.assertFalse(recurrence.is_occurrence(rule, datetime.datetime(2226, 3, 2, 7, 0, tzinfo=self.utc)))
+
+    def test_until_and_short_months(self):
+        rule = self.rule(frequency="MONTHLY", start=datetime.datetime(2026, 1, 31, 7, 0, tzinfo=self.utc),
+                         until=datetime.datetime(2026, 8, 1, tzinfo=self.utc))
+        months = [moment.month for moment in recurrence.occurrences(rule)]
+        self.assertEqual(months, [1, 3, 5, 7])
+
+    def test_wall_clock_time_is_kept_across_daylight_saving(self):
+        rule = self.rule(frequency="WEEKLY", timezone="Europe/Berlin",
+                         start=datetime.datetime(2026, 3, 23, 6, 0, tzinfo=self.utc))  #07:00 in Berlin
+        moments = list(recurrence.occurrences(rule, end=datetime.datetime(2026, 4, 1, tzinfo=self.utc)))
+        self.assertEqual([moment.hour for moment in moments], [6, 5])  #summer time starts on March 29th
+
+    def test_create_and_list_occurrences(self):
+        response = self.client.post(reverse("recurring_schedule_list_create"), {
+            "workout": self.workout.id, "start": "2026-03-02T07:00:00Z", "frequency": "WEEKLY",
+            "weekdays": ["FR", "MO"], "count": 4,
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["weekdays"], ["MO", "FR"])
+        self.assertEqual(response.data["rrule"], "FREQ=WEEKLY;BYDAY=MO,FR;COUNT=4")
+        self.assertEqual(ScheduledWorkout.objects.count(), 0)
+
+        url = reverse("recurring_schedule_occurrences", kwargs={"pk": response.data["id"]})
+        response = self.client.get(url, {"start": "2026-03-01", "end": "2026-04-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["scheduled_datetime"][:10] for item in response.data],
+                         ["2026-03-02", "2026-03-06", "2026-03-09", "2026-03-13"])
+
+    def test_create_validation(self):
+        url = reverse("recurring_schedule_list_create")
+        base = {"workout": self.workout.id, "start": "2026-03-02T07:00:00Z", "frequency": "WEEKLY"}
+        for extra in (
+            {"frequency": "DAILY", "weekdays": ["MO"]},
+            {"count": 3, "until": "2026-05-01T00:00:00Z"},
+            {"timezone": "Mars/Olympus"},
+            {"timezone": "America"},
+            {"interval": 0},
+            {"count": recurrence.MAX_COUNT + 1},
+            {"weekdays": ["XX"]},
+        ):
+            response = self.client.post(url, dict(base, **extra), format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, extra)
+        response = self.client.post(url, dict(base, workout=self.other_workout.id), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_editing_a_rule_drops_exceptions_it_no_longer_has(self):
+        rule = self.rule(frequency="WEEKLY", weekdays="MO,WE")
+        RecurrenceException.objects.create(recurring_schedule=rule, original_datetime=datetime.datetime(2026, 3, 2, 7, 0, tzinfo=self.utc), is_cancelled=True)
+        moved = RecurrenceException.objects.create(
+            recurring_schedule=rule, original_datetime=datetime.datetime(2026, 3, 4, 7, 0, tzinfo=self.utc),
+            scheduled_datetime=datetime.datetime(2026, 3, 5, 18, 0, tzinfo=self.utc),
+        )
+        #a full update to a daily rule omits weekdays, which are cleared; the rule now starts on Wednesday at 08:00.
+        response = self.client.put(reverse("recurring_schedule_detail", kwargs={"pk": rule.id}), {
+            "workout": self.workout.id, "start": "2026-03-04T08:00:00Z", "frequency": "DAILY",
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["weekdays"], [])
+        self.assertFalse(RecurrenceException.objects.filter(recurring_schedule=rule).exists())
+        response = self.client.get(reverse("recurring_schedule_occurrences", kwargs={"pk": rule.id}), {"start": "2026-03-01", "end": "2026-03-07"})
+        self.assertEqual([item["scheduled_datetime"] for item in response.data],
+                         ["2026-03-04T08:00:00Z", "2026-03-05T08:00:00Z", "2026-03-06T08:00:00Z"])
+        self.assertTrue(SyncTombstone.objects.filter(model="recurrence_exceptions", object_id=moved.id).exists())
+
+    def test_cancel_and_move_occurrences(self):
+        rule = self.rule(frequency="DAILY", count=5)
+        url = reverse("recurrence_exception_list_create", kwargs={"pk": rule.id})
+        response = self.client.post(url, {"original_datetime": "2026-03-03T07:00:00Z", "is_cancelled": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {"original_datetime": "2026-03-04T07:00:00Z", "scheduled_datetime": "2026-03-20T18:00:00Z"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        moved = response.data["id"]
+        for data in (
+            {"original_datetime": "2026-03-03T08:00:00Z", "is_cancelled": True},  #not an occurrence
+            {"original_datetime": "2026-03-05T07:00:00Z"},  #neither cancelled nor moved
+        ):
+            response = self.client.post(url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+
+        occurrences_url = reverse("recurring_schedule_occurrences", kwargs={"pk": rule.id})
+        response = self.client.get(occurrences_url, {"start": "2026-03-01", "end": "2026-04-01"})
+        self.assertEqual([item["scheduled_datetime"][:10] for item in response.data],
+                         ["2026-03-02", "2026-03-05", "2026-03-06", "2026-03-20"])
+        self.assertEqual(response.data[-1]["original_datetime"], "2026-03-04T07:00:00Z")
+
+        response = self.client.delete(reverse("recurrence_exception_detail", kwargs={"pk": rule.id, "exception_pk": moved}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(RecurrenceException.objects.count(), 1)
+
+    def test_calendar_merges_occurrences(self):
+        rule = self.rule(frequency="WEEKLY", weekdays="MO,TH", until=datetime.datetime(2026, 3, 13, tzinfo=self.utc))
+        RecurrenceException.objects.create(recurring_schedule=rule, original_datetime=datetime.datetime(2026, 3, 9, 7, 0, tzinfo=self.utc), is_cancelled=True)
+        ScheduledWorkout.objects.create(user=self.user1, workout=self.workout, scheduled_datetime=datetime.datetime(2026, 3, 3, 9, 0, tzinfo=self.utc))
+        RecurringSchedule.objects.create(user=self.user2, workout=self.other_workout, frequency="DAILY",
+                                         start=datetime.datetime(2026, 3, 1, tzinfo=self.utc))
+
+        response = self.client.get(reverse("scheduled_workout_calendar"), {"start": "2026-03-01", "end": "2026-04-01", "bucket": "week"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        buckets = response.data["buckets"]
+        self.assertEqual([(bucket["period"], bucket["count"]) for bucket in buckets], [("2026-03-02", 3), ("2026-03-09", 1)])
+        self.assertEqual(len(buckets[0]["scheduled_workouts"]), 1)
+        self.assertEqual([item["scheduled_datetime"][:10] for item in buckets[0]["occurrences"]], ["2026-03-02", "2026-03-05"])
+        self.assertEqual(buckets[0]["occurrences"][0]["recurring_schedule"], rule.id)
+
+    def test_other_users_rules_are_hidden(self):
+        rule = RecurringSchedule.objects.create(user=self.user2, workout=self.other_workout, frequency="DAILY",
+                                                start=datetime.datetime(2026, 3, 1, tzinfo=self.utc))
+        for url in (
+            reverse("recurring_schedule_detail", kwargs={"pk": rule.id}),
+            reverse("recurring_schedule_occurrences", kwargs={"pk": rule.id}),
+            reverse("recurrence_exception_list_create", kwargs={"pk": rule.id}),
+        ):
+            self.assertEqual(self.client.get(url, {"start": "2026-03-01", "end": "2026-04-01"}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse("recurring_schedule_list_create")).data, [])
+
+
+
+
+class ReminderDispatcherTests(APITestCase):
+    """
+    Test the reminder dispatcher for upcoming scheduled workouts.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user, title="Plan", description="Desc")
+        self.now = timezone.now()
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def schedule(self, minutes, **fields):
+        return ScheduledWorkout.objects.create(
+            user=self.user, workout=self.workout, scheduled_datetime=self.now + datetime.timedelta(minutes=minutes), **fields
+        )
+
+    def dispatcher(self, **options):
+        options.setdefault("backend", reminders.FileReminderBackend(self.path))
+        return reminders.Dispatcher(lead=datetime.timedelta(hours=1), poll_interval=datetime.timedelta(minutes=5), **options)
+
+    def delivered(self):
+        with open(self.path, encoding="utf-8") as handle:
+            return [json.loads(line)["scheduled_workout"] for line in handle]
+
+    def test_sends_only_due_reminders_once(self):
+        due = self.schedule(30)
+        self.schedule(180)  #not due yet
+        self.schedule(-10)  #already started
+        self.schedule(20, reminder_sent_at=self.now)
+        dispatcher = self.dispatcher()
+        self.assertEqual(dispatcher.dispatch_due(self.now), 1)
+        self.assertEqual(self.delivered(), [due.id])
+        due.refresh_from_db()
+        self.assertEqual(due.reminder_sent_at, self.now)
+        self.assertEqual(dispatcher.dispatch_due(self.now), 0)
+
+    def test_claims_in_batches(self):
+        schedules = [self.schedule(minutes) for minutes in range(10, 15)]
+        with CaptureQueriesContext(connection) as queries:
+            sent = self.dispatcher(batch_size=2).dispatch_due(self.now)
+        self.assertEqual(sent, 5)
+        self.assertEqual(self.delivered(), [schedule.id for schedule in schedules])
+        #batches of 2, 2 and 1, each a select and an update; the short last batch ends the loop.
+        self.assertEqual(len([query for query in queries.captured_queries if not query["sql"].startswith(("SAVEPOINT", "RELEASE"))]), 6)
+
+    def test_failed_delivery_is_retried(self):
+        schedule = self.schedule(30)
+
+        class BrokenBackend(reminders.BaseReminderBackend):
+            def send(self, schedules):
+                raise ConnectionError("mail server down")
+
+        with self.assertLogs("workouts.reminders", level="ERROR"):
+            self.dispatcher(backend=BrokenBackend(), sleep=lambda seconds: None, clock=lambda: self.now).run(max_cycles=1)
+        schedule.refresh_from_db()
+        self.assertIsNone(schedule.reminder_sent_at)
+        self.assertEqual(self.dispatcher().dispatch_due(self.now), 1)
+
+    def test_worker_sleeps_until_the_next_reminder_is_due(self):
+        later = self.schedule(62)
+        clock, slept = [self.now], []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            clock[0] += datetime.timedelta(seconds=seconds)
+
+        sent = self.dispatcher(clock=lambda: clock[0], sleep=sleep).run(max_cycles=2)
+        self.assertEqual(sent, 1)
+        self.assertEqual(slept, [120.0])  #woken when the workout is an hour away, not at the next poll
+        self.assertEqual(self.delivered(), [later.id])
+
+    def test_rescheduling_resets_the_reminder(self):
+        schedule = self.schedule(30, reminder_sent_at=self.now)
+        self.client.force_authenticate(user=self.user)
+        url = reverse("scheduled_workout_detail", kwargs={"pk": schedule.id})
+        response = self.client.put(url, {"workout": self.workout.id, "scheduled_datetime": schedule.scheduled_datetime.isoformat()}, format="json")
+        self.assertIsNotNone(response.data["reminder_sent_at"])
+        moved = (self.now + datetime.timedelta(minutes=45)).isoformat()
+        response = self.client.put(url, {"workout": self.workout.id, "scheduled_datetime": moved}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["reminder_sent_at"])
+
+    def test_command_once_with_console_backend(self):
+        self.schedule(30)
+        output = io.StringIO()
+        call_command("dispatch_reminders", "--once", "--backend", "workouts.reminders.ConsoleReminderBackend", stdout=output)
+        self.assertIn("[user1] Reminder: Plan starts at", output.getvalue())
+        self.assertIn("Sent 1 reminders.", output.getvalue())
+
+
+
+
+class TrainingAnalyticsTests(APITestCase):
+    """
+    Test volume and e1RM analytics and the personal records maintained on write.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.other = User.objects.create_user(username="user2", email="user2@example.com", password="pass123")
+        self.squat = Exercise.objects.create(name="Squat", description="", category="strength", muscle_group="legs")
+        self.pullup = Exercise.objects.create(name="Pull-up", description="", category="strength", muscle_group="back")
+        self.client.force_authenticate(user=self.user)
+
+    def create_plan(self, *entries):
+        response = self.client.post(reverse("workout_list_create"), {
+            "title": "Plan", "description": "",
+            "exercises": [{"exercise": exercise.id, "sets": sets, "reps": reps, "weight": weight} for exercise, sets, reps, weight in entries],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def records(self, exercise):
+        return {record.kind: round(record.value, 6) for record in PersonalRecord.objects.filter(user=self.user, exercise=exercise)}
+
+    def test_e1rm_formulas(self):
+        self.assertAlmostEqual(analytics.e1rm(100, 5), 116.667, places=3)
+        self.assertAlmostEqual(analytics.e1rm(100, 5, analytics.BRZYCKI), 112.5)
+        self.assertEqual(analytics.e1rm(100, 1, analytics.BRZYCKI), 100)
+        self.assertIsNone(analytics.e1rm(100, 37, analytics.BRZYCKI))
+        self.assertIsNone(analytics.e1rm(None, 5))
+
+    def test_exercise_summary(self):
+        self.create_plan((self.squat, 3, 5, 100.0), (self.pullup, 3, 10, None))
+        self.create_plan((self.squat, 5, 5, 90.0), (self.squat, 1, 1, 114.0))
+        WorkoutExercise.objects.create(workout=WorkoutPlan.objects.create(user=self.other, title="Other"), exercise=self.squat, sets=1, reps=1, weight=300.0)
+
+        response = self.client.get(reverse("exercise_analytics"), {"formula": "brzycki"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pullup, squat = response.data["exercises"]
+        self.assertEqual((pullup["total_sets"], pullup["total_reps"], pullup["volume"], pullup["best_e1rm"]), (3, 30, 0.0, None))
+        self.assertEqual((squat["workouts"], squat["total_sets"], squat["total_reps"]), (2, 9, 41))
+        self.assertEqual(squat["volume"], 3 * 5 * 100.0 + 5 * 5 * 90.0 + 114.0)
+        self.assertEqual(squat["max_weight"], 114.0)
+        self.assertAlmostEqual(squat["best_e1rm"], 114.0)  #Brzycki rates 5 x 100 at 112.5
+
+        response = self.client.get(reverse("exercise_analytics"))
+        self.assertAlmostEqual(response.data["exercises"][1]["best_e1rm"], analytics.e1rm(100.0, 5))  #Epley: 116.67
+        self.assertEqual(self.client.get(reverse("exercise_analytics"), {"formula": "lombardi"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_records_follow_creates_updates_and_deletes(self):
+        first = self.create_plan((self.squat, 3, 5, 100.0))
+        second = self.create_plan((self.squat, 3, 3, 110.0))
+        self.assertEqual(self.records(self.squat), {"weight": 110.0, "e1rm": 121.0, "volume": 1500.0})
+
+        #lowering the entry that holds the weight record hands it back to the first plan.
+        entry = second["exercises"][0]
+        response = self.client.put(reverse("workout_detail", kwargs={"pk": second["id"]}), {
+            "title": "Plan", "description": "", "exercises": [dict(entry, weight=95.0)],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = PersonalRecord.objects.get(user=self.user, exercise=self.squat, kind="weight")
+        self.assertEqual((record.value, record.workout_exercise_id), (100.0, first["exercises"][0]["id"]))
+
+        self.client.delete(reverse("workout_detail", kwargs={"pk": first["id"]}))
+        self.assertEqual(self.records(self.squat), {"weight": 95.0, "e1rm": 104.5, "volume": 855.0})
+        self.client.delete(reverse("workout_detail", kwargs={"pk": second["id"]}))
+        self.assertEqual(self.records(self.squat), {})
+
+    def test_records_follow_entries_written_outside_the_api(self):
+        plan = WorkoutPlan.objects.create(user=self.user, title="Plan")
+        light = WorkoutExercise.objects.create(workout=plan, exercise=self.squat, sets=3, reps=5, weight=100.0)
+        heavy = WorkoutExercise.objects.create(workout=plan, exercise=self.squat, sets=1, reps=1, weight=120.0)
+        self.assertEqual(self.records(self.squat)["weight"], 120.0)
+        heavy.weight = 90.0
+        heavy.save()
+        self.assertEqual(self.records(self.squat)["weight"], 100.0)
+        light.delete()
+        self.assertEqual(self.records(self.squat), {"weight": 90.0, "e1rm": 90.0, "volume": 90.0})
+        self.assertFalse(PersonalRecord.objects.filter(workout_exercise__isnull=True).exists())
+
+        #entries going with another exercise leave this one's records pointing at live entries.
+        WorkoutExercise.objects.create(workout=plan, exercise=self.pullup, sets=1, reps=1, weight=20.0)
+        Exercise.objects.filter(pk=self.pullup.pk).delete()
+        self.assertEqual(self.records(self.squat)["weight"], 90.0)
+        self.assertEqual(set(PersonalRecord.objects.values_list("exercise_id", flat=True)), {self.squat.id})
+
+    def test_incremental_records_match_a_rebuild(self):
+        self.create_plan((self.squat, 3, 5, 100.0), (self.pullup, 4, 8, 10.0))
+        plan = self.create_plan((self.squat, 5, 5, 90.0), (self.squat, 1, 2, 115.0))
+        self.client.put(reverse("workout_detail", kwargs={"pk": plan["id"]}), {
+            "title": "Plan", "description": "",
+            "exercises": [dict(plan["exercises"][0], exercise=self.pullup.id), {"exercise": self.squat.id, "sets": 2, "reps": 2, "weight": 105.0}],
+        }, format="json")
+        maintained = sorted(PersonalRecord.objects.values_list("exercise_id", "kind", "value", "workout_exercise_id"))
+        records.rebuild_records(self.user.id, [self.squat.id, self.pullup.id])
+        self.assertEqual(sorted(PersonalRecord.objects.values_list("exercise_id", "kind", "value", "workout_exercise_id")), maintained)
+
+    def test_record_list_and_history(self):
+        self.create_plan((self.squat, 3, 5, 100.0))
+        self.create_plan((self.squat, 3, 5, 90.0))
+        third = self.create_plan((self.squat, 1, 1, 125.0))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("personal_record_list"), {"exercise": self.squat.id})
+        self.assertEqual([(item["kind"], item["value"]) for item in response.data], [("e1rm", 125.0), ("volume", 1500.0), ("weight", 125.0)])
+        self.assertEqual(response.data[0]["exercise_name"], "Squat")
+
+        response = self.client.get(reverse("personal_record_history", kwargs={"exercise_id": self.squat.id}))
+        self.assertEqual([item["value"] for item in response.data["history"]["weight"]], [100.0, 125.0])
+        self.assertEqual(response.data["history"]["weight"][-1]["workout"], third["id"])
+        self.assertEqual([item["value"] for item in response.data["history"]["volume"]], [1500.0])
+
+
+
+
+class PerformanceChartTests(APITestCase):
+    """
+    Test the downsampling functions and the performance chart endpoint.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user, title="Plan", description="Desc")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("performance_chart")
+
+    def log(self, values, start=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc), step=datetime.timedelta(hours=12)):
+        performances = WorkoutPerformance.objects.bulk_create(
+            [WorkoutPerformance(user=self.user, workout=self.workout, performance_metric=value) for value in values]
+        )
+        for i, performance in enumerate(performances):
+            performance.performed_at = start + i * step
+        WorkoutPerformance.objects.bulk_update(performances, ["performed_at"])
+
+    def test_lttb_keeps_ends_and_spikes(self):
+        points = [(x, 0.0) for x in range(1000)]
+        points[500] = (500, 100.0)
+        sampled = downsampling.lttb(points, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertIn((500, 100.0), sampled)
+        self.assertEqual(sampled, sorted(sampled))
+        self.assertEqual(downsampling.lttb(points[:10], 20), points[:10])
+
+    def test_minmax_keeps_every_extreme(self):
+        points = [(x, float(x % 7)) for x in range(700)]
+        points[333] = (333, -5.0)
+        sampled = downsampling.minmax(points, 50)
+        self.assertLessEqual(len(sampled), 50)
+        self.assertIn((333, -5.0), sampled)
+        self.assertEqual(max(y for _, y in sampled), 6.0)
+        self.assertEqual(sampled, sorted(sampled))
+
+    def test_chart_is_bounded_by_points(self):
+        self.log([float(i % 10) for i in range(300)] + [None])
+        response = self.client.get(self.url, {"points": 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_points"], 300)
+        self.assertEqual(len(response.data["points"]), 50)
+        self.assertEqual(response.data["points"][0], ["2026-01-01T00:00:00+00:00", 0.0])
+
+        response = self.client.get(self.url, {"points": 50, "algorithm": "minmax", "start": "2026-01-01", "end": "2026-01-11"})
+        self.assertEqual(response.data["total_points"], 20)
+        self.assertEqual(len(response.data["points"]), 20)
+
+    def test_periods_are_averaged_by_the_database(self):
+        self.log([1.0, 3.0, 5.0, 7.0], step=datetime.timedelta(days=4))
+        response = self.client.get(self.url, {"granularity": "week"})
+        self.assertEqual(response.data["points"], [
+            ["2025-12-29T00:00:00+00:00", 1.0], ["2026-01-05T00:00:00+00:00", 4.0], ["2026-01-12T00:00:00+00:00", 7.0],
+        ])
+
+    def test_invalid_parameters(self):
+        for params in ({"points": 2}, {"points": "many"}, {"algorithm": "random"}, {"granularity": "hour"}, {"workout": "x"}, {"tz": "Mars/Olympus"},
+                       {"tz": "Europe"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+
+
+class QueryPlanIndexTests(APITestCase):
+    """
+    Check that the list queries are answered from the composite indexes declared in workouts/models.py.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", email="user1@example.com", password="pass123")
+        self.workout = WorkoutPlan.objects.create(user=self.user, title="Plan", description="Desc")
+
+    def reset_seqscan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are cheaper to scan, so make the planner show whether the index is usable.
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+            #the setting belongs to the connection, which later tests share.
+            self.addCleanup(self.reset_seqscan)
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f"EXPLAIN output is not checked on {connection.vendor}")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_workout_list_uses_index(self):
+        queryset = WorkoutPlan.objects.filter(user=self.user).order_by('-created_at', '-id')
+        self.assertUsesIndex(queryset, 'workoutplan_user_created_idx')
+
+    def test_schedule_list_uses_index(self):
+        queryset = ScheduledWorkout.objects.filter(user=self.user).order_by('scheduled_datetime')
+        self.assertUsesIndex(queryset, 'schedule_user_datetime_idx')
+
+    def test_performance_list_uses_index(self):
+        queryset = WorkoutPerformance.objects.filter(user=self.user, workout_id=self.workout.id).order_by('performed_at')
+        self.assertUsesIndex(queryset, 'performance_user_workout_idx')
+
+    def test_comment_list_uses_index(self):
+        queryset = WorkoutComment.objects.filter(user=self.user, workout_id=self.workout.id).order_by('created_at')
+        self.assertUsesIndex(queryset, 'comment_user_workout_idx')
+
+    def test_calendar_range_uses_index(self):
+        start = timezone.now()
+        queryset = ScheduledWorkout.objects.filter(
+            user=self.user, scheduled_datetime__gte=start, scheduled_datetime__lt=start + datetime.timedelta(days=31)
+        ).order_by('scheduled_datetime', 'id')
+        self.assertUsesIndex(queryset, 'schedule_user_datetime_idx')
+
+    def test_reminder_due_scan_uses_partial_index(self):
+        start = timezone.now()
+        queryset = ScheduledWorkout.objects.filter(
+            reminder_sent_at__isnull=True, scheduled_datetime__gt=start, scheduled_datetime__lte=start + datetime.timedelta(hours=1)
+        ).order_by('scheduled_datetime')
+        self.assertUsesIndex(queryset, 'schedule_reminder_due_idx')
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('workouts/', views.WorkoutPlanListCreateAPIView.as_view(), name='workout_list_create'),
@@ -8,12 +8,33 @@ urlpatterns = [
     path('scheduled_workouts/<int:pk>/', views.ScheduledWorkoutDetailAPIView.as_view(), name='scheduled_workout_detail'),
 
     path('scheduled_workouts/sorted/', views.ScheduledWorkoutListSortedAPIView.as_view(), name='scheduled_workout_sorted'),
+    path('scheduled_workouts/calendar/', views.ScheduledWorkoutCalendarAPIView.as_view(), name='scheduled_workout_calendar'),
+
+    path('recurring_schedules/', views.RecurringScheduleListCreateAPIView.as_view(), name='recurring_schedule_list_create'),
+    path('recurring_schedules/<int:pk>/', views.RecurringScheduleDetailAPIView.as_view(), name='recurring_schedule_detail'),
+    path('recurring_schedules/<int:pk>/occurrences/', views.RecurringScheduleOccurrencesAPIView.as_view(), name='recurring_schedule_occurrences'),
+    path('recurring_schedules/<int:pk>/exceptions/', views.RecurrenceExceptionListCreateAPIView.as_view(), name='recurrence_exception_list_create'),
+    path('recurring_schedules/<int:pk>/exceptions/<int:exception_pk>/', views.RecurrenceExceptionDetailAPIView.as_view(), name='recurrence_exception_detail'),
 
     path('workout_comments/', views.WorkoutCommentListCreateAPIView.as_view(), name='workout_comment_list_create'),
     path('workout_comments/<int:pk>/', views.WorkoutCommentDetailAPIView.as_view(), name='workout_comment_detail'),
 
     path('workout_performances/', views.WorkoutPerformanceListCreateAPIView.as_view(), name='workout_performance_list_create'),
+    path('workout_performances/bulk/', views.WorkoutPerformanceBulkCreateAPIView.as_view(), name='workout_performance_bulk_create'),
     path('workout_performances/<int:pk>/', views.WorkoutPerformanceDetailAPIView.as_view(), name='workout_performance_detail'),
 
+    path('sync/', views.SyncAPIView.as_view(), name='sync'),
+    path('export/', views.ExportAPIView.as_view(), name='export'),
+
     path('reports/workouts/', views.WorkoutReportAPIView.as_view(), name='workout_report'),
+
+    path('analytics/exercises/', views.ExerciseAnalyticsAPIView.as_view(), name='exercise_analytics'),
+    path('analytics/records/', views.PersonalRecordListAPIView.as_view(), name='personal_record_list'),
+    path('analytics/records/<int:exercise_id>/history/', views.PersonalRecordHistoryAPIView.as_view(), name='personal_record_history'),
+    path('charts/performances/', views.PerformanceChartAPIView.as_view(), name='performance_chart'),
+
+    #async (ASGI) versions of the read endpoints above.
+    path('async/workouts/', async_views.workout_list, name='async_workout_list'),
+    path('async/scheduled_workouts/', async_views.scheduled_workout_list, name='async_scheduled_workout_list'),
+    path('async/reports/workouts/', async_views.workout_report, name='async_workout_report'),
 ]
\ No newline at end of file
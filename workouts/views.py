@@ -1,31 +1,87 @@
+import base64
+import binascii
+import datetime
+import json
+import zoneinfo
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from .models import ScheduledWorkout, WorkoutPlan, WorkoutPerformance
-from .serializers import WorkoutPlanSerializer, ScheduledWorkoutSerializer
-from django.db.models import Count, Avg
-from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, DateTimeField, Q, prefetch_related_objects
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from workout_tracker import metrics
+from .models import ScheduledWorkout, WorkoutPlan, WorkoutComment, WorkoutPerformance, SyncTombstone, RecurringSchedule, RecurrenceException, PersonalRecord
+from .serializers import WorkoutPlanSerializer, ScheduledWorkoutSerializer, WorkoutCommentSerializer, WorkoutPerformanceSerializer, WorkoutPerformanceBulkItemSerializer, RecurringScheduleSerializer, RecurrenceExceptionSerializer, OccurrenceSerializer, PersonalRecordSerializer
+from . import analytics, caching, conditional, downsampling, export, records, recurrence, reports, rollups
+from .pagination import KeysetPagination
+
+
+
+def save_idempotent(serializer, user):
+    """
+    Save a new object for the user, unless the request carries a client_id
+    that the user already used, in which case the earlier object is returned.
+    Lets offline clients retry uploads without creating duplicates.
+
+    Returns (instance, created).
+    """
+    model = serializer.Meta.model
+    client_id = serializer.validated_data.get('client_id')
+    if client_id is None:
+        return serializer.save(user=user), True
+
+    existing = model.objects.for_user(user).filter(client_id=client_id).first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return serializer.save(user=user), True
+    except IntegrityError:
+        #a concurrent retry inserted the same client_id first.
+        existing = model.objects.for_user(user).filter(client_id=client_id).first()
+        if existing is None:
+            raise
+        return existing, False
 
 
 
 class WorkoutPlanListCreateAPIView(APIView):
     """
-    API view to list all workout plans for the authenticated user,
+    API view to list the workout plans of the authenticated user, newest first,
     and to create a new workout plan.
+
+    The list is cursor-paginated on (created_at, id); see KeysetPagination for
+    the "cursor" and "page_size" query parameters. Like the other lists and
+    detail views of this module, it answers If-None-Match with 304 Not
+    Modified when nothing changed; see workouts.conditional.
     """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self, request):
         # Only return workouts that belong to the current user.
-        workouts = WorkoutPlan.objects.filter(user=request.user).order_by('-created_at')
-        serializer = WorkoutPlanSerializer(workouts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Nested exercises are loaded with one extra query per page instead of one per plan.
+        workouts = WorkoutPlan.objects.for_user(request.user).prefetch_related('exercises')
+
+        def build():
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(workouts, request, view=self)
+            serializer = WorkoutPlanSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        return conditional.respond(request, conditional.list_etag(request, workouts), build)
 
     def post(self, request):
         serializer = WorkoutPlanSerializer(data=request.data)
         if serializer.is_valid():
             # Set the workout's user to the current authenticated user.
-            serializer.save(user=request.user)
+            workout, created = save_idempotent(serializer, request.user)
+            if not created:
+                return Response(WorkoutPlanSerializer(workout).data, status=status.HTTP_200_OK)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -37,24 +93,27 @@ class WorkoutPlanDetailAPIView(APIView):
     """
     API view to retrieve, update, or delete a single workout plan.
     Ensures that only the owner of the workout can access or modify it.
+    GET honours If-None-Match and If-Modified-Since (see workouts.conditional).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self, pk, request):
         try:
-            workout = WorkoutPlan.objects.get(pk=pk)
+            return WorkoutPlan.objects.for_user(request.user).prefetch_related('exercises').get(pk=pk)
         except WorkoutPlan.DoesNotExist:
             return None
-        if workout.user != request.user:
-            return None
-        return workout
 
     def get(self, request, pk):
-        workout = self.get_object(pk, request)
+        #the exercises are only loaded when the client's copy is out of date.
+        workout = WorkoutPlan.objects.for_user(request.user).filter(pk=pk).first()
         if workout is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = WorkoutPlanSerializer(workout)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        def build():
+            prefetch_related_objects([workout], 'exercises')
+            return Response(WorkoutPlanSerializer(workout).data, status=status.HTTP_200_OK)
+
+        return conditional.respond(request, conditional.detail_etag(request, workout), build, workout.updated_at)
 
     def put(self, request, pk):
         workout = self.get_object(pk, request)
@@ -86,18 +145,22 @@ class ScheduledWorkoutListCreateAPIView(APIView):
 
     def get(self, request):
         # Return only the scheduled workouts for the current user, ordered by scheduled_datetime.
-        schedules = ScheduledWorkout.objects.filter(user=request.user).order_by('scheduled_datetime')
-        serializer = ScheduledWorkoutSerializer(schedules, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        schedules = ScheduledWorkout.objects.for_user(request.user).order_by('scheduled_datetime')
+        return conditional.respond(
+            request, conditional.list_etag(request, schedules),
+            lambda: Response(ScheduledWorkoutSerializer(schedules, many=True).data, status=status.HTTP_200_OK),
+        )
 
     def post(self, request):
         serializer = ScheduledWorkoutSerializer(data=request.data)
         if serializer.is_valid():
             # Verify that the workout belongs to the authenticated user.
             workout = serializer.validated_data.get('workout')
-            if workout.user != request.user:
+            if workout.user_id != request.user.id:
                 return Response({"detail": "You cannot schedule a workout that doesn't belong to you."}, status=status.HTTP_403_FORBIDDEN)
-            serializer.save(user=request.user)
+            schedule, created = save_idempotent(serializer, request.user)
+            if not created:
+                return Response(ScheduledWorkoutSerializer(schedule).data, status=status.HTTP_200_OK)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -114,19 +177,18 @@ class ScheduledWorkoutDetailAPIView(APIView):
 
     def get_object(self, pk, request):
         try:
-            schedule = ScheduledWorkout.objects.get(pk=pk)
+            return ScheduledWorkout.objects.for_user(request.user).get(pk=pk)
         except ScheduledWorkout.DoesNotExist:
             return None
-        if schedule.user != request.user:
-            return None
-        return schedule
 
     def get(self, request, pk):
         schedule = self.get_object(pk, request)
         if schedule is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = ScheduledWorkoutSerializer(schedule)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return conditional.respond(
+            request, conditional.detail_etag(request, schedule),
+            lambda: Response(ScheduledWorkoutSerializer(schedule).data, status=status.HTTP_200_OK), schedule.updated_at,
+        )
 
     def put(self, request, pk):
         schedule = self.get_object(pk, request)
@@ -135,7 +197,7 @@ class ScheduledWorkoutDetailAPIView(APIView):
         serializer = ScheduledWorkoutSerializer(schedule, data=request.data)
         if serializer.is_valid():
             workout = serializer.validated_data.get('workout')
-            if workout.user != request.user:
+            if workout.user_id != request.user.id:
                 return Response({"detail": "You cannot schedule a workout that doesn't belong to you."}, status=status.HTTP_403_FORBIDDEN)
             serializer.save(user=request.user)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -165,12 +227,337 @@ class ScheduledWorkoutListSortedAPIView(APIView):
     def get(self, request):
         order = request.query_params.get('order', 'asc').lower()
         if order == 'desc':
-            schedules = ScheduledWorkout.objects.filter(user=request.user).order_by('-scheduled_datetime')
+            schedules = ScheduledWorkout.objects.for_user(request.user).order_by('-scheduled_datetime')
         else:
-            schedules = ScheduledWorkout.objects.filter(user=request.user).order_by('scheduled_datetime')
-        serializer = ScheduledWorkoutSerializer(schedules, many=True)
+            schedules = ScheduledWorkout.objects.for_user(request.user).order_by('scheduled_datetime')
+        return conditional.respond(
+            request, conditional.list_etag(request, schedules),
+            lambda: Response(ScheduledWorkoutSerializer(schedules, many=True).data, status=status.HTTP_200_OK),
+        )
+
+
+
+
+
+
+def _parse_bound(value, zone):
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            moment = datetime.datetime.combine(day, datetime.time.min)
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = moment.replace(tzinfo=zone)
+    return moment
+
+
+def parse_timezone(name):
+    """
+    The time zone of an IANA name from the request.
+    Returns (zone, None), or (None, error response).
+    """
+    try:
+        return zoneinfo.ZoneInfo(name), None
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError, OSError):
+        #OSError: names of tz database directories ("America") or too long for the file system.
+        return None, Response({"detail": "Unknown time zone."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def parse_window(request, max_days=recurrence.MAX_WINDOW_DAYS):
+    """
+    Read the "start", "end" and "tz" query parameters of a date range.
+    Returns ((start, end, zone), None), or (None, error response).
+    """
+    zone, error = parse_timezone(request.query_params.get('tz', 'UTC'))
+    if error:
+        return None, error
+    start = _parse_bound(request.query_params.get('start'), zone)
+    end = _parse_bound(request.query_params.get('end'), zone)
+    if start is None or end is None:
+        return None, Response({"detail": "'start' and 'end' must be dates or ISO 8601 datetimes."}, status=status.HTTP_400_BAD_REQUEST)
+    if not start < end <= start + datetime.timedelta(days=max_days):
+        return None, Response({"detail": f"'end' must be after 'start' and at most {max_days} days later."}, status=status.HTTP_400_BAD_REQUEST)
+    return (start, end, zone), None
+
+
+def window_occurrences(user, start, end):
+    """
+    The occurrences of the user's recurring schedules between start and end,
+    with cancelled and moved occurrences applied, ordered by time.
+    """
+    rules = list(
+        RecurringSchedule.objects.for_user(user)
+        .filter(start__lt=end)
+        .filter(Q(until__isnull=True) | Q(until__gte=start))
+    )
+    if not rules:
+        return []
+    exceptions = RecurrenceException.objects.filter(recurring_schedule__in=rules).filter(
+        Q(original_datetime__gte=start, original_datetime__lt=end)
+        | Q(scheduled_datetime__gte=start, scheduled_datetime__lt=end)
+    )
+    return sorted(recurrence.expand(rules, exceptions, start, end), key=lambda occurrence: occurrence.scheduled_datetime)
+
+
+
+
+
+
+class ScheduledWorkoutCalendarAPIView(APIView):
+    """
+    API view to list the scheduled workouts of the authenticated user in a
+    date range, grouped into calendar buckets.
+
+    Only the rows inside the window are read, with a range scan of the
+    (user, scheduled_datetime) index, and the bucket of every row is computed
+    by the database (Trunc in the requested time zone). Occurrences of
+    recurring schedules in the window are expanded and added to the same buckets.
+
+    Query Parameters:
+        - start, end: the window, as dates (YYYY-MM-DD, midnight in "tz") or
+                      ISO 8601 datetimes. "end" is exclusive. At most
+                      366 days apart.
+        - tz: IANA time zone name used for dates and buckets (default UTC).
+        - bucket: "day", "week" (starting on Monday) or "month" (default).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    buckets = ['day', 'week', 'month']
+
+    def get(self, request):
+        window, error = parse_window(request)
+        if error:
+            return error
+        start, end, zone = window
+        bucket = request.query_params.get('bucket', 'month').lower()
+        if bucket not in self.buckets:
+            return Response({"detail": f"'bucket' must be one of {', '.join(self.buckets)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        schedules = (
+            ScheduledWorkout.objects.for_user(request.user)
+            .filter(scheduled_datetime__gte=start, scheduled_datetime__lt=end)
+            .annotate(period=Trunc('scheduled_datetime', bucket, output_field=DateTimeField(), tzinfo=zone))
+            .order_by('scheduled_datetime', 'id')
+        )
+        groups = {}
+        for schedule in schedules:
+            groups.setdefault(schedule.period.date().isoformat(), ([], []))[0].append(schedule)
+        #occurrences are not rows, so they are bucketed here, the same way Trunc does.
+        for occurrence in window_occurrences(request.user, start, end):
+            period = self.period_of(occurrence.scheduled_datetime, bucket, zone)
+            groups.setdefault(period, ([], []))[1].append(occurrence)
+
+        return Response({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'timezone': str(zone),
+            'bucket': bucket,
+            'buckets': [
+                {
+                    'period': period,
+                    'count': len(rows) + len(occurrences),
+                    'scheduled_workouts': ScheduledWorkoutSerializer(rows, many=True).data,
+                    'occurrences': OccurrenceSerializer(occurrences, many=True).data,
+                }
+                for period, (rows, occurrences) in sorted(groups.items())
+            ],
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def period_of(moment, bucket, zone):
+        day = moment.astimezone(zone).date()
+        if bucket == 'week':
+            day -= datetime.timedelta(days=day.weekday())
+        elif bucket == 'month':
+            day = day.replace(day=1)
+        return day.isoformat()
+
+
+
+
+
+
+class RecurringScheduleListCreateAPIView(APIView):
+    """
+    API view to list the recurring schedules of the authenticated user and to create one.
+
+    A recurring schedule is a single row holding an RRULE-style rule
+    (frequency, interval, weekdays, until or count); its occurrences are
+    expanded on demand, see workouts.recurrence.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        rules = RecurringSchedule.objects.for_user(request.user).order_by('start', 'id')
+        return conditional.respond(
+            request, conditional.list_etag(request, rules),
+            lambda: Response(RecurringScheduleSerializer(rules, many=True).data, status=status.HTTP_200_OK),
+        )
+
+    def post(self, request):
+        serializer = RecurringScheduleSerializer(data=request.data)
+        if serializer.is_valid():
+            workout = serializer.validated_data.get('workout')
+            if workout.user_id != request.user.id:
+                return Response({"detail": "You cannot schedule a workout that doesn't belong to you."}, status=status.HTTP_403_FORBIDDEN)
+            serializer.save(user=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+
+
+class RecurringScheduleDetailAPIView(APIView):
+    """
+    API view to retrieve, update, or delete a recurring schedule.
+    Deleting it removes all of its occurrences and exceptions.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self, pk, user):
+        try:
+            return RecurringSchedule.objects.for_user(user).get(pk=pk)
+        except RecurringSchedule.DoesNotExist:
+            return None
+
+    def get(self, request, pk):
+        rule = self.get_object(pk, request.user)
+        if not rule:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return conditional.respond(
+            request, conditional.detail_etag(request, rule),
+            lambda: Response(RecurringScheduleSerializer(rule).data, status=status.HTTP_200_OK), rule.updated_at,
+        )
+
+    def put(self, request, pk):
+        rule = self.get_object(pk, request.user)
+        if not rule:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = RecurringScheduleSerializer(rule, data=request.data)
+        if serializer.is_valid():
+            workout = serializer.validated_data.get('workout')
+            if workout.user_id != request.user.id:
+                return Response({"detail": "You cannot schedule a workout that doesn't belong to you."}, status=status.HTTP_403_FORBIDDEN)
+            with transaction.atomic():
+                rule = serializer.save()
+                #exceptions of occurrences the edited rule no longer has would show up as phantom moved occurrences.
+                stale = [
+                    exception.pk for exception in rule.exceptions.all()
+                    if not recurrence.is_occurrence(rule, exception.original_datetime)
+                ]
+                if stale:
+                    RecurrenceException.objects.filter(pk__in=stale).delete()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, pk):
+        rule = self.get_object(pk, request.user)
+        if not rule:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        rule.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+
+
+
+class RecurringScheduleOccurrencesAPIView(APIView):
+    """
+    API view to list the occurrences of one recurring schedule in a window,
+    with cancelled and moved occurrences applied.
+
+    Query Parameters:
+        - start, end, tz: the window, as for the calendar endpoint.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            rule = RecurringSchedule.objects.for_user(request.user).get(pk=pk)
+        except RecurringSchedule.DoesNotExist:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        window, error = parse_window(request)
+        if error:
+            return error
+        start, end, _ = window
+        exceptions = rule.exceptions.filter(
+            Q(original_datetime__gte=start, original_datetime__lt=end)
+            | Q(scheduled_datetime__gte=start, scheduled_datetime__lt=end)
+        )
+        occurrences = sorted(recurrence.expand([rule], exceptions, start, end), key=lambda occurrence: occurrence.scheduled_datetime)
+        return Response(OccurrenceSerializer(occurrences, many=True).data, status=status.HTTP_200_OK)
+
+
+
+
+
+
+class RecurrenceExceptionListCreateAPIView(APIView):
+    """
+    API view to list the exceptions of a recurring schedule, and to cancel or
+    move one of its occurrences. Posting for an occurrence that already has an
+    exception replaces that exception.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_rule(self, pk, user):
+        try:
+            return RecurringSchedule.objects.for_user(user).get(pk=pk)
+        except RecurringSchedule.DoesNotExist:
+            return None
+
+    def get(self, request, pk):
+        rule = self.get_rule(pk, request.user)
+        if not rule:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = RecurrenceExceptionSerializer(rule.exceptions.order_by('original_datetime'), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def post(self, request, pk):
+        rule = self.get_rule(pk, request.user)
+        if not rule:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = RecurrenceExceptionSerializer(data=request.data, context={'recurring_schedule': rule})
+        if serializer.is_valid():
+            data = serializer.validated_data
+            exception, created = RecurrenceException.objects.update_or_create(
+                recurring_schedule=rule,
+                original_datetime=data['original_datetime'],
+                defaults={'is_cancelled': data.get('is_cancelled', False), 'scheduled_datetime': data.get('scheduled_datetime')},
+            )
+            return Response(
+                RecurrenceExceptionSerializer(exception).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+
+
+
+
+class RecurrenceExceptionDetailAPIView(APIView):
+    """
+    API view to delete an exception, which restores the original occurrence.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request, pk, exception_pk):
+        deleted, _ = RecurrenceException.objects.filter(
+            pk=exception_pk, recurring_schedule_id=pk, recurring_schedule__user=request.user
+        ).delete()
+        if not deleted:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 
 
@@ -182,17 +569,19 @@ class WorkoutCommentListCreateAPIView(APIView):
     def get(self, request):
         workout_id = request.query_params.get('workout')
         if workout_id:
-            comments = WorkoutComment.objects.filter(user=request.user, workout_id=workout_id)
+            comments = WorkoutComment.objects.for_user(request.user).filter(workout_id=workout_id).select_related('user')
         else:
-            comments = WorkoutComment.objects.filter(user=request.user)
-        serializer = WorkoutCommentSerializer(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            comments = WorkoutComment.objects.for_user(request.user).select_related('user')
+        return conditional.respond(
+            request, conditional.list_etag(request, comments),
+            lambda: Response(WorkoutCommentSerializer(comments, many=True).data, status=status.HTTP_200_OK),
+        )
 
     def post(self, request):
         serializer = WorkoutCommentSerializer(data=request.data)
         if serializer.is_valid():
             workout = serializer.validated_data.get('workout')
-            if workout.user != request.user:
+            if workout.user_id != request.user.id:
                 return Response({"detail": "You cannot comment on a workout that is not yours."}, status=status.HTTP_403_FORBIDDEN)
             serializer.save(user=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -207,19 +596,18 @@ class WorkoutCommentDetailAPIView(APIView):
 
     def get_object(self, pk, request):
         try:
-            comment = WorkoutComment.objects.get(pk=pk)
+            return WorkoutComment.objects.for_user(request.user).select_related('user').get(pk=pk)
         except WorkoutComment.DoesNotExist:
             return None
-        if comment.user != request.user:
-            return None
-        return comment
 
     def get(self, request, pk):
         comment = self.get_object(pk, request)
         if comment is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = WorkoutCommentSerializer(comment)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return conditional.respond(
+            request, conditional.detail_etag(request, comment),
+            lambda: Response(WorkoutCommentSerializer(comment).data, status=status.HTTP_200_OK), comment.updated_at,
+        )
 
     def put(self, request, pk):
         comment = self.get_object(pk, request)
@@ -236,7 +624,7 @@ class WorkoutCommentDetailAPIView(APIView):
         if comment is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
         comment.delete()
-        #return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 
@@ -248,19 +636,23 @@ class WorkoutPerformanceListCreateAPIView(APIView):
     def get(self, request):
         workout_id = request.query_params.get('workout')
         if workout_id:
-            performances = WorkoutPerformance.objects.filter(user=request.user, workout_id=workout_id)
+            performances = WorkoutPerformance.objects.for_user(request.user).filter(workout_id=workout_id).select_related('user')
         else:
-            performances = WorkoutPerformance.objects.filter(user=request.user)
-        serializer = WorkoutPerformanceSerializer(performances, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            performances = WorkoutPerformance.objects.for_user(request.user).select_related('user')
+        return conditional.respond(
+            request, conditional.list_etag(request, performances),
+            lambda: Response(WorkoutPerformanceSerializer(performances, many=True).data, status=status.HTTP_200_OK),
+        )
 
     def post(self, request):#minimal change
         serializer = WorkoutPerformanceSerializer(data=request.data)
         if serializer.is_valid():
             workout = serializer.validated_data.get('workout')
-            if workout.user != request.user:
+            if workout.user_id != request.user.id:
                 return Response({"detail": "You cannot log performance for a workout that is not yours."}, status=status.HTTP_403_FORBIDDEN)
-            serializer.save(user=request.user)
+            performance, created = save_idempotent(serializer, request.user)
+            if not created:
+                return Response(WorkoutPerformanceSerializer(performance).data, status=status.HTTP_200_OK)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -268,24 +660,243 @@ class WorkoutPerformanceListCreateAPIView(APIView):
 
 
 
+class WorkoutPerformanceBulkCreateAPIView(APIView):
+    """
+    API view to log many performances in one request (e.g. an offline session sync).
+
+    Accepts a JSON list of performance records. Ownership of every referenced
+    workout is checked with a single query, valid records are inserted with one
+    bulk insert, and a result is returned for each item in request order.
+    Items may give the "performed_at" time they were recorded at (not in the
+    future); it defaults to the time of the upload. Responds 201 when every item was created, 207 when some were rejected and
+    400 when all of them were.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_batch_size = 500
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of performance records."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_batch_size:
+            return Response({"detail": f"At most {self.max_batch_size} records can be logged per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = WorkoutPerformanceBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": serializer.errors}
+
+        owned_ids = set(
+            WorkoutPlan.objects.for_user(request.user).filter(id__in={data['workout'] for _, data in valid})
+            .values_list('id', flat=True)
+        )
+        pending = []
+        for index, data in valid:
+            if data['workout'] not in owned_ids:
+                results[index] = {"index": index, "status": status.HTTP_403_FORBIDDEN, "detail": "You cannot log performance for a workout that is not yours."}
+                continue
+            pending.append((index, WorkoutPerformance(
+                user=request.user,
+                workout_id=data['workout'],
+                client_id=data.get('client_id'),
+                performance_metric=data.get('performance_metric'),
+                notes=data.get('notes', ''),
+                performed_at=data.get('performed_at') or timezone.now(),
+            )))
+
+        # Records whose client_id was already uploaded (earlier or in this batch) are replays, not new rows.
+        client_ids = {performance.client_id for _, performance in pending if performance.client_id}
+        known = {}
+        if client_ids:
+            known = {p.client_id: p for p in WorkoutPerformance.objects.for_user(request.user).filter(client_id__in=client_ids)}
+        to_create, replayed = [], []
+        for index, performance in pending:
+            if performance.client_id in known:
+                replayed.append((index, known[performance.client_id]))
+                continue
+            if performance.client_id is not None:
+                known[performance.client_id] = performance
+            to_create.append((index, performance))
+
+        try:
+            with transaction.atomic():
+                # bulk_create skips post_save, so the report rollups and cached reports are updated here.
+                created = WorkoutPerformance.objects.bulk_create([performance for _, performance in to_create])
+                rollups.record_performances_created(created)
+                caching.bump(request.user.id)
+        except IntegrityError:
+            #a concurrent upload used some of the same client_ids; retrying this request is safe.
+            return Response({"detail": "Conflicting concurrent upload, please retry."}, status=status.HTTP_409_CONFLICT)
+
+        for index, performance in to_create:
+            results[index] = {"index": index, "status": status.HTTP_201_CREATED, "data": WorkoutPerformanceSerializer(performance).data}
+        for index, performance in replayed:
+            results[index] = {"index": index, "status": status.HTTP_200_OK, "data": WorkoutPerformanceSerializer(performance).data}
+
+        failed = len(items) - len(pending)
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif failed == len(items):
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response({"created": len(to_create), "failed": failed, "results": results}, status=response_status)
+
+
+
+
+
+class SyncAPIView(APIView):
+    """
+    API view for offline clients to fetch everything that changed since their last sync.
+
+    Query Parameters:
+        - since: the "server_time" returned by the previous sync (ISO 8601).
+                 Omit it to get a full snapshot.
+        - cursor: the "cursor" of the previous page, to continue a sync.
+
+    The response holds the workouts, scheduled workouts, workout performances,
+    recurring schedules and their exceptions created or updated since then, and
+    the ids of those deleted since then. When "since" is older than the
+    tombstone retention period a full snapshot is returned with "full": true,
+    and the client should replace its local copy.
+
+    Each response holds at most SYNC_PAGE_SIZE rows of every kind, in
+    (updated_at, id) order. When there are more, "cursor" is set and the client
+    requests the next page with it; "server_time" and "full" are those of the
+    first page, and the sync is complete once "cursor" is null.
+
+    "server_time" trails the clock by SYNC_CLOCK_SKEW_SECONDS, so that a write
+    committed while this sync was read is not skipped by the next one. Rows
+    changed around that time, or during a paged sync, are sent again; clients
+    upsert them by id.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_classes = {
+        'workouts': WorkoutPlanSerializer,
+        'scheduled_workouts': ScheduledWorkoutSerializer,
+        'workout_performances': WorkoutPerformanceSerializer,
+        'recurring_schedules': RecurringScheduleSerializer,
+        'recurrence_exceptions': RecurrenceExceptionSerializer,
+    }
+
+    def get(self, request):
+        if 'cursor' in request.query_params:
+            state = self.decode_cursor(request.query_params['cursor'])
+            if state is None:
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+            since, server_time, full, positions = state
+        else:
+            server_time = timezone.now() - datetime.timedelta(seconds=settings.SYNC_CLOCK_SKEW_SECONDS)
+            since = None
+            if 'since' in request.query_params:
+                since = parse_datetime(request.query_params['since'])
+                if since is None:
+                    return Response({"detail": "Invalid 'since' timestamp."}, status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+            retention = datetime.timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            full = since is None or since < server_time - retention
+            #None: from the first row; kinds missing from a cursor's positions are complete.
+            positions = dict.fromkeys(self.serializer_classes)
+            if not full:
+                positions['deleted'] = None
+
+        pages, next_positions = {}, {}
+        for name, queryset in self.querysets(request.user, None if full else since).items():
+            if name not in positions:
+                pages[name] = []
+                continue
+            field = 'deleted_at' if name == 'deleted' else 'updated_at'
+            queryset = queryset.order_by(field, 'id')
+            if positions[name] is not None:
+                position, last_id = positions[name]
+                queryset = queryset.filter(Q(**{f'{field}__gt': position}) | Q(**{field: position, 'id__gt': last_id}))
+            #one extra row tells whether there is another page.
+            rows = list(queryset[:settings.SYNC_PAGE_SIZE + 1])
+            if len(rows) > settings.SYNC_PAGE_SIZE:
+                rows = rows[:settings.SYNC_PAGE_SIZE]
+                next_positions[name] = (getattr(rows[-1], field), rows[-1].id)
+            pages[name] = rows
+
+        deleted = {model: [] for model, _ in SyncTombstone.MODEL_CHOICES}
+        for tombstone in pages.pop('deleted'):
+            deleted[tombstone.model].append(tombstone.object_id)
+        data = {
+            'server_time': server_time.isoformat(),
+            'full': full,
+            'cursor': self.encode_cursor(since, server_time, full, next_positions) if next_positions else None,
+        }
+        for name, serializer_class in self.serializer_classes.items():
+            data[name] = serializer_class(pages[name], many=True).data
+        data['deleted'] = deleted
+        return Response(data, status=status.HTTP_200_OK)
+
+    def querysets(self, user, since):
+        querysets = {
+            'workouts': WorkoutPlan.objects.for_user(user).prefetch_related('exercises'),
+            'scheduled_workouts': ScheduledWorkout.objects.for_user(user),
+            'workout_performances': WorkoutPerformance.objects.for_user(user).select_related('user'),
+            'recurring_schedules': RecurringSchedule.objects.for_user(user),
+            'recurrence_exceptions': RecurrenceException.objects.filter(recurring_schedule__user=user),
+        }
+        if since is None:
+            return dict(querysets, deleted=SyncTombstone.objects.none())
+        querysets = {name: queryset.filter(updated_at__gte=since) for name, queryset in querysets.items()}
+        return dict(querysets, deleted=SyncTombstone.objects.filter(user=user, deleted_at__gte=since))
+
+    def encode_cursor(self, since, server_time, full, positions):
+        state = {
+            'since': since.isoformat() if since else None,
+            'server_time': server_time.isoformat(),
+            'full': full,
+            'positions': {name: [position.isoformat(), last_id] for name, (position, last_id) in positions.items()},
+        }
+        return base64.urlsafe_b64encode(json.dumps(state).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        #returns None for a cursor this view did not make.
+        try:
+            state = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            since = parse_datetime(state['since']) if state['since'] else None
+            server_time = parse_datetime(state['server_time'])
+            positions = {
+                name: (parse_datetime(position), int(last_id))
+                for name, (position, last_id) in state['positions'].items()
+                if name in self.serializer_classes or name == 'deleted'
+            }
+            full = bool(state['full'])
+        except (TypeError, ValueError, KeyError, AttributeError, UnicodeError, binascii.Error):
+            return None
+        if server_time is None or None in (position for position, _ in positions.values()):
+            return None
+        return since, server_time, full, positions
+
+
+
+
+
 class WorkoutPerformanceDetailAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self, pk, request):
         try:
-            performance = WorkoutPerformance.objects.get(pk=pk)
+            return WorkoutPerformance.objects.for_user(request.user).select_related('user').get(pk=pk)
         except WorkoutPerformance.DoesNotExist:
             return None
-        if performance.user != request.user:
-            return None
-        return performance
 
     def get(self, request, pk):
         performance = self.get_object(pk, request)
         if performance is None:
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = WorkoutPerformanceSerializer(performance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return conditional.respond(
+            request, conditional.detail_etag(request, performance),
+            lambda: Response(WorkoutPerformanceSerializer(performance).data, status=status.HTTP_200_OK), performance.updated_at,
+        )
 
     def put(self, request, pk):
         performance = self.get_object(pk, request)
@@ -308,50 +919,300 @@ class WorkoutPerformanceDetailAPIView(APIView):
 
 
 
+class ExportAPIView(APIView):
+    '''
+    API view to download the authenticated user's full history of one resource.
+    The file is streamed row by row, so it works for any amount of history.
+
+    Query Parameters:
+        - resource: "workout_performances" (default), "workouts" or "workout_exercises".
+        - fmt: "csv" (default) or "ndjson" (one JSON object per line).
+    '''
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        resource = request.query_params.get('resource', 'workout_performances').lower()
+        fmt = request.query_params.get('fmt', 'csv').lower()
+        if resource not in export.RESOURCES:
+            return Response({'detail': 'Invalid resource.'}, status=status.HTTP_400_BAD_REQUEST)
+        if fmt not in export.FORMATS:
+            return Response({'detail': 'Invalid export format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns, rows = export.export_rows(resource, request.user)
+        stream = export.stream_csv(columns, rows) if fmt == 'csv' else export.stream_ndjson(columns, rows)
+        response = StreamingHttpResponse(stream, content_type=export.FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+        return response
+
+
+
+
+
 class WorkoutReportAPIView(APIView):
     '''
     API view to generate reports on past workouts.
-    
-    Query Parameter:
+
+    Without any of the optional parameters below, the "frequency" and
+    "progress" reports are read from the per-month rollup tables maintained
+    by workouts.rollups, so their cost depends on the number of months, not
+    on the number of workouts or performances logged.
+
+    With them, the report is aggregated from the source rows by
+    workouts.reports.run_report in one query, and cached per user and
+    parameters until the data changes.
+
+    Query Parameters:
         - report_type: "frequency" (default) for count of workouts per month,
-                       "progress" for average performance metric per month.
+                       "progress" for performance metric statistics per month,
+                       "volume" for the volume (sets x reps x weight) of exercise entries.
+        - start, end, tz: optional window, as for the calendar endpoint; tz
+                          also sets the buckets.
+        - bucket: "day", "week", "month" (default) or "year".
+        - group_by: "workout" for progress; "exercise", "category" or
+                    "muscle_group" for volume.
+        - metrics: comma-separated, from count, sum, avg, min, max, median
+                   and p90 (default count,avg,min,max; frequency only has count).
     '''
     permission_classes = [permissions.IsAuthenticated]
+    engine_params = {'start', 'end', 'tz', 'bucket', 'group_by', 'metrics'}
 
     def get(self, request):
         report_type = request.query_params.get('report_type', 'frequency').lower()
-        
-        if report_type == 'frequency':
-            #frequency report: count of workouts created per month.
-            qs = WorkoutPlan.objects.filter(user=request.user)
-            qs = qs.annotate(month=TruncMonth('created_at')) \
-                   .values('month') \
-                   .annotate(count=Count('id')) \
-                   .order_by('month')
-            data = [
-                {
-                    'month': item['month'].strftime('%Y-%m'),
-                    'workout_count': item['count']
-                }
-                for item in qs
-            ]
-            return Response({'report_type': 'frequency', 'data': data}, status=status.HTTP_200_OK)
-        
-        elif report_type == 'progress':
-            #progress report: average performance metric logged per month.
-            qs = WorkoutPerformance.objects.filter(user=request.user)
-            qs = qs.annotate(month=TruncMonth('performed_at')) \
-                   .values('month') \
-                   .annotate(avg_performance=Avg('performance_metric')) \
-                   .order_by('month')
-            data = [
-                {
-                    'month': item['month'].strftime('%Y-%m'),
-                    'average_performance': item['avg_performance']
-                }
-                for item in qs
-            ]
-            return Response({'report_type': 'progress', 'data': data}, status=status.HTTP_200_OK)
-        
-        else:
+        if report_type not in reports.SOURCES:
             return Response({'detail': 'Invalid report type.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if report_type in reports.REPORTS and not self.engine_params & set(request.query_params):
+            def compute():
+                with metrics.REPORT_QUERY_SECONDS.time(report_type=report_type):
+                    rollups = list(reports.report_queryset(report_type, request.user))
+                return reports.format_report(report_type, rollups)
+
+            report = caching.cached('report', request.user.id, {'report_type': report_type}, compute)
+            return Response(report, status=status.HTTP_200_OK)
+        return self.run_report(request, report_type)
+
+    def run_report(self, request, report_type):
+        params = request.query_params
+        source = reports.SOURCES[report_type]
+        bucket = params.get('bucket', 'month').lower()
+        if bucket not in reports.BUCKETS:
+            return Response({'detail': f"'bucket' must be one of {', '.join(reports.BUCKETS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = params.get('group_by') or None
+        if group_by is not None and group_by not in source.group_fields:
+            allowed = ', '.join(source.group_fields) or 'nothing'
+            return Response({'detail': f"'{report_type}' reports can be grouped by {allowed}."}, status=status.HTTP_400_BAD_REQUEST)
+        allowed_metrics = reports.METRICS if source.value is not None else ['count']
+        requested = params.get('metrics')
+        report_metrics = [metric.strip() for metric in requested.lower().split(',')] if requested else [metric for metric in reports.DEFAULT_METRICS if metric in allowed_metrics]
+        if not set(report_metrics) <= set(allowed_metrics):
+            return Response({'detail': f"'metrics' must be taken from {', '.join(allowed_metrics)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = end = None
+        if 'start' in params or 'end' in params:
+            window, error = parse_window(request, max_days=3660)
+            if error:
+                return error
+            start, end, zone = window
+        else:
+            zone, error = parse_timezone(params.get('tz', settings.TIME_ZONE))
+            if error:
+                return error
+
+        report = {
+            'report_type': report_type,
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat() if end else None,
+            'timezone': str(zone),
+            'bucket': bucket,
+            'group_by': group_by,
+            'metrics': report_metrics,
+        }
+
+        def compute():
+            with metrics.REPORT_QUERY_SECONDS.time(report_type=report_type):
+                return reports.run_report(request.user, report_type, zone, start, end, bucket, group_by, report_metrics)
+
+        report['data'] = caching.cached('report', request.user.id, report, compute)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+
+
+
+
+class ExerciseAnalyticsAPIView(APIView):
+    """
+    API view for per-exercise training totals of the authenticated user:
+    number of workouts, sets, reps, volume (sets x reps x weight), heaviest
+    weight and best estimated one-rep max, aggregated by the database in one
+    grouped query (see workouts.analytics).
+
+    Query Parameters:
+        - formula: e1RM formula, "epley" (default) or "brzycki".
+        - start, end, tz: optional window on the creation time of the workout
+                          plans, as for the calendar endpoint.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        formula = request.query_params.get('formula', analytics.EPLEY).lower()
+        if formula not in analytics.FORMULAS:
+            return Response({"detail": f"'formula' must be one of {', '.join(analytics.FORMULAS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        start = end = None
+        if 'start' in request.query_params or 'end' in request.query_params:
+            window, error = parse_window(request, max_days=3660)
+            if error:
+                return error
+            start, end, _ = window
+
+        def compute():
+            return analytics.format_summary(analytics.exercise_summary(request.user, formula, start, end))
+
+        exercises = caching.cached('exercise_analytics', request.user.id, {'formula': formula, 'start': start, 'end': end}, compute)
+        return Response({'formula': formula, 'exercises': exercises}, status=status.HTTP_200_OK)
+
+
+
+
+
+
+class PersonalRecordListAPIView(APIView):
+    """
+    API view to list the personal records of the authenticated user: per
+    exercise, the heaviest weight, the best Epley e1RM and the most volume in
+    one entry. Records are maintained on write (see workouts.records), so
+    this reads one row per record.
+
+    Optional Query Parameter:
+        - exercise: only the records of this exercise id.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        personal_records = PersonalRecord.objects.filter(user=request.user).select_related('exercise')
+        exercise = request.query_params.get('exercise')
+        if exercise is not None:
+            if not exercise.isdigit():
+                return Response({"detail": "'exercise' must be an exercise id."}, status=status.HTTP_400_BAD_REQUEST)
+            personal_records = personal_records.filter(exercise_id=exercise)
+        serializer = PersonalRecordSerializer(personal_records.order_by('exercise__name', 'exercise_id', 'kind'), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+
+
+
+
+class PersonalRecordHistoryAPIView(APIView):
+    """
+    API view for the progression of the authenticated user's records on one
+    exercise: for every kind of record, each entry that beat the previous
+    best, oldest first.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, exercise_id):
+        history = caching.cached(
+            'record_history', request.user.id, {'exercise': exercise_id},
+            lambda: records.record_history(request.user.id, exercise_id),
+        )
+        return Response({
+            'exercise': exercise_id,
+            'history': {
+                kind: [
+                    {'value': value, 'workout_exercise': pk, 'workout': workout_id, 'achieved_at': achieved_at}
+                    for value, pk, workout_id, achieved_at in entries
+                ]
+                for kind, entries in history.items()
+            },
+        }, status=status.HTTP_200_OK)
+
+
+
+
+
+
+class PerformanceChartAPIView(APIView):
+    """
+    API view for the performance chart of the authenticated user: the
+    performance_metric of their WorkoutPerformances over performed_at,
+    downsampled on the server to at most "points" points, so the payload is
+    bounded by the width of the chart instead of the length of the history.
+
+    Points are [ISO 8601 time, value] pairs, oldest first.
+
+    Query Parameters:
+        - points: maximum number of points returned (default 500, at most 5000).
+        - algorithm: "lttb" (default, keeps the shape of the line) or
+                     "minmax" (keeps the lowest and highest value of every bucket).
+        - granularity: "raw" (default) for every performance, or "day", "week"
+                       or "month" for the average metric of every period,
+                       computed by the database.
+        - workout: only the performances of this workout plan.
+        - start, end, tz: optional window, as for the calendar endpoint; tz
+                          also sets the periods.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    granularities = ['raw', 'day', 'week', 'month']
+    default_points = 500
+    max_points = 5000
+
+    def get(self, request):
+        params = request.query_params
+        algorithm = params.get('algorithm', 'lttb').lower()
+        if algorithm not in downsampling.ALGORITHMS:
+            return Response({"detail": f"'algorithm' must be one of {', '.join(downsampling.ALGORITHMS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        granularity = params.get('granularity', 'raw').lower()
+        if granularity not in self.granularities:
+            return Response({"detail": f"'granularity' must be one of {', '.join(self.granularities)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            points = int(params.get('points', self.default_points))
+        except ValueError:
+            points = 0
+        if not 4 <= points <= self.max_points:
+            return Response({"detail": f"'points' must be a number from 4 to {self.max_points}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        performances = WorkoutPerformance.objects.for_user(request.user).filter(performance_metric__isnull=False)
+        workout = params.get('workout')
+        if workout is not None:
+            if not workout.isdigit():
+                return Response({"detail": "'workout' must be a workout id."}, status=status.HTTP_400_BAD_REQUEST)
+            performances = performances.filter(workout_id=workout)
+        zone = timezone.get_current_timezone()
+        if 'start' in params or 'end' in params:
+            window, error = parse_window(request, max_days=3660)
+            if error:
+                return error
+            start, end, zone = window
+            performances = performances.filter(performed_at__gte=start, performed_at__lt=end)
+        elif 'tz' in params:
+            zone, error = parse_timezone(params['tz'])
+            if error:
+                return error
+
+        def compute():
+            if granularity == 'raw':
+                series = performances.order_by('performed_at', 'id').values_list('performed_at', 'performance_metric')
+            else:
+                series = (
+                    performances.annotate(period=Trunc('performed_at', granularity, output_field=DateTimeField(), tzinfo=zone))
+                    .values('period')
+                    .annotate(value=Avg('performance_metric'))
+                    .order_by('period')
+                    .values_list('period', 'value')
+                )
+            #downsampled on numeric x; the datetimes are kept alongside for the response.
+            series = [(moment.timestamp(), value, moment) for moment, value in series.iterator()]
+            sampled = downsampling.downsample(series, points, algorithm)
+            return {
+                'granularity': granularity,
+                'algorithm': algorithm,
+                'total_points': len(series),
+                'points': [[moment.isoformat(), value] for _, value, moment in sampled],
+            }
+
+        chart = caching.cached('performance_chart', request.user.id, {
+            'granularity': granularity, 'algorithm': algorithm, 'points': points, 'workout': workout,
+            'start': params.get('start'), 'end': params.get('end'), 'timezone': str(zone),
+        }, compute)
+        return Response(chart, status=status.HTTP_200_OK)